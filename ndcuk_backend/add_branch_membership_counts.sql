@@ -0,0 +1,8 @@
+-- Aggregated membership counts used by BranchService instead of one COUNT query per branch
+CREATE OR REPLACE VIEW branch_membership_counts AS
+SELECT
+  branch_id,
+  status,
+  COUNT(*)::integer AS member_count
+FROM memberships
+GROUP BY branch_id, status;
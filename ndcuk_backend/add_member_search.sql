@@ -0,0 +1,36 @@
+-- Indexed member search (replaces leading-wildcard ILIKE scans of user_profiles)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Name search: substring and similarity matches are both served by the trigram index
+CREATE INDEX IF NOT EXISTS idx_user_profiles_full_name_trgm
+  ON user_profiles USING gin (full_name gin_trgm_ops);
+
+-- Membership number lookups by prefix (LIKE 'NDC-2024-00%') can use a btree
+-- only with pattern ops, whatever the database collation
+CREATE INDEX IF NOT EXISTS idx_user_profiles_membership_number_pattern
+  ON user_profiles (membership_number text_pattern_ops);
+
+-- Ranked name search for UserService.list_users: names containing the term
+-- or similar to it (typos, word order), best match first. Terms of three or
+-- more characters use the trigram index. total is the match count before paging.
+CREATE OR REPLACE FUNCTION search_user_profiles(
+  p_query text,
+  p_status text DEFAULT NULL,
+  p_branch_ids uuid[] DEFAULT NULL,
+  p_limit integer DEFAULT 20,
+  p_offset integer DEFAULT 0
+)
+RETURNS TABLE (id uuid, rank real, total bigint) AS $$
+  SELECT p.id, word_similarity(p_query, p.full_name) AS rank, COUNT(*) OVER () AS total
+  FROM user_profiles p
+  WHERE (
+      p.full_name ILIKE '%' || replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+      OR p_query <% p.full_name
+    )
+    AND (p_status IS NULL OR p.status = p_status)
+    AND (p_branch_ids IS NULL OR EXISTS (
+      SELECT 1 FROM memberships m WHERE m.user_id = p.id AND m.branch_id = ANY (p_branch_ids)
+    ))
+  ORDER BY rank DESC, p.full_name, p.id
+  LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
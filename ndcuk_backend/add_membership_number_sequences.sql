@@ -0,0 +1,47 @@
+-- Per-year membership number sequence (replaces COUNT(*) based numbering)
+CREATE TABLE IF NOT EXISTS membership_number_sequences (
+  year integer PRIMARY KEY,
+  last_value integer NOT NULL DEFAULT 0,
+  updated_at timestamp with time zone DEFAULT now()
+);
+
+-- Atomically reserve p_count consecutive numbers for a year and return the last one.
+-- The row lock taken by UPDATE/INSERT ... ON CONFLICT serialises concurrent callers,
+-- so every block handed out is unique; cost does not depend on the member count.
+CREATE OR REPLACE FUNCTION allocate_membership_numbers(p_year integer, p_count integer DEFAULT 1)
+RETURNS integer AS $$
+DECLARE
+  last_allocated integer;
+BEGIN
+  UPDATE membership_number_sequences
+  SET last_value = last_value + p_count, updated_at = NOW()
+  WHERE year = p_year
+  RETURNING last_value INTO last_allocated;
+  
+  IF NOT FOUND THEN
+    -- First allocation of the year: continue after any numbers already issued
+    INSERT INTO membership_number_sequences (year, last_value)
+    SELECT p_year, COALESCE(MAX(SPLIT_PART(membership_number, '-', 3)::integer), 0) + p_count
+    FROM user_profiles
+    WHERE membership_number LIKE 'NDC-' || p_year || '-%'
+    ON CONFLICT (year) DO UPDATE
+      SET last_value = membership_number_sequences.last_value + p_count, updated_at = NOW()
+    RETURNING last_value INTO last_allocated;
+  END IF;
+  
+  RETURN last_allocated;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Function to generate membership number
+CREATE OR REPLACE FUNCTION generate_membership_number()
+RETURNS TEXT AS $$
+DECLARE
+  current_year INTEGER;
+BEGIN
+  current_year := EXTRACT(YEAR FROM NOW())::INTEGER;
+  
+  -- Generate format: NDC-YYYY-XXXX (e.g., NDC-2024-0001)
+  RETURN 'NDC-' || current_year || '-' || LPAD(allocate_membership_numbers(current_year, 1)::TEXT, 4, '0');
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,58 @@
+-- Denormalised copy of auth.users.email on user_profiles, so profile reads and
+-- user/member listings get the email without a second query per user
+ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS email text;
+
+UPDATE user_profiles p
+SET email = u.email
+FROM auth.users u
+WHERE u.id = p.id AND p.email IS DISTINCT FROM u.email;
+
+CREATE INDEX IF NOT EXISTS idx_user_profiles_email ON user_profiles(email);
+
+-- New profiles take the email from the auth user
+CREATE OR REPLACE FUNCTION handle_new_user()
+RETURNS TRIGGER AS $$
+DECLARE
+  membership_num TEXT;
+BEGIN
+  -- Generate membership number
+  SELECT generate_membership_number() INTO membership_num;
+  
+  -- Insert user profile
+  INSERT INTO user_profiles (
+    id, 
+    full_name, 
+    email,
+    membership_number,
+    email_verified
+  )
+  VALUES (
+    NEW.id,
+    COALESCE(NEW.raw_user_meta_data->>'full_name', NEW.email),
+    NEW.email,
+    membership_num,
+    NEW.email_confirmed_at IS NOT NULL
+  );
+  
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Keep the copy in sync when a user changes their email
+CREATE OR REPLACE FUNCTION handle_email_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE user_profiles
+  SET email = NEW.email, updated_at = NOW()
+  WHERE id = NEW.id;
+  
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_auth_user_email_changed ON auth.users;
+CREATE TRIGGER on_auth_user_email_changed
+  AFTER UPDATE OF email ON auth.users
+  FOR EACH ROW
+  WHEN (OLD.email IS DISTINCT FROM NEW.email)
+  EXECUTE FUNCTION handle_email_change();
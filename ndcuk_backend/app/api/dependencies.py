@@ -5,24 +5,33 @@ from app.core.security import verify_token
 from app.services.auth_service import auth_service
 from app.services.user_service import user_service
 from app.core.exceptions import AuthenticationException
+from app.core.permissions import get_permissions
 import logging
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+CHAPTER_WIDE_ROLES = frozenset(["Chairman", "Secretary", "Vice Chairman"])
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, Any]:
-    """Get current authenticated user"""
+    """Get current authenticated user
+
+    FastAPI resolves this dependency once per request however many other
+    dependencies need it; across requests the principal comes from the
+    short-lived principal cache in AuthService.get_user_with_roles and a
+    token already seen is not decoded again (see verify_token).
+    """
     try:
         # Verify token
-        user_id = verify_token(credentials.credentials)
-        if not user_id:
+        claims = verify_token(credentials.credentials)
+        if not claims or not claims.get("sub") or claims.get("type") == "refresh":
             raise AuthenticationException("Invalid token")
         
         # Get user with roles
-        user_data = await auth_service.get_user_with_roles(user_id)
+        user_data = await auth_service.get_user_with_roles(claims["sub"])
         if not user_data:
             raise AuthenticationException("User not found")
         
@@ -55,9 +64,9 @@ async def get_optional_user(
         return None
     
     try:
-        user_id = verify_token(credentials.credentials)
-        if user_id:
-            return await auth_service.get_user_with_roles(user_id)
+        claims = verify_token(credentials.credentials)
+        if claims and claims.get("sub") and claims.get("type") != "refresh":
+            return await auth_service.get_user_with_roles(claims["sub"])
     except Exception:
         pass
     
@@ -65,18 +74,10 @@ async def get_optional_user(
 
 def require_roles(allowed_roles: list):
     """Dependency to check if user has required roles"""
+    allowed = frozenset(allowed_roles)
+    
     def role_checker(current_user: Dict[str, Any] = Depends(get_current_active_user)):
-        user_roles = []
-        
-        # Extract user roles from executive_assignments
-        for assignment in current_user.get("executive_assignments", []):
-            if assignment.get("is_active"):
-                role_name = assignment.get("roles", {}).get("name")
-                if role_name:
-                    user_roles.append(role_name)
-        
-        # Check if user has any of the required roles
-        if not any(role in user_roles for role in allowed_roles):
+        if not get_permissions(current_user).has_role(allowed):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Required roles: {allowed_roles}"
@@ -88,32 +89,13 @@ def require_roles(allowed_roles: list):
 
 def require_permissions(required_permissions: Dict[str, list]):
     """Dependency to check if user has required permissions"""
+    required = {resource: frozenset(actions) for resource, actions in required_permissions.items()}
+    
     def permission_checker(current_user: Dict[str, Any] = Depends(get_current_active_user)):
-        user_permissions = {}
-        
-        # Extract user permissions from roles
-        for assignment in current_user.get("executive_assignments", []):
-            if assignment.get("is_active"):
-                role_permissions = assignment.get("roles", {}).get("permissions", {})
-                
-                # Merge permissions
-                for resource, actions in role_permissions.items():
-                    if resource not in user_permissions:
-                        user_permissions[resource] = []
-                    
-                    if isinstance(actions, list):
-                        user_permissions[resource].extend(actions)
-                    elif actions is True:
-                        user_permissions[resource] = ["all"]
+        permissions = get_permissions(current_user)
         
-        # Check required permissions
-        for resource, required_actions in required_permissions.items():
-            user_actions = user_permissions.get(resource, [])
-            
-            if "all" in user_actions:
-                continue
-                
-            if not any(action in user_actions for action in required_actions):
+        for resource, actions in required.items():
+            if not permissions.has_any(resource, actions):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail=f"Required permissions: {required_permissions}"
@@ -127,22 +109,14 @@ async def get_user_branch_access(
     current_user: Dict[str, Any] = Depends(get_current_active_user)
 ) -> list:
     """Get list of branch IDs user has access to"""
-    accessible_branches = []
+    permissions = get_permissions(current_user)
     
-    for assignment in current_user.get("executive_assignments", []):
-        if assignment.get("is_active"):
-            role_name = assignment.get("roles", {}).get("name")
-            
-            # Chapter-level roles have access to all branches
-            if role_name in ["Chairman", "Secretary", "Vice Chairman"]:
-                # Return all branches (would need to query from DB)
-                return ["all"]
-            
-            # Branch-level roles have access to their branch
-            if assignment.get("branch_id"):
-                accessible_branches.append(assignment["branch_id"])
+    # Chapter-level roles have access to all branches
+    if permissions.has_role(CHAPTER_WIDE_ROLES):
+        return ["all"]
     
-    return accessible_branches
+    # Branch-level roles have access to their branch
+    return list(permissions.branch_ids)
 
 # Role-specific dependencies
 require_chapter_leadership = require_roles(["Chairman", "Secretary", "Vice Chairman"])
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from typing import Dict, Any
 from app.models.auth import (
     UserRegister, UserLogin, SocialLogin, Token, TokenRefresh,
     PasswordReset, PasswordResetConfirm, EmailVerification
 )
 from app.services.auth_service import auth_service
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, security
 from app.core.exceptions import ValidationException, AuthenticationException
+from app.core.config import settings
+from app.core.rate_limit import limiter
+from app.core.etag import check_not_modified, content_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,7 +37,8 @@ async def get_registration_info():
     }
 
 @router.post("/register", response_model=Dict[str, Any])
-async def register(user_data: UserRegister):
+@limiter.limit(settings.RATE_LIMIT_REGISTER)
+async def register(request: Request, user_data: UserRegister):
     """Register a new user with email and password"""
     try:
         result = await auth_service.register_user(user_data)
@@ -45,7 +50,8 @@ async def register(user_data: UserRegister):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Registration failed")
 
 @router.post("/login", response_model=Token)
-async def login(login_data: UserLogin):
+@limiter.limit(settings.RATE_LIMIT_LOGIN)
+async def login(request: Request, login_data: UserLogin):
     """Login user with email and password"""
     try:
         token = await auth_service.login_user(login_data)
@@ -71,7 +77,8 @@ async def social_login(social_data: SocialLogin):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Social login failed")
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: TokenRefresh):
+@limiter.limit(settings.RATE_LIMIT_REFRESH)
+async def refresh_token(request: Request, token_data: TokenRefresh):
     """Refresh access token using refresh token"""
     try:
         new_token = await auth_service.refresh_access_token(token_data.refresh_token)
@@ -118,17 +125,24 @@ async def reset_password(reset_data: PasswordResetConfirm):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Password reset failed")
 
 @router.post("/logout", response_model=Dict[str, Any])
-async def logout(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     """Logout current user"""
     try:
-        result = await auth_service.logout_user("")
+        result = await auth_service.logout_user(credentials.credentials)
         return result
     except Exception as e:
         logger.error(f"Logout endpoint error: {e}")
         return {"message": "Logged out successfully"}
 
 @router.get("/me", response_model=Dict[str, Any])
-async def get_current_user_info(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     """Get current user information"""
     try:
         # Remove sensitive information
@@ -149,6 +163,9 @@ async def get_current_user_info(current_user: Dict[str, Any] = Depends(get_curre
             "updated_at": current_user["updated_at"]
         }
         
+        not_modified = check_not_modified(request, response, content_etag(user_info))
+        if not_modified:
+            return not_modified
         return user_info
     except Exception as e:
         logger.error(f"Get current user endpoint error: {e}")
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from typing import Dict, Any, List, Optional
 from app.models.branch import (
     BranchCreate, BranchUpdate, BranchResponse, BranchListResponse,
     MembershipCreate, MembershipUpdate, MembershipResponse, BranchMembersResponse,
     BranchStatus
 )
+from app.models.user import UserBulkApproval, BulkApprovalResponse
 from app.services.branch_service import branch_service
+from app.core.database import execute
 from app.api.dependencies import (
     get_current_user, get_current_active_user, require_chapter_leadership,
     require_branch_management, require_any_leadership, get_user_branch_access
 )
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
+from app.core.etag import check_not_modified, content_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,36 +21,42 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/branches", tags=["Branch Management"])
 
 @router.get("/public", response_model=List[Dict[str, Any]])
-async def list_branches_public():
+async def list_branches_public(request: Request, response: Response):
     """List active branches for registration (public endpoint)"""
     try:
-        # Use service key client to bypass RLS for public access
-        from app.core.database import supabase_client
-        client = supabase_client.get_client(use_service_key=True)
+        # Served from the reference data cache (service key client, bypasses RLS)
+        entry = await branch_service.get_active_branches()
+        not_modified = check_not_modified(request, response, entry.etag)
+        if not_modified:
+            return not_modified
         
-        response = client.table("branches").select(
-            "id, name, location, description"
-        ).eq("status", "active").execute()
-        
-        return response.data if response.data else []
+        return entry.value
     except Exception as e:
         logger.error(f"List public branches error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch branches")
 
 @router.get("/", response_model=BranchListResponse)
 async def list_branches(
+    request: Request,
+    response: Response,
     chapter_id: Optional[str] = Query(None, description="Filter by chapter ID"),
-    status: Optional[BranchStatus] = Query(None, description="Filter by status"),
+    status_filter: Optional[BranchStatus] = Query(None, alias="status", description="Filter by status"),
     current_user: Dict[str, Any] = Depends(get_current_active_user)
 ):
     """List branches with optional filtering"""
     try:
-        branches = await branch_service.list_branches(chapter_id=chapter_id, status=status)
+        branches = await branch_service.list_branches(chapter_id=chapter_id, status=status_filter)
         
-        return BranchListResponse(
+        result = BranchListResponse(
             branches=branches,
             total=len(branches)
         )
+        
+        # Member counts change with every approval, so the ETag hashes the content
+        not_modified = check_not_modified(request, response, content_etag(result))
+        if not_modified:
+            return not_modified
+        return result
     except Exception as e:
         logger.error(f"List branches endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch branches")
@@ -67,6 +76,33 @@ async def create_branch(
         logger.error(f"Create branch endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Branch creation failed")
 
+@router.get("/my-branches", response_model=List[BranchResponse])
+async def get_my_branches(
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_active_user)
+):
+    """Get branches where current user is a member"""
+    try:
+        # Get user's memberships
+        membership_response = await execute(branch_service.client.table("memberships").select(
+            "branch_id"
+        ).eq("user_id", current_user["id"]).eq("status", "active"))
+        
+        if not membership_response.data:
+            return []
+        
+        branch_ids = [m["branch_id"] for m in membership_response.data]
+        branches = await branch_service.get_branches_by_ids(branch_ids)
+        
+        not_modified = check_not_modified(request, response, content_etag(branches))
+        if not_modified:
+            return not_modified
+        return branches
+    except Exception as e:
+        logger.error(f"Get my branches endpoint error: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch branches")
+
 @router.get("/{branch_id}", response_model=BranchResponse)
 async def get_branch(
     branch_id: str,
@@ -129,9 +165,10 @@ async def delete_branch(
 @router.get("/{branch_id}/members", response_model=BranchMembersResponse)
 async def get_branch_members(
     branch_id: str,
-    status: Optional[str] = Query(None, description="Filter by membership status"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by membership status"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(20, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous page's next_cursor"),
     current_user: Dict[str, Any] = Depends(require_any_leadership),
     accessible_branches: list = Depends(get_user_branch_access)
 ):
@@ -143,13 +180,16 @@ async def get_branch_members(
         
         members = await branch_service.get_branch_members(
             branch_id=branch_id,
-            status=status,
+            status=status_filter,
             page=page,
-            size=size
+            size=size,
+            cursor=cursor
         )
         return members
     except NotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except AuthorizationException as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except Exception as e:
@@ -194,9 +234,9 @@ async def approve_branch_member(
             raise AuthorizationException("No access to this branch")
         
         # Find membership
-        membership_response = await branch_service.client.table("memberships").select("id").eq(
+        membership_response = await execute(branch_service.client.table("memberships").select("id").eq(
             "user_id", user_id
-        ).eq("branch_id", branch_id).execute()
+        ).eq("branch_id", branch_id))
         
         if not membership_response.data:
             raise NotFoundException("Membership not found")
@@ -213,6 +253,28 @@ async def approve_branch_member(
         logger.error(f"Approve branch member endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Member approval failed")
 
+@router.post("/{branch_id}/members/bulk-approve", response_model=BulkApprovalResponse)
+async def bulk_approve_branch_members(
+    branch_id: str,
+    approval_data: UserBulkApproval,
+    current_user: Dict[str, Any] = Depends(require_any_leadership),
+    accessible_branches: list = Depends(get_user_branch_access)
+):
+    """Approve many branch members at once (requires leadership role)"""
+    try:
+        # Check branch access once for the whole batch
+        if accessible_branches != ["all"] and branch_id not in accessible_branches:
+            raise AuthorizationException("No access to this branch")
+        
+        return await branch_service.approve_members(branch_id, approval_data.user_ids, current_user["id"])
+    except AuthorizationException as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk approve branch members endpoint error: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk member approval failed")
+
 @router.put("/memberships/{membership_id}", response_model=MembershipResponse)
 async def update_membership(
     membership_id: str,
@@ -268,31 +330,6 @@ async def get_membership(
         logger.error(f"Get membership endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch membership")
 
-@router.get("/my-branches", response_model=List[BranchResponse])
-async def get_my_branches(current_user: Dict[str, Any] = Depends(get_current_active_user)):
-    """Get branches where current user is a member"""
-    try:
-        # Get user's memberships
-        membership_response = await branch_service.client.table("memberships").select(
-            "branch_id"
-        ).eq("user_id", current_user["id"]).eq("status", "active").execute()
-        
-        if not membership_response.data:
-            return []
-        
-        branch_ids = [m["branch_id"] for m in membership_response.data]
-        
-        branches = []
-        for branch_id in branch_ids:
-            branch = await branch_service.get_branch(branch_id)
-            if branch:
-                branches.append(branch)
-        
-        return branches
-    except Exception as e:
-        logger.error(f"Get my branches endpoint error: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch branches")
-
 @router.post("/{branch_id}/members/{user_id}/issue-card", response_model=Dict[str, Any])
 async def issue_membership_card(
     branch_id: str,
@@ -307,9 +344,9 @@ async def issue_membership_card(
             raise AuthorizationException("No access to this branch")
         
         # Find membership
-        membership_response = await branch_service.client.table("memberships").select("id").eq(
+        membership_response = await execute(branch_service.client.table("memberships").select("id").eq(
             "user_id", user_id
-        ).eq("branch_id", branch_id).execute()
+        ).eq("branch_id", branch_id))
         
         if not membership_response.data:
             raise NotFoundException("Membership not found")
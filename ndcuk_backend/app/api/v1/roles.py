@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from typing import Dict, Any, List, Optional
 from app.models.role import (
     RoleResponse, RoleCategoryResponse, ExecutiveAssignmentCreate,
     ExecutiveAssignmentResponse, ExecutiveAssignmentUpdate, RoleAssignmentList,
-    RoleScopeType
+    RoleScopeType, BulkAssignmentResponse
 )
 from app.services.role_service import role_service
 from app.api.dependencies import (
@@ -11,6 +11,9 @@ from app.api.dependencies import (
     require_role_management, require_any_leadership
 )
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
+from app.core.permissions import get_permissions
+from app.core.etag import check_not_modified, weak_etag
+from app.services.branch_service import branch_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,35 +22,88 @@ router = APIRouter(prefix="/roles", tags=["Role Management"])
 
 @router.get("/", response_model=List[RoleResponse])
 async def list_roles(
+    request: Request,
+    response: Response,
     category_id: Optional[str] = Query(None, description="Filter by category ID"),
     scope_type: Optional[RoleScopeType] = Query(None, description="Filter by scope type"),
     current_user: Dict[str, Any] = Depends(get_current_active_user)
 ):
     """List all active roles with optional filtering"""
     try:
-        roles = await role_service.list_roles(category_id=category_id, scope_type=scope_type.value if scope_type else None)
-        return roles
+        scope = scope_type.value if scope_type else None
+        etag = (await role_service.get_roles()).etag_for(category_id, scope)
+        not_modified = check_not_modified(request, response, etag)
+        if not_modified:
+            return not_modified
+        
+        return await role_service.list_roles(category_id=category_id, scope_type=scope)
     except Exception as e:
         logger.error(f"List roles endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch roles")
 
 @router.get("/categories", response_model=List[RoleCategoryResponse])
-async def list_role_categories(current_user: Dict[str, Any] = Depends(get_current_active_user)):
+async def list_role_categories(
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_active_user)
+):
     """List all role categories"""
     try:
-        categories = await role_service.list_role_categories()
-        return categories
+        etag = (await role_service.get_role_categories()).etag
+        not_modified = check_not_modified(request, response, etag)
+        if not_modified:
+            return not_modified
+        
+        return await role_service.list_role_categories()
     except Exception as e:
         logger.error(f"List role categories endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch role categories")
 
+@router.get("/my-assignments", response_model=List[ExecutiveAssignmentResponse])
+async def get_my_assignments(
+    request: Request,
+    response: Response,
+    active_only: bool = Query(True, description="Show only active assignments"),
+    current_user: Dict[str, Any] = Depends(get_current_active_user)
+):
+    """Get current user's role assignments"""
+    try:
+        # Versioned by the assignment rows already on the (cached) principal and
+        # the role/branch reference data that supplies the names
+        versions = sorted(
+            (a["id"], a.get("updated_at"), a.get("is_active"))
+            for a in current_user.get("executive_assignments") or []
+        )
+        etag = weak_etag(
+            "my-assignments", current_user["id"], active_only, versions,
+            (await role_service.get_roles()).etag,
+            (await branch_service.get_active_branches()).etag
+        )
+        not_modified = check_not_modified(request, response, etag)
+        if not_modified:
+            return not_modified
+        
+        assignments = await role_service.list_user_assignments(current_user["id"], active_only)
+        return assignments
+    except Exception as e:
+        logger.error(f"Get my assignments endpoint error: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch assignments")
+
 @router.get("/{role_id}", response_model=RoleResponse)
 async def get_role(
     role_id: str,
+    request: Request,
+    response: Response,
     current_user: Dict[str, Any] = Depends(get_current_active_user)
 ):
     """Get role details by ID"""
     try:
+        entry = await role_service.get_roles()
+        if role_id in entry.value:
+            not_modified = check_not_modified(request, response, entry.etag_for(role_id))
+            if not_modified:
+                return not_modified
+        
         role = await role_service.get_role(role_id)
         if not role:
             raise NotFoundException("Role not found")
@@ -139,13 +195,7 @@ async def get_user_assignments(
     try:
         # Users can view their own assignments, leadership can view all
         if current_user["id"] != user_id:
-            user_roles = [
-                assignment.get("roles", {}).get("name")
-                for assignment in current_user.get("executive_assignments", [])
-                if assignment.get("is_active")
-            ]
-            
-            if not any(role in ["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"] for role in user_roles):
+            if not get_permissions(current_user).has_role(["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"]):
                 raise AuthorizationException("Not authorized to view user assignments")
         
         assignments = await role_service.list_user_assignments(user_id, active_only)
@@ -165,13 +215,7 @@ async def get_user_assignments_summary(
     try:
         # Users can view their own assignments, leadership can view all
         if current_user["id"] != user_id:
-            user_roles = [
-                assignment.get("roles", {}).get("name")
-                for assignment in current_user.get("executive_assignments", [])
-                if assignment.get("is_active")
-            ]
-            
-            if not any(role in ["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"] for role in user_roles):
+            if not get_permissions(current_user).has_role(["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"]):
                 raise AuthorizationException("Not authorized to view user assignments")
         
         assignments = await role_service.list_user_assignments(user_id, active_only=True)
@@ -186,37 +230,19 @@ async def get_user_assignments_summary(
         logger.error(f"Get user assignments summary endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch assignments summary")
 
-@router.get("/my-assignments", response_model=List[ExecutiveAssignmentResponse])
-async def get_my_assignments(
-    active_only: bool = Query(True, description="Show only active assignments"),
-    current_user: Dict[str, Any] = Depends(get_current_active_user)
-):
-    """Get current user's role assignments"""
-    try:
-        assignments = await role_service.list_user_assignments(current_user["id"], active_only)
-        return assignments
-    except Exception as e:
-        logger.error(f"Get my assignments endpoint error: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch assignments")
-
-@router.post("/assignments/bulk", response_model=List[ExecutiveAssignmentResponse])
+@router.post("/assignments/bulk", response_model=BulkAssignmentResponse)
 async def bulk_assign_roles(
     assignments_data: List[ExecutiveAssignmentCreate],
     current_user: Dict[str, Any] = Depends(require_chapter_leadership)
 ):
     """Bulk assign roles to users (requires chapter leadership)"""
     try:
-        results = []
-        for assignment_data in assignments_data:
-            try:
-                assignment = await role_service.assign_role(assignment_data, current_user["id"])
-                results.append(assignment)
-            except Exception as e:
-                logger.error(f"Bulk assignment failed for {assignment_data.user_id}: {e}")
-                # Continue with other assignments
-                continue
+        if not assignments_data:
+            raise ValidationException("No assignments provided")
         
-        return results
+        return await role_service.bulk_assign_roles(assignments_data, current_user["id"])
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except Exception as e:
         logger.error(f"Bulk assign roles endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk role assignment failed")
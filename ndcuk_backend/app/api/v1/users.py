@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
-from app.models.user import UserUpdate, UserResponse, UserListResponse, UserStatusUpdate, UserStatus
-from app.services.user_service import user_service
+from datetime import datetime
+from app.models.user import (
+    UserUpdate, UserResponse, UserListResponse, UserStatusUpdate, UserStatus,
+    UserBulkApproval, BulkApprovalResponse, ExportFormat
+)
+from app.services.user_service import user_service, REGISTER_FIELDS
 from app.api.dependencies import (
     get_current_user, get_current_active_user, require_any_leadership,
     require_member_management, get_user_branch_access
 )
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
+from app.core.permissions import get_permissions
+from app.core.config import settings
+from app.core.rate_limit import limiter
+from app.core.etag import check_not_modified, weak_etag
+from app.utils.helpers import iter_csv, iter_ndjson
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +24,21 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["User Management"])
 
 @router.get("/me", response_model=UserResponse)
-async def get_my_profile(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_my_profile(
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     """Get current user's profile"""
     try:
+        # The (cached) principal carries the profile row version, so a client
+        # with a current copy is answered without loading the profile
+        not_modified = check_not_modified(
+            request, response, weak_etag("profile", current_user["id"], current_user.get("updated_at"))
+        )
+        if not_modified:
+            return not_modified
+        
         user_profile = await user_service.get_user_profile(current_user["id"])
         if not user_profile:
             raise NotFoundException("User profile not found")
@@ -43,40 +65,82 @@ async def update_my_profile(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Profile update failed")
 
 @router.get("/", response_model=UserListResponse)
+@limiter.limit(settings.RATE_LIMIT_USERS_LIST)
 async def list_users(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(20, ge=1, le=100, description="Page size"),
-    status: Optional[UserStatus] = Query(None, description="Filter by user status"),
+    status_filter: Optional[UserStatus] = Query(None, alias="status", description="Filter by user status"),
     branch_id: Optional[str] = Query(None, description="Filter by branch ID"),
     search: Optional[str] = Query(None, description="Search by name or membership number"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous page's next_cursor"),
     current_user: Dict[str, Any] = Depends(require_any_leadership),
     accessible_branches: list = Depends(get_user_branch_access)
 ):
     """List users with pagination and filtering (requires leadership role)"""
     try:
-        # Apply branch access restrictions
-        if accessible_branches != ["all"] and branch_id:
-            if branch_id not in accessible_branches:
+        # Apply branch access restrictions (limited access defaults to all of the user's branches)
+        if accessible_branches != ["all"]:
+            if branch_id and branch_id not in accessible_branches:
                 raise AuthorizationException("No access to this branch")
-        elif accessible_branches != ["all"] and not branch_id:
-            # If user has limited branch access, default to their branches
-            branch_id = accessible_branches[0] if accessible_branches else None
+            branch_ids = [branch_id] if branch_id else accessible_branches
+            if not branch_ids:
+                raise AuthorizationException("No branch access")
+        else:
+            branch_ids = [branch_id] if branch_id else None
         
         result = await user_service.list_users(
             page=page,
             size=size,
-            status=status,
-            branch_id=branch_id,
-            search=search
+            status=status_filter,
+            branch_ids=branch_ids,
+            search=search,
+            cursor=cursor
         )
         
         return UserListResponse(**result)
     except AuthorizationException as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except Exception as e:
         logger.error(f"List users endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch users")
 
+@router.get("/export")
+@limiter.limit(settings.RATE_LIMIT_USERS_EXPORT)
+async def export_register(
+    request: Request,
+    format: ExportFormat = Query(ExportFormat.CSV, description="Export format (csv or ndjson)"),
+    user_status: Optional[UserStatus] = Query(None, alias="status", description="Filter by user status"),
+    branch_id: Optional[str] = Query(None, description="Filter by branch ID"),
+    current_user: Dict[str, Any] = Depends(require_any_leadership),
+    accessible_branches: list = Depends(get_user_branch_access)
+):
+    """Stream the membership register as CSV or NDJSON (requires leadership role)"""
+    if accessible_branches != ["all"]:
+        if branch_id and branch_id not in accessible_branches:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No access to this branch")
+        branch_ids = [branch_id] if branch_id else accessible_branches
+        if not branch_ids:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No branch access")
+    else:
+        branch_ids = [branch_id] if branch_id else None
+    
+    rows = user_service.iter_register(status=user_status, branch_ids=branch_ids)
+    filename = f"membership-register-{datetime.now().strftime('%Y%m%d')}.{format.value}"
+    
+    if format == ExportFormat.NDJSON:
+        body, media_type = iter_ndjson(rows), "application/x-ndjson"
+    else:
+        body, media_type = iter_csv(rows, REGISTER_FIELDS), "text/csv"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
@@ -142,6 +206,25 @@ async def approve_user(
         logger.error(f"Approve user endpoint error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User approval failed")
 
+@router.post("/bulk-approve", response_model=BulkApprovalResponse)
+async def bulk_approve_users(
+    approval_data: UserBulkApproval,
+    current_user: Dict[str, Any] = Depends(require_member_management),
+    accessible_branches: list = Depends(get_user_branch_access)
+):
+    """Approve many users at once - requires member management permission"""
+    try:
+        return await user_service.approve_users(
+            user_ids=approval_data.user_ids,
+            approver_id=current_user["id"],
+            accessible_branches=accessible_branches
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk approve users endpoint error: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk approval failed")
+
 @router.post("/{user_id}/avatar", response_model=Dict[str, Any])
 async def upload_avatar(
     user_id: str,
@@ -153,13 +236,7 @@ async def upload_avatar(
         # Check if user can upload avatar for this user_id
         if current_user["id"] != user_id:
             # Check if current user has permission to manage this user
-            user_roles = [
-                assignment.get("roles", {}).get("name")
-                for assignment in current_user.get("executive_assignments", [])
-                if assignment.get("is_active")
-            ]
-            
-            if not any(role in ["Chairman", "Secretary"] for role in user_roles):
+            if not get_permissions(current_user).has_role(["Chairman", "Secretary"]):
                 raise AuthorizationException("Can only upload own avatar")
         
         # Validate file type and size
@@ -190,16 +267,13 @@ async def get_user_permissions(
     try:
         # Check if requesting own permissions or has leadership role
         if current_user["id"] != user_id:
-            user_roles = [
-                assignment.get("roles", {}).get("name")
-                for assignment in current_user.get("executive_assignments", [])
-                if assignment.get("is_active")
-            ]
-            
-            if not any(role in ["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"] for role in user_roles):
+            if not get_permissions(current_user).has_role(["Chairman", "Secretary", "Branch Chairman", "Branch Secretary"]):
                 raise AuthorizationException("Not authorized to view user permissions")
         
-        permissions = await user_service.get_user_permissions(user_id)
+        if current_user["id"] == user_id:
+            permissions = get_permissions(current_user).to_dict()
+        else:
+            permissions = await user_service.get_user_permissions(user_id)
         return {"permissions": permissions}
         
     except AuthorizationException as e:
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+import time
+
+class TTLCache:
+    """Bounded in-process LRU cache with a per-entry time to live.
+
+    Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live entry, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store an entry, evicting the least recently used one when full"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Authenticated principals (user profile + memberships + roles) keyed by user id
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
+
+# Verified JWT claims keyed by SHA-256 digest of the token
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL
+)
+
+# Exact list totals keyed by filter combination, so deep pages skip count="exact"
+list_total_cache = TTLCache(
+    maxsize=1024,
+    ttl=settings.LIST_TOTAL_CACHE_TTL
+)
+
+metrics.register_cache("principal", principal_cache)
+metrics.register_cache("token", token_cache)
+metrics.register_cache("list_total", list_total_cache)
@@ -2,18 +2,68 @@ from pydantic_settings import BaseSettings
 from typing import List
 import os
 
+# ndcuk_backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings(BaseSettings):
     # Supabase
     SUPABASE_URL: str
     SUPABASE_SERVICE_KEY: str
     SUPABASE_ANON_KEY: str
-    
+
+    # Database worker pool (supabase-py calls are blocking)
+    DB_MAX_WORKERS: int = 16
+    # Values per `in` filter when batch-fetching rows by id (keeps URLs short)
+    DB_IN_CHUNK_SIZE: int = 100
+    # Warn when one request repeats a query shape more often than this (0 disables)
+    DB_REPEATED_QUERY_THRESHOLD: int = 5
+
+    # Background database health probe (seconds)
+    HEALTH_CHECK_INTERVAL: float = 10.0
+    HEALTH_CHECK_TIMEOUT: float = 5.0
+
+    # Prometheus metrics at /metrics (per worker process)
+    METRICS_ENABLED: bool = True
+
     # JWT
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    
+    JWT_BACKEND: str = "jose"  # or "pyjwt" (faster, needs PyJWT installed)
+
+    # Runtime state (SQLite token store, rate limit counters); relative store paths
+    # are resolved against it rather than the working directory
+    DATA_DIR: str = os.path.join(BASE_DIR, "var")
+
+    # Refresh token rotation store: "sqlite" (shared by workers) or "memory"
+    REFRESH_TOKEN_STORE: str = "sqlite"
+    REFRESH_TOKEN_STORE_PATH: str = "refresh_tokens.db"
+
+    # bcrypt pool (0 workers = one per CPU)
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_USE_PROCESSES: bool = False
+
+    # Verified token cache (entries never outlive the token's exp)
+    TOKEN_CACHE_TTL: int = 300
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Principal cache (get_current_user)
+    PRINCIPAL_CACHE_TTL: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 4096
+
+    # Reference data (branches, roles, role categories) cache
+    REFERENCE_CACHE_TTL: int = 300
+
+    # Cached list totals for paginated endpoints
+    LIST_TOTAL_CACHE_TTL: int = 30
+
+    # Rows fetched per round trip by the register export
+    EXPORT_BATCH_SIZE: int = 500
+
+    # Membership numbers leased per allocator round trip
+    MEMBERSHIP_NUMBER_BLOCK_SIZE: int = 1
+
     # Application
     PROJECT_NAME: str = "NDC UK Backend API"
     PROJECT_VERSION: str = "1.0.0"
@@ -23,9 +73,18 @@ class Settings(BaseSettings):
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000"
     
-    # Rate Limiting
+    # Rate Limiting (storage shared by all workers; "memory://" for a single worker,
+    # "redis://..." for several hosts or many workers contending for the SQLite lock)
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_PERIOD: int = 60
+    RATE_LIMIT_STORAGE_URI: str = "sqlite:///rate_limits.db"
+    RATE_LIMIT_SQLITE_TIMEOUT_MS: int = 50
+    RATE_LIMIT_STRATEGY: str = "sliding-window-counter"
+    RATE_LIMIT_LOGIN: str = "10/minute"
+    RATE_LIMIT_REGISTER: str = "5/minute"
+    RATE_LIMIT_REFRESH: str = "30/minute"
+    RATE_LIMIT_USERS_LIST: str = "60/minute"
+    RATE_LIMIT_USERS_EXPORT: str = "5/minute"
     
     # Email Configuration
     SMTP_HOST: str = "smtp.gmail.com"
@@ -41,10 +100,20 @@ class Settings(BaseSettings):
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
     
+    @property
+    def default_rate_limit(self) -> str:
+        return f"{self.RATE_LIMIT_REQUESTS}/{self.RATE_LIMIT_PERIOD} seconds"
+    
     @property
     def allowed_file_types_list(self) -> List[str]:
         return [ext.strip() for ext in self.ALLOWED_FILE_TYPES.split(",")]
     
+    def data_path(self, path: str) -> str:
+        """Resolve a runtime file path against DATA_DIR, creating its directory"""
+        full_path = os.path.join(self.DATA_DIR, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        return full_path
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,34 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List
 from supabase import create_client, Client
 from app.core.config import settings
+from app.core.query_stats import query_signature, record_query
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 class SupabaseClient:
     def __init__(self):
         self.client: Client = create_client(
-            settings.SUPABASE_URL, 
+            settings.SUPABASE_URL,
             settings.SUPABASE_SERVICE_KEY
         )
         self.anon_client: Client = create_client(
             settings.SUPABASE_URL,
             settings.SUPABASE_ANON_KEY
         )
-    
+        # The supabase-py 2.0 client is synchronous, so every round trip is
+        # offloaded to a bounded pool instead of blocking the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.DB_MAX_WORKERS,
+            thread_name_prefix="supabase"
+        )
+
     def get_client(self, use_service_key: bool = True) -> Client:
         """Get Supabase client"""
         if use_service_key:
             return self.client
         return self.anon_client
-    
-    async def health_check(self) -> bool:
-        """Check database connection"""
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking Supabase call (auth, storage, ...) in the database pool"""
+        return await self._run(getattr(func, "__qualname__", repr(func)), func, *args, **kwargs)
+
+    async def execute(self, query: Any) -> Any:
+        """Execute a PostgREST query or RPC builder without blocking the event loop"""
+        return await self._run(query_signature(query), query.execute)
+
+    async def _run(self, signature: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # Every round trip is counted against the current request (app.core.query_stats);
+        # the time includes waiting for a free worker
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        rows = 0
         try:
-            response = self.client.table('chapters').select('id').limit(1).execute()
-            return len(response.data) >= 0
-        except Exception as e:
-            logger.error(f"Database health check failed: {e}")
-            return False
+            result = await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+            data = getattr(result, "data", None)
+            rows = len(data) if isinstance(data, list) else 0
+            return result
+        finally:
+            record_query(signature, time.perf_counter() - started, rows)
+
+    def close(self) -> None:
+        """Release the database worker pool"""
+        self.executor.shutdown(wait=False)
 
 # Global instance
-supabase_client = SupabaseClient()
\ No newline at end of file
+supabase_client = SupabaseClient()
+
+async def execute(query: Any) -> Any:
+    """Execute a query builder on the shared Supabase worker pool"""
+    return await supabase_client.execute(query)
+
+async def run_sync(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking Supabase client call on the shared worker pool"""
+    return await supabase_client.run(func, *args, **kwargs)
+
+def or_filter(query: Any, filters: str) -> Any:
+    """Add an `or=(...)` filter to a select builder.
+
+    postgrest-py 0.13 (pinned by supabase 2.0.2) has no or_(), so the
+    parameter is added directly; filters use PostgREST syntax, e.g.
+    "full_name.ilike.*x*,and(created_at.eq.t,id.lt.42)".
+    """
+    query.params = query.params.add("or", f"({filters})")
+    return query
+
+async def fetch_in(
+    build_query: Callable[[], Any],
+    column: str,
+    values: Iterable[Any],
+    chunk_size: int = settings.DB_IN_CHUNK_SIZE
+) -> List[Dict[str, Any]]:
+    """Fetch the rows whose column is in values, batched into `in` filters.
+
+    build_query() must return a fresh select (builders are single use); it is
+    called once per chunk of DB_IN_CHUNK_SIZE distinct values and the chunks
+    run concurrently, so any number of ids costs a constant number of round
+    trips for typical sizes. Rows come back in database order. An update or
+    delete builder works the same way and returns the changed rows.
+    """
+    unique = list(dict.fromkeys(value for value in values if value is not None))
+    if not unique:
+        return []
+    
+    responses = await asyncio.gather(*(
+        execute(build_query().in_(column, unique[i:i + chunk_size]))
+        for i in range(0, len(unique), chunk_size)
+    ))
+    return [row for response in responses for row in response.data or []]
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from app.utils.helpers import etag_matches
+import hashlib
+import json
+
+def weak_etag(*parts: Any) -> str:
+    """Weak ETag from row versions (ids, updated_at values, dataset ETags...)"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+def content_etag(content: Any) -> str:
+    """Weak ETag from a hash of the JSON-encoded response content"""
+    return weak_etag(json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":")))
+
+def check_not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Send the ETag with the response; returns the 304 to send instead when the client's copy is current"""
+    response.headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.database import supabase_client
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class DatabaseHealthMonitor:
+    """Probes the database on an interval so health endpoints never query it.
+
+    The last result (status, round trip latency, time of the check) is kept
+    in memory; a result older than three intervals counts as unhealthy, which
+    also covers a probe task that has stopped running.
+    """
+
+    def __init__(self, interval: float = 10.0, timeout: float = 5.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.healthy: Optional[bool] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.consecutive_failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self) -> bool:
+        """Run one database round trip and record the outcome (the only database health query)"""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                supabase_client.execute(supabase_client.client.table("chapters").select("id").limit(1)),
+                timeout=self.timeout
+            )
+            self.healthy = True
+            self.error = None
+            self.consecutive_failures = 0
+        except Exception as e:
+            if self.healthy is not False:
+                logger.error(f"Database health probe failed: {e!r}")
+            self.healthy = False
+            self.error = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+            self.consecutive_failures += 1
+
+        self.latency_ms = (time.perf_counter() - started) * 1000
+        self.checked_at = time.time()
+        return self.healthy
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+
+    def start(self) -> None:
+        """Start the background probe loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="db-health-probe")
+
+    async def stop(self) -> None:
+        """Stop the background probe loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.checked_at is not None and time.time() - self.checked_at <= 3 * self.interval
+
+    @property
+    def ready(self) -> bool:
+        """Database reachable as of a recent probe"""
+        return bool(self.healthy) and self.is_fresh
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Last probe result"""
+        return {
+            "database": "connected" if self.ready else "disconnected",
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "checked_at": self.checked_at,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+# Global instance
+db_health_monitor = DatabaseHealthMonitor(
+    interval=settings.HEALTH_CHECK_INTERVAL,
+    timeout=settings.HEALTH_CHECK_TIMEOUT
+)
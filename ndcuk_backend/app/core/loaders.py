@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import asyncio
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Loads the values for a batch of keys; keys missing from the result load as None
+BatchLoadFn = Callable[[List[K]], Awaitable[Dict[K, V]]]
+
+class Loader(Generic[K, V]):
+    """Coalesces and memoises lookups by key (the dataloader pattern).
+
+    Every load() issued before the event loop next gets control goes to a
+    single batch_fn call, and each key is fetched at most once while the
+    loader lives. Writers call clear(key) so a read after the write goes back
+    to the database. Failed loads are not memoised.
+    """
+
+    def __init__(self, batch_fn: BatchLoadFn):
+        self.batch_fn = batch_fn
+        self.batches = 0
+        self._futures: Dict[K, asyncio.Future] = {}
+        self._pending: List[Tuple[K, asyncio.Future]] = []
+
+    def _future(self, key: K) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._pending.append((key, future))
+            if len(self._pending) == 1:
+                loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[K, asyncio.Future]]) -> None:
+        self.batches += 1
+        try:
+            values = await self.batch_fn([key for key, _ in batch])
+        except Exception as e:
+            for key, future in batch:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch:
+            if not future.done():
+                future.set_result(values.get(key))
+
+    async def load(self, key: K) -> Optional[V]:
+        """Value for key, or None if the batch function did not return it"""
+        # Shielded: a cancelled caller must not cancel a result other callers share
+        return await asyncio.shield(self._future(key))
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        """Values for several keys, in order, loaded in one batch"""
+        futures = [self._future(key) for key in keys]
+        return list(await asyncio.shield(asyncio.gather(*futures)))
+
+    def prime(self, key: K, value: V) -> None:
+        """Memoise a value already in hand (e.g. returned by a write)"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._futures[key] = future
+
+    def clear(self, *keys: K) -> None:
+        """Forget memoised values so the next load refetches them"""
+        for key in keys:
+            self._futures.pop(key, None)
+
+# Loaders of the current request, by name; None outside a request scope
+_request_loaders: ContextVar[Optional[Dict[str, Loader]]] = ContextVar("request_loaders", default=None)
+
+@contextmanager
+def request_scope() -> Iterator[None]:
+    """Give the enclosed code (one request) its own set of loaders"""
+    token = _request_loaders.set({})
+    try:
+        yield
+    finally:
+        _request_loaders.reset(token)
+
+def get_loader(name: str, batch_fn: BatchLoadFn) -> Loader:
+    """The current request's loader called name, created on first use.
+
+    Outside a request scope (startup, background tasks) a fresh loader is
+    returned on every call, so lookups still batch but nothing is memoised.
+    """
+    loaders = _request_loaders.get()
+    if loaders is None:
+        return Loader(batch_fn)
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = Loader(batch_fn)
+    return loader
+
+def clear_loader(name: str, *keys: Hashable) -> None:
+    """Drop keys from the current request's loader called name, if it exists"""
+    loaders = _request_loaders.get()
+    if loaders and name in loaders:
+        loaders[name].clear(*keys)
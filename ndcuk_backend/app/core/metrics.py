@@ -0,0 +1,154 @@
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Tuple, TypeVar
+import inspect
+import time
+
+T = TypeVar("T", bound=type)
+
+# Seconds; Prometheus' default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Latency histogram with one series per combination of label values.
+
+    observe() does a bisect and two additions on a per-series list; buckets
+    are made cumulative only when scraped. Only touched from the event loop,
+    so no locking is needed.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [count per bucket (last one is +Inf)..., sum]
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[Any, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+class Gauge:
+    """A value that goes up and down, e.g. requests in flight"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self) -> None:
+        self.value += 1
+
+    def dec(self) -> None:
+        self.value -= 1
+
+class MetricsRegistry:
+    """Metrics of this worker process, rendered in the Prometheus text format.
+
+    Caches registered with register_cache() are exported as hit and miss
+    counters plus a hit ratio, read from their own counters when scraped.
+    """
+
+    def __init__(self):
+        self.histograms: List[Histogram] = []
+        self.gauges: List[Gauge] = []
+        self.caches: Dict[str, Any] = {}
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...], **kwargs: Any) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, **kwargs)
+        self.histograms.append(histogram)
+        return histogram
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        gauge = Gauge(name, documentation)
+        self.gauges.append(gauge)
+        return gauge
+
+    def register_cache(self, name: str, cache: Any) -> None:
+        """Export a cache's hits/misses attributes"""
+        self.caches[name] = cache
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for gauge in self.gauges:
+            lines += [f"# HELP {gauge.name} {gauge.documentation}", f"# TYPE {gauge.name} gauge", f"{gauge.name} {gauge.value}"]
+
+        for name, kind, documentation, value in (
+            ("cache_hits_total", "counter", "Cache lookups answered from the cache", lambda c: c.hits),
+            ("cache_misses_total", "counter", "Cache lookups that went to the database", lambda c: c.misses),
+            ("cache_hit_ratio", "gauge", "Share of cache lookups answered from the cache",
+             lambda c: c.hits / (c.hits + c.misses) if c.hits + c.misses else 0.0)
+        ):
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            for cache_name, cache in self.caches.items():
+                lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {value(cache)}')
+        return "\n".join(lines) + "\n"
+
+# Global instance
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route template and status",
+    ("method", "route", "status")
+)
+
+service_call_duration = metrics.histogram(
+    "service_call_duration_seconds",
+    "Service method latency by service, method and outcome",
+    ("service", "method", "outcome")
+)
+
+requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+def instrument_service(cls: T) -> T:
+    """Class decorator: time every public coroutine method into service_call_duration.
+
+    Async generators (streamed results) are left as they are; their time is
+    spent in the response, not in the call.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed(cls.__name__, name, method))
+    return cls
+
+def _timed(service: str, name: str, method: Callable) -> Callable:
+    @wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await method(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            service_call_duration.observe((service, name, outcome), time.perf_counter() - started)
+    return wrapper
@@ -0,0 +1,130 @@
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.loaders import request_scope
+from app.core.metrics import http_request_duration, requests_in_flight
+from app.core.query_stats import QueryStats, track_queries
+import logging
+import time
+
+logger = logging.getLogger("app.requests")
+
+# Route template used for requests that did not match any route (404s etc.)
+UNMATCHED_ROUTE = "<unmatched>"
+
+def get_route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the route that handled a request, e.g. /api/v1/users/{user_id}
+
+    Starlette records the matched endpoint in the scope; the template is looked
+    up from the application's routes once per endpoint and then memoised.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return UNMATCHED_ROUTE
+
+    templates = getattr(app.state, "route_templates", None)
+    if templates is None:
+        templates = {}
+        for candidate in app.routes:
+            templates.setdefault(getattr(candidate, "endpoint", None), candidate.path)
+        app.state.route_templates = templates
+    return templates.get(endpoint, UNMATCHED_ROUTE)
+
+class RequestInstrumentationMiddleware:
+    """Pure ASGI middleware that times every HTTP request.
+
+    Adds the X-Process-Time header (seconds) and emits one structured log
+    record per request with method, route template, status, duration and
+    client, without the task and stream wrapping of BaseHTTPMiddleware.
+
+    Database round trips are counted too (app.core.query_stats): X-DB-Calls
+    and X-DB-Time (seconds) report those made before the response started,
+    the log record has the totals, and a query shape repeated more than
+    DB_REPEATED_QUERY_THRESHOLD times is logged as a likely N+1.
+
+    Request latency and requests in flight are also recorded for /metrics
+    (app.core.metrics).
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time = time.perf_counter() - start_time
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-process-time", f"{process_time:.6f}".encode()),
+                    (b"x-db-calls", str(stats.calls).encode()),
+                    (b"x-db-time", f"{stats.time:.6f}".encode())
+                ]
+            await send(message)
+
+        requests_in_flight.inc()
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                requests_in_flight.dec()
+                duration = time.perf_counter() - start_time
+                route = get_route_template(scope)
+                http_request_duration.observe((scope["method"], route, status_code), duration)
+                self._log(scope, route, status_code, duration, stats)
+
+    def _log(self, scope: Dict[str, Any], route: str, status_code: int, duration: float, stats: QueryStats) -> None:
+        repeated = stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD)
+        if repeated:
+            logger.warning(
+                "%s %s repeated queries (possible N+1): %s",
+                scope["method"], route, ", ".join(f"{sig} x{count}" for sig, count in repeated.items()),
+                extra={"http_route": route, "repeated_queries": repeated}
+            )
+
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
+        client: Optional[str] = scope["client"][0] if scope.get("client") else None
+        duration_ms = duration * 1000
+        db_time_ms = stats.time * 1000
+        logger.info(
+            "%s %s %d %.2fms db=%d/%.2fms client=%s",
+            scope["method"], route, status_code, duration_ms, stats.calls, db_time_ms, client,
+            extra={
+                "http_method": scope["method"],
+                "http_path": scope["path"],
+                "http_route": route,
+                "http_status": status_code,
+                "duration_ms": duration_ms,
+                "db_calls": stats.calls,
+                "db_rows": stats.rows,
+                "db_time_ms": db_time_ms,
+                "client": client
+            }
+        )
+
+class RequestScopeMiddleware:
+    """Pure ASGI middleware that gives each HTTP request its own loaders (app.core.loaders)"""
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with request_scope():
+            await self.app(scope, receive, send)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping
+
+ALL = "all"
+
+# Key under which the compiled permissions are stored on a principal dict
+PERMISSIONS_KEY = "_compiled_permissions"
+
+@dataclass(frozen=True)
+class CompiledPermissions:
+    """Immutable, pre-merged view of everything a principal's active roles grant.
+
+    Built once per principal so every check is a set lookup instead of a
+    walk over executive_assignments[*].roles.permissions.
+    """
+    actions: Mapping[str, FrozenSet[str]] = field(default_factory=lambda: MappingProxyType({}))
+    roles: FrozenSet[str] = frozenset()
+    branch_ids: FrozenSet[str] = frozenset()
+    superuser: bool = False
+
+    def has(self, resource: str, action: str) -> bool:
+        """Check a single resource/action pair"""
+        if self.superuser:
+            return True
+        granted = self.actions.get(resource)
+        return granted is not None and (ALL in granted or action in granted)
+
+    def has_any(self, resource: str, actions: Iterable[str]) -> bool:
+        """Check that at least one of the actions is granted on the resource"""
+        if self.superuser:
+            return True
+        granted = self.actions.get(resource)
+        if granted is None:
+            return False
+        return ALL in granted or not granted.isdisjoint(actions)
+
+    def has_role(self, roles: Iterable[str]) -> bool:
+        """Check that the principal holds at least one of the roles"""
+        return not self.roles.isdisjoint(roles)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """Plain resource -> sorted actions mapping for API responses"""
+        if self.superuser:
+            return {ALL: [ALL]}
+        return {resource: sorted(granted) for resource, granted in self.actions.items()}
+
+def _merge_role_permissions(role_permissions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, set] = {}
+    superuser = False
+
+    for permissions in role_permissions:
+        for resource, actions in (permissions or {}).items():
+            if actions is True or actions == ALL:
+                actions = [ALL]
+            elif isinstance(actions, str):
+                actions = [actions]
+            elif not isinstance(actions, list):
+                continue
+
+            if resource == ALL and ALL in actions:
+                superuser = True
+            merged.setdefault(resource, set()).update(actions)
+
+    compiled = {
+        resource: frozenset([ALL]) if ALL in actions else frozenset(actions)
+        for resource, actions in merged.items()
+    }
+    return {"actions": MappingProxyType(compiled), "superuser": superuser}
+
+def compile_roles(roles_data: Iterable[Dict[str, Any]]) -> CompiledPermissions:
+    """Compile a list of role rows (name, permissions, is_active)"""
+    active = [role for role in roles_data if role.get("is_active", True)]
+    return CompiledPermissions(
+        roles=frozenset(role["name"] for role in active if role.get("name")),
+        **_merge_role_permissions(role.get("permissions") for role in active)
+    )
+
+def compile_assignments(assignments: Iterable[Dict[str, Any]]) -> CompiledPermissions:
+    """Compile a principal's executive_assignments (with embedded roles)"""
+    active = [a for a in assignments if a.get("is_active")]
+    roles = [a.get("roles") or {} for a in active]
+    return CompiledPermissions(
+        roles=frozenset(role["name"] for role in roles if role.get("name")),
+        branch_ids=frozenset(a["branch_id"] for a in active if a.get("branch_id")),
+        **_merge_role_permissions(role.get("permissions") for role in roles)
+    )
+
+def get_permissions(user_data: Dict[str, Any]) -> CompiledPermissions:
+    """Get the compiled permissions of a principal, compiling them on first use"""
+    compiled = user_data.get(PERMISSIONS_KEY)
+    if compiled is None:
+        compiled = compile_assignments(user_data.get("executive_assignments") or [])
+        user_data[PERMISSIONS_KEY] = compiled
+    return compiled
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+# Query string parameters that shape a PostgREST response rather than filter it
+SHAPING_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+@dataclass
+class QueryStats:
+    """Database round trips made while handling one request"""
+    calls: int = 0
+    rows: int = 0
+    time: float = 0.0
+    by_signature: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, signature: str, duration: float, rows: int = 0) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.time += duration
+        self.by_signature[signature] = self.by_signature.get(signature, 0) + 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Signatures issued more than threshold times (the N+1 pattern)"""
+        if threshold <= 0:
+            return {}
+        return {signature: count for signature, count in self.by_signature.items() if count > threshold}
+
+# Stats of the current request; None outside a tracked scope
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the database calls made by the enclosed code (one request)"""
+    stats = QueryStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+def record_query(signature: str, duration: float, rows: int = 0) -> None:
+    """Add a round trip to the current request's stats, if any"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(signature, duration, rows)
+
+def query_signature(query: Any) -> str:
+    """Shape of a PostgREST builder without its values, e.g. "GET /memberships?branch_id,status"
+
+    Two calls with the same signature differ only in the values they filter
+    on, so many of them in one request usually means a per-row lookup loop.
+    """
+    method = getattr(query, "http_method", "?")
+    method = getattr(method, "value", method)
+    params = getattr(query, "params", None)
+    filters = sorted({key for key in params.keys() if key not in SHAPING_PARAMS}) if params is not None else []
+    return f"{method} {getattr(query, 'path', '?')}?{','.join(filters)}"
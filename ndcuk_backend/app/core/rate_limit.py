@@ -0,0 +1,172 @@
+from math import floor
+from typing import Any, Callable, Optional, Tuple
+from urllib.parse import urlparse
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.core.config import settings
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate limit counters in a SQLite file, shared by every worker on the host.
+
+    Registered with `limits` under the ``sqlite://`` scheme, e.g.
+    ``sqlite:///rate_limits.db`` (relative to DATA_DIR) or ``sqlite:////var/run/ndcuk/rate_limits.db``.
+    Each hit is a single upsert; sliding window checks run in one write
+    transaction so concurrent workers cannot overshoot the limit.
+
+    slowapi calls the storage synchronously on the event loop, so a write
+    waits at most RATE_LIMIT_SQLITE_TIMEOUT_MS for the file lock; when it is
+    still busy the request is let through (fail open) with a warning. That
+    suits a few workers on one host; with several hosts, or workers that
+    often contend for the lock, use ``redis://`` instead.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    # Expired counters are deleted every this many increments
+    PURGE_EVERY = 1000
+
+    # At most one "storage busy" warning per this many seconds
+    WARN_EVERY = 10.0
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        path = urlparse(uri).path[1:] if uri else ""
+        self._conn = sqlite3.connect(
+            settings.data_path(path or "rate_limits.db"),
+            timeout=settings.RATE_LIMIT_SQLITE_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._skipped = 0
+        self._warned_at = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limit_counters (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _fail_open(self, default: Any, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func under the connection lock; if the file stays locked, return default (allow the request)"""
+        try:
+            with self._lock:
+                return func(*args)
+        except sqlite3.OperationalError as e:
+            self._skipped += 1
+            now = time.monotonic()
+            if now - self._warned_at >= self.WARN_EVERY:
+                logger.warning(f"Rate limit storage unavailable, {self._skipped} check(s) allowed without limiting: {e}")
+                self._warned_at = now
+                self._skipped = 0
+            return default
+
+    def _incr(self, key: str, expiry: float, amount: int, now: float, elastic_expiry: bool = False) -> int:
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn.execute("DELETE FROM rate_limit_counters WHERE expires_at <= ?", (now,))
+        return self._conn.execute(
+            """
+            INSERT INTO rate_limit_counters (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+                expires_at = CASE WHEN expires_at <= ? OR ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING value
+            """,
+            (key, amount, now + expiry, now, now, elastic_expiry)
+        ).fetchone()[0]
+
+    def _get(self, key: str, now: float) -> Tuple[int, float]:
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM rate_limit_counters WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, now)
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        # elastic_expiry is only passed by limits 4.x (fixed-window-elastic-expiry)
+        return self._fail_open(0, self._incr, key, expiry, amount, time.time(), elastic_expiry)
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        return self._fail_open(0, lambda: self._get(key, now)[0])
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        return self._fail_open(now, lambda: self._get(key, now)[1])
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("DELETE FROM rate_limit_counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_counters WHERE key = ?", (key,))
+
+    def _sliding_window(self, key: str, expiry: int, now: float) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(previous_key, now)[0]
+        current_count = self._get(current_key, now)[0]
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        return self._fail_open(True, self._acquire_sliding_window_entry, key, limit, expiry, amount, time.time())
+
+    def _acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int, now: float) -> bool:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            # Keep the current window around for the whole next window too
+            self._incr(self.sliding_window_keys(key, expiry, now)[1], 2 * expiry, amount, now)
+            return True
+        finally:
+            self._conn.execute("COMMIT")
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        return self._fail_open((0, 0.0, 0, 0.0), self._sliding_window, key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
+
+# Shared limiter; per-route budgets come from settings.RATE_LIMIT_* and are
+# applied with @limiter.limit(...) on the routes (which need a `request` argument)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy=settings.RATE_LIMIT_STRATEGY
+)
@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, TypeVar
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.core.metrics import metrics
+import asyncio
+import hashlib
+import json
+import time
+
+T = TypeVar("T")
+
+# Reference datasets
+ACTIVE_BRANCHES = "branches:active"
+ROLES = "roles"
+ROLE_CATEGORIES = "role_categories"
+
+@dataclass(frozen=True)
+class ReferenceEntry(Generic[T]):
+    """A loaded dataset with the ETag of its content"""
+    value: T
+    etag: str
+    expires_at: float
+
+    def etag_for(self, *params: Any) -> str:
+        """ETag of a view (filter, single item) derived from this dataset"""
+        if not params:
+            return self.etag
+        digest = hashlib.sha1(f"{self.etag}|{params!r}".encode()).hexdigest()[:16]
+        return f'"{digest}"'
+
+class ReferenceDataCache:
+    """Read-through cache for tables that change a few times a year.
+
+    Each dataset is loaded as a whole, kept for REFERENCE_CACHE_TTL seconds and
+    dropped early by invalidate() from the service methods that write it.
+    Concurrent misses for the same dataset share a single load; a load that
+    an invalidate() overtook is returned to its callers but not cached. Other
+    workers pick up a write when their TTL runs out.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, ReferenceEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Bumped by invalidate(); a load only caches if it is unchanged
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, name: str, loader: Callable[[], Awaitable[T]]) -> ReferenceEntry[T]:
+        """Get a dataset, loading it with loader() when missing or expired"""
+        entry = self._entries.get(name)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            generation = self._generations.get(name, 0)
+            value = await loader()
+            content = json.dumps(jsonable_encoder(value), sort_keys=True, separators=(",", ":"))
+            entry = ReferenceEntry(
+                value=value,
+                etag=f'"{hashlib.sha1(content.encode()).hexdigest()[:16]}"',
+                expires_at=time.monotonic() + self.ttl
+            )
+            if self._generations.get(name, 0) == generation:
+                self._entries[name] = entry
+            return entry
+
+    def invalidate(self, *names: str) -> None:
+        """Drop datasets so the next read reloads them"""
+        for name in names:
+            self._entries.pop(name, None)
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def clear(self) -> None:
+        self.invalidate(*set(self._entries) | set(self._locks))
+
+# Global instance
+reference_cache = ReferenceDataCache(ttl=settings.REFERENCE_CACHE_TTL)
+metrics.register_cache("reference", reference_cache)
@@ -1,13 +1,32 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from functools import partial
+from typing import Any, Callable, Dict, Tuple, Union, Optional
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.cache import token_cache
+from app.core.metrics import metrics
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+try:
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+if settings.JWT_BACKEND == "pyjwt" and pyjwt is None:
+    logger.warning("JWT_BACKEND=pyjwt but PyJWT is not installed, falling back to python-jose")
+
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, family: Optional[str] = None
 ) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -15,13 +34,22 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    if family:
+        # Login session the token belongs to, so logout can revoke it
+        to_encode["fam"] = family
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def create_refresh_token(subject: Union[str, Any]) -> str:
+def create_refresh_token(
+    subject: Union[str, Any], jti: Optional[str] = None, family: Optional[str] = None
+) -> str:
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
+    if jti:
+        to_encode["jti"] = jti
+    if family:
+        to_encode["fam"] = family
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
@@ -31,11 +59,122 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_token(token: str) -> Optional[str]:
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """Run func in a pool worker and report how long the work itself took"""
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+password_hash_queue_time = metrics.histogram(
+    "password_hash_queue_seconds",
+    "Time password hash calls waited for a pool worker, by operation",
+    ("operation",)
+)
+
+password_hash_duration = metrics.histogram(
+    "password_hash_duration_seconds",
+    "Time password hash calls spent in bcrypt, by operation",
+    ("operation",)
+)
+
+password_hash_pending = metrics.gauge("password_hash_pending", "Password hash calls queued or running on the pool")
+
+class PasswordHashPool:
+    """Size-capped pool that keeps bcrypt work off the event loop.
+
+    bcrypt releases the GIL, so a thread pool already scales across cores;
+    a process pool can be used instead via PASSWORD_HASH_USE_PROCESSES.
+    The pool is created on first use. Pending calls, queue time and work time
+    are exported on /metrics (the _count series is the completed calls).
+    """
+
+    def __init__(self, max_workers: int = 0, use_processes: bool = False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a hashing function in the pool, recording queue and work time"""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        password_hash_pending.inc()
+        try:
+            result, work_time = await loop.run_in_executor(self.executor, partial(_timed, func, *args))
+        finally:
+            password_hash_pending.dec()
+        
+        operation = (func.__name__,)
+        password_hash_duration.observe(operation, work_time)
+        password_hash_queue_time.observe(operation, max(0.0, time.perf_counter() - submitted - work_time))
+        return result
+
+    def close(self) -> None:
+        """Release the pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# Global instance
+password_hash_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hash pool, for use from async code"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hash pool, for use from async code"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+def _decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """Verify signature and expiry with the configured JWT backend"""
+    if settings.JWT_BACKEND == "pyjwt" and pyjwt is not None:
+        try:
+            return pyjwt.decode(
+                token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+            )
+        except pyjwt.PyJWTError:
+            return None
+    
     try:
-        payload = jwt.decode(
+        return jwt.decode(
             token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
         )
-        return payload.get("sub")
     except jwt.JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """Verify a token and return its claims, or None if it is invalid or expired
+
+    Verified tokens are remembered (by SHA-256 digest) until they expire or
+    TOKEN_CACHE_TTL passes, whichever comes first, so a token that is sent
+    repeatedly is only decoded once.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return dict(claims)
+    
+    claims = _decode_token(token)
+    if claims is None:
+        return None
+    
+    ttl = settings.TOKEN_CACHE_TTL
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, claims, ttl=ttl)
+    return dict(claims)
\ No newline at end of file
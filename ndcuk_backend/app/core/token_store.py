@@ -0,0 +1,260 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.exceptions import AuthenticationException
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of consuming a refresh token
+CONSUMED = "consumed"
+REUSED = "reused"
+UNKNOWN = "unknown"
+
+@dataclass(frozen=True)
+class RefreshTokenRecord:
+    jti: str
+    family: str
+    user_id: str
+    expires_at: float
+
+class TokenStoreBackend(ABC):
+    """Persistence for issued refresh tokens.
+
+    consume() must be atomic: of two concurrent calls for the same jti,
+    exactly one may return CONSUMED. A revoked family is remembered until
+    expires_at, so tokens issued into it afterwards are refused by every
+    worker sharing the backend.
+    """
+
+    @abstractmethod
+    def add(self, record: RefreshTokenRecord) -> bool:
+        """Store a newly issued token; False if its family is revoked"""
+
+    @abstractmethod
+    def consume(self, jti: str, now: float) -> str:
+        """Mark a token as used; REUSED if it was already used or its family is revoked"""
+
+    @abstractmethod
+    def revoke_family(self, family: str, expires_at: float) -> None:
+        """Spend every token in the family and refuse new ones until expires_at"""
+
+    def purge(self, now: float) -> None:
+        """Drop expired tokens and revoked families"""
+
+    def close(self) -> None:
+        pass
+
+class MemoryTokenBackend(TokenStoreBackend):
+    """In-process stand-in for Redis; only correct with a single worker process"""
+
+    def __init__(self):
+        self._tokens: Dict[str, RefreshTokenRecord] = {}
+        self._used: Dict[str, bool] = {}
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: RefreshTokenRecord) -> bool:
+        with self._lock:
+            if record.family in self._revoked:
+                return False
+            self._tokens[record.jti] = record
+            self._used[record.jti] = False
+            return True
+
+    def consume(self, jti: str, now: float) -> str:
+        with self._lock:
+            record = self._tokens.get(jti)
+            if record is None or record.expires_at <= now:
+                return UNKNOWN
+            if self._used[jti] or record.family in self._revoked:
+                return REUSED
+            self._used[jti] = True
+            return CONSUMED
+
+    def revoke_family(self, family: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[family] = max(expires_at, self._revoked.get(family, 0))
+            for jti, record in self._tokens.items():
+                if record.family == family:
+                    self._used[jti] = True
+
+    def purge(self, now: float) -> None:
+        with self._lock:
+            for jti in [jti for jti, record in self._tokens.items() if record.expires_at <= now]:
+                del self._tokens[jti]
+                del self._used[jti]
+            for family in [family for family, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[family]
+
+class SQLiteTokenBackend(TokenStoreBackend):
+    """SQLite file shared by every worker process on the host"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS refresh_tokens (
+                    jti TEXT PRIMARY KEY,
+                    family TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    used INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS revoked_families (
+                    family TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def add(self, record: RefreshTokenRecord) -> bool:
+        # Checking the tombstone in the INSERT itself keeps the check atomic
+        # with respect to a revoke_family from another worker
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO refresh_tokens (jti, family, user_id, expires_at)
+                SELECT ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM revoked_families WHERE family = ?)
+                """,
+                (record.jti, record.family, record.user_id, record.expires_at, record.family)
+            )
+            return cursor.rowcount == 1
+
+    def consume(self, jti: str, now: float) -> str:
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE refresh_tokens SET used = 1
+                WHERE jti = ? AND used = 0 AND expires_at > ?
+                AND family NOT IN (SELECT family FROM revoked_families)
+                """,
+                (jti, now)
+            )
+            if cursor.rowcount == 1:
+                return CONSUMED
+            row = self._conn.execute(
+                "SELECT 1 FROM refresh_tokens WHERE jti = ? AND expires_at > ?", (jti, now)
+            ).fetchone()
+        return REUSED if row else UNKNOWN
+
+    def revoke_family(self, family: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    """
+                    INSERT INTO revoked_families (family, expires_at) VALUES (?, ?)
+                    ON CONFLICT(family) DO UPDATE SET expires_at = MAX(expires_at, excluded.expires_at)
+                    """,
+                    (family, expires_at)
+                )
+                self._conn.execute("UPDATE refresh_tokens SET used = 1 WHERE family = ?", (family,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def purge(self, now: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM refresh_tokens WHERE expires_at <= ?", (now,))
+            self._conn.execute("DELETE FROM revoked_families WHERE expires_at <= ?", (now,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class RefreshTokenStore:
+    """Refresh token rotation with reuse detection.
+
+    Every refresh consumes the presented jti (one keyed lookup in the backend)
+    and issues a new token in the same family. Presenting a spent token
+    revokes the whole family, and the backend refuses to issue into a revoked
+    family until its last token would have expired. Spent tokens and revoked
+    families are also kept in an in-process LRU, so replays in the same worker
+    are rejected without touching the backend. Access tokens are never looked
+    up here.
+
+    Backend calls run on the store's own single thread, not on the Supabase
+    pool, so they neither take database workers nor count as PostgREST round
+    trips in X-DB-Calls.
+    """
+
+    def __init__(self, backend: TokenStoreBackend, cache_size: int = 10000):
+        self.backend = backend
+        self.ttl = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        self.spent = TTLCache(maxsize=cache_size, ttl=self.ttl)
+        self.revoked_families = TTLCache(maxsize=cache_size, ttl=self.ttl)
+        # The backends serialise their own access, so one thread is enough
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-store")
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def issue(self, user_id: str, family: Optional[str] = None) -> RefreshTokenRecord:
+        """Register a new refresh token, starting a new family unless one is given"""
+        record = RefreshTokenRecord(
+            jti=uuid.uuid4().hex,
+            family=family or uuid.uuid4().hex,
+            user_id=user_id,
+            expires_at=time.time() + self.ttl
+        )
+        if self.revoked_families.get(record.family) or not await self._run(self.backend.add, record):
+            raise AuthenticationException("Refresh token family revoked")
+        return record
+
+    async def consume(self, jti: str, family: str) -> bool:
+        """Spend a refresh token; False if it is unknown, expired, reused or revoked"""
+        if self.revoked_families.get(family) or self.spent.get(jti):
+            await self.revoke_family(family)
+            return False
+
+        outcome = await self._run(self.backend.consume, jti, time.time())
+        self.spent.set(jti, True)
+        if outcome == REUSED:
+            logger.warning(f"Refresh token reuse detected, revoking family {family}")
+            await self.revoke_family(family)
+        return outcome == CONSUMED
+
+    async def revoke_family(self, family: str) -> None:
+        """Revoke every refresh token issued in a login session"""
+        self.revoked_families.set(family, True)
+        # No token issued before now outlives now + ttl, and none is issued after
+        await self._run(self.backend.revoke_family, family, time.time() + self.ttl)
+
+    async def purge(self) -> None:
+        """Drop expired tokens and revoked families from the backend"""
+        await self._run(self.backend.purge, time.time())
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.backend.close()
+
+def _create_backend() -> TokenStoreBackend:
+    if settings.REFRESH_TOKEN_STORE == "sqlite":
+        return SQLiteTokenBackend(settings.data_path(settings.REFRESH_TOKEN_STORE_PATH))
+    if settings.REFRESH_TOKEN_STORE != "memory":
+        logger.warning(f"Unknown REFRESH_TOKEN_STORE {settings.REFRESH_TOKEN_STORE!r}, using memory")
+    return MemoryTokenBackend()
+
+# Global instance
+refresh_token_store = RefreshTokenStore(_create_backend(), cache_size=settings.TOKEN_CACHE_SIZE)
@@ -1,25 +1,77 @@
 -- NDC UK Backend Database Functions
+-- Per-year membership number sequence (replaces COUNT(*) based numbering)
+CREATE TABLE IF NOT EXISTS membership_number_sequences (
+  year integer PRIMARY KEY,
+  last_value integer NOT NULL DEFAULT 0,
+  updated_at timestamp with time zone DEFAULT now()
+);
+
+-- Atomically reserve p_count consecutive numbers for a year and return the last one.
+-- The row lock taken by UPDATE/INSERT ... ON CONFLICT serialises concurrent callers,
+-- so every block handed out is unique; cost does not depend on the member count.
+CREATE OR REPLACE FUNCTION allocate_membership_numbers(p_year integer, p_count integer DEFAULT 1)
+RETURNS integer AS $$
+DECLARE
+  last_allocated integer;
+BEGIN
+  UPDATE membership_number_sequences
+  SET last_value = last_value + p_count, updated_at = NOW()
+  WHERE year = p_year
+  RETURNING last_value INTO last_allocated;
+  
+  IF NOT FOUND THEN
+    -- First allocation of the year: continue after any numbers already issued
+    INSERT INTO membership_number_sequences (year, last_value)
+    SELECT p_year, COALESCE(MAX(SPLIT_PART(membership_number, '-', 3)::integer), 0) + p_count
+    FROM user_profiles
+    WHERE membership_number LIKE 'NDC-' || p_year || '-%'
+    ON CONFLICT (year) DO UPDATE
+      SET last_value = membership_number_sequences.last_value + p_count, updated_at = NOW()
+    RETURNING last_value INTO last_allocated;
+  END IF;
+  
+  RETURN last_allocated;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
 -- Function to generate membership number
 CREATE OR REPLACE FUNCTION generate_membership_number()
 RETURNS TEXT AS $$
 DECLARE
-  new_number TEXT;
-  counter INTEGER;
+  current_year INTEGER;
 BEGIN
-  -- Get current year
-  SELECT EXTRACT(YEAR FROM NOW()) INTO counter;
+  current_year := EXTRACT(YEAR FROM NOW())::INTEGER;
   
   -- Generate format: NDC-YYYY-XXXX (e.g., NDC-2024-0001)
-  SELECT 'NDC-' || counter || '-' || LPAD((
-    SELECT COUNT(*) + 1 
-    FROM user_profiles 
-    WHERE membership_number IS NOT NULL
-  )::TEXT, 4, '0') INTO new_number;
-  
-  RETURN new_number;
+  RETURN 'NDC-' || current_year || '-' || LPAD(allocate_membership_numbers(current_year, 1)::TEXT, 4, '0');
 END;
 $$ LANGUAGE plpgsql;
 
+-- Ranked name search for UserService.list_users: names containing the term
+-- or similar to it (typos, word order), best match first. Terms of three or
+-- more characters use the trigram index. total is the match count before paging.
+CREATE OR REPLACE FUNCTION search_user_profiles(
+  p_query text,
+  p_status text DEFAULT NULL,
+  p_branch_ids uuid[] DEFAULT NULL,
+  p_limit integer DEFAULT 20,
+  p_offset integer DEFAULT 0
+)
+RETURNS TABLE (id uuid, rank real, total bigint) AS $$
+  SELECT p.id, word_similarity(p_query, p.full_name) AS rank, COUNT(*) OVER () AS total
+  FROM user_profiles p
+  WHERE (
+      p.full_name ILIKE '%' || replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+      OR p_query <% p.full_name
+    )
+    AND (p_status IS NULL OR p.status = p_status)
+    AND (p_branch_ids IS NULL OR EXISTS (
+      SELECT 1 FROM memberships m WHERE m.user_id = p.id AND m.branch_id = ANY (p_branch_ids)
+    ))
+  ORDER BY rank DESC, p.full_name, p.id
+  LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
 -- Function to handle user registration
 CREATE OR REPLACE FUNCTION handle_new_user()
 RETURNS TRIGGER AS $$
@@ -33,12 +85,14 @@ BEGIN
   INSERT INTO user_profiles (
     id, 
     full_name, 
+    email,
     membership_number,
     email_verified
   )
   VALUES (
     NEW.id,
     COALESCE(NEW.raw_user_meta_data->>'full_name', NEW.email),
+    NEW.email,
     membership_num,
     NEW.email_confirmed_at IS NOT NULL
   );
@@ -80,6 +134,26 @@ CREATE TRIGGER on_auth_user_confirmed
   AFTER UPDATE ON auth.users
   FOR EACH ROW EXECUTE FUNCTION handle_email_verification();
 
+-- Function to keep user_profiles.email in sync with auth.users
+CREATE OR REPLACE FUNCTION handle_email_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE user_profiles
+  SET email = NEW.email, updated_at = NOW()
+  WHERE id = NEW.id;
+  
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Trigger for email changes
+DROP TRIGGER IF EXISTS on_auth_user_email_changed ON auth.users;
+CREATE TRIGGER on_auth_user_email_changed
+  AFTER UPDATE OF email ON auth.users
+  FOR EACH ROW
+  WHEN (OLD.email IS DISTINCT FROM NEW.email)
+  EXECUTE FUNCTION handle_email_change();
+
 -- Function to validate role assignments based on NDC rules
 CREATE OR REPLACE FUNCTION validate_role_assignment(
   p_user_id uuid,
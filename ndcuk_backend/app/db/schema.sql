@@ -1,6 +1,7 @@
 -- NDC UK Backend Database Schema
 -- Enable necessary extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- ==============================================
 -- 1. CORE TABLES
@@ -58,6 +59,7 @@ CREATE TABLE roles (
 CREATE TABLE user_profiles (
   id uuid PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
   full_name text NOT NULL,
+  email text,  -- copy of auth.users.email, kept in sync by trigger
   phone text,
   address text,
   date_of_birth date,
@@ -118,6 +120,9 @@ CREATE INDEX idx_branches_chapter_id ON branches(chapter_id);
 CREATE INDEX idx_branches_status ON branches(status);
 CREATE INDEX idx_user_profiles_status ON user_profiles(status);
 CREATE INDEX idx_user_profiles_membership_number ON user_profiles(membership_number);
+CREATE INDEX idx_user_profiles_membership_number_pattern ON user_profiles(membership_number text_pattern_ops);
+CREATE INDEX idx_user_profiles_full_name_trgm ON user_profiles USING gin (full_name gin_trgm_ops);
+CREATE INDEX idx_user_profiles_email ON user_profiles(email);
 CREATE INDEX idx_memberships_user_id ON memberships(user_id);
 CREATE INDEX idx_memberships_branch_id ON memberships(branch_id);
 CREATE INDEX idx_memberships_status ON memberships(status);
@@ -125,4 +130,17 @@ CREATE INDEX idx_executive_assignments_user_id ON executive_assignments(user_id)
 CREATE INDEX idx_executive_assignments_role_id ON executive_assignments(role_id);
 CREATE INDEX idx_executive_assignments_active ON executive_assignments(is_active);
 CREATE INDEX idx_roles_scope_type ON roles(scope_type);
-CREATE INDEX idx_roles_category_id ON roles(category_id);
\ No newline at end of file
+CREATE INDEX idx_roles_category_id ON roles(category_id);
+
+-- ==============================================
+-- 3. VIEWS
+-- ==============================================
+
+-- Membership counts per branch and status (one aggregated query for branch listings)
+CREATE OR REPLACE VIEW branch_membership_counts AS
+SELECT
+  branch_id,
+  status,
+  COUNT(*)::integer AS member_count
+FROM memberships
+GROUP BY branch_id, status;
@@ -1,12 +1,17 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from fastapi.responses import JSONResponse, PlainTextResponse
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from app.core.config import settings
 from app.core.exceptions import NDCException
 from app.core.database import supabase_client
+from app.core.middleware import RequestInstrumentationMiddleware, RequestScopeMiddleware
+from app.core.rate_limit import limiter
+from app.core.health import db_health_monitor
+from app.core.metrics import metrics
+from app.core.security import password_hash_pool
+from app.core.token_store import refresh_token_store
 from app.api.v1.router import api_router
 import logging
 import time
@@ -15,9 +20,6 @@ import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
 # Create FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -39,22 +41,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-# Add logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"{request.method} {request.url.path} - {request.client.host}")
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
-    return response
+# Request-scoped loaders, so duplicate lookups within a request share one query
+app.add_middleware(RequestScopeMiddleware)
+
+# Add request timing and logging middleware (outermost, so it times CORS too)
+app.add_middleware(RequestInstrumentationMiddleware)
 
 # Exception handlers
 @app.exception_handler(NDCException)
@@ -93,37 +84,44 @@ async def root():
         "status": "running"
     }
 
-# Health check endpoint
+# Health check endpoints (served from the background probe, never hit the database)
 @app.get("/health")
-@limiter.limit(f"{settings.RATE_LIMIT_REQUESTS}/minute")
+@limiter.limit(settings.default_rate_limit)
 async def health_check(request: Request):
-    """Comprehensive health check"""
-    try:
-        # Check database connection
-        db_healthy = await supabase_client.health_check()
-        
-        health_status = {
-            "status": "healthy" if db_healthy else "unhealthy",
-            "timestamp": time.time(),
-            "version": settings.PROJECT_VERSION,
-            "environment": settings.ENVIRONMENT,
-            "database": "connected" if db_healthy else "disconnected"
-        }
-        
-        if not db_healthy:
-            return JSONResponse(status_code=503, content=health_status)
-        
-        return health_status
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "timestamp": time.time(),
-                "error": str(e) if settings.DEBUG else "Service unavailable"
-            }
-        )
+    """Comprehensive health check from the last database probe"""
+    health_status = {
+        "status": "healthy" if db_health_monitor.ready else "unhealthy",
+        "timestamp": time.time(),
+        "version": settings.PROJECT_VERSION,
+        "environment": settings.ENVIRONMENT,
+        **db_health_monitor.snapshot()
+    }
+    if settings.DEBUG and db_health_monitor.error:
+        health_status["error"] = db_health_monitor.error
+    
+    if not db_health_monitor.ready:
+        return JSONResponse(status_code=503, content=health_status)
+    
+    return health_status
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: the database answered a recent probe"""
+    if not db_health_monitor.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", **db_health_monitor.snapshot()})
+    return {"status": "ready", **db_health_monitor.snapshot()}
+
+# Prometheus metrics (latency histograms, cache hit ratios, requests in flight)
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        """Metrics of this worker in the Prometheus text format"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Startup event
 @app.on_event("startup")
@@ -133,21 +131,28 @@ async def startup_event():
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
     
-    # Test database connection
+    # Test database connection, then keep probing it in the background
+    if await db_health_monitor.probe():
+        logger.info(f"Database connection successful ({db_health_monitor.latency_ms:.0f}ms)")
+    else:
+        logger.warning("Database connection failed")
+    db_health_monitor.start()
+    
+    # Drop expired refresh tokens
     try:
-        db_healthy = await supabase_client.health_check()
-        if db_healthy:
-            logger.info("Database connection successful")
-        else:
-            logger.warning("Database connection failed")
+        await refresh_token_store.purge()
     except Exception as e:
-        logger.error(f"Database connection error: {e}")
+        logger.error(f"Refresh token purge error: {e}")
 
 # Shutdown event
 @app.on_event("shutdown") 
 async def shutdown_event():
     """Application shutdown tasks"""
     logger.info(f"Shutting down {settings.PROJECT_NAME}")
+    await db_health_monitor.stop()
+    supabase_client.close()
+    password_hash_pool.close()
+    refresh_token_store.close()
 
 # Add OpenAPI documentation customization
 app.openapi_tags = [
@@ -81,4 +81,5 @@ class BranchMembersResponse(BaseModel):
     members: List[MembershipResponse]
     total: int
     branch_id: str
-    branch_name: str
\ No newline at end of file
+    branch_name: str
+    next_cursor: Optional[str] = None
\ No newline at end of file
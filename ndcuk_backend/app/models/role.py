@@ -82,4 +82,17 @@ class ExecutiveAssignmentResponse(BaseModel):
 
 class RoleAssignmentList(BaseModel):
     assignments: List[ExecutiveAssignmentResponse]
-    total: int
\ No newline at end of file
+    total: int
+
+class BulkAssignmentResult(BaseModel):
+    index: int
+    user_id: str
+    role_id: str
+    success: bool
+    assignment: Optional[ExecutiveAssignmentResponse] = None
+    detail: Optional[str] = None
+
+class BulkAssignmentResponse(BaseModel):
+    results: List[BulkAssignmentResult]
+    assigned: int
+    failed: int
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime, date
 from enum import Enum
@@ -10,6 +10,10 @@ class UserStatus(str, Enum):
     SUSPENDED = "suspended"
     EXPIRED = "expired"
 
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
 class UserBase(BaseModel):
     full_name: str
     address: str  # Now required
@@ -50,7 +54,21 @@ class UserListResponse(BaseModel):
     total: int
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 class UserStatusUpdate(BaseModel):
     status: UserStatus
-    notes: Optional[str] = None
\ No newline at end of file
+    notes: Optional[str] = None
+
+class UserBulkApproval(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=500)
+
+class BulkApprovalResult(BaseModel):
+    user_id: str
+    success: bool
+    detail: Optional[str] = None
+
+class BulkApprovalResponse(BaseModel):
+    results: List[BulkApprovalResult]
+    approved: int
+    failed: int
@@ -1,53 +1,41 @@
 from typing import Optional, Dict, Any
 from supabase import Client
-from app.core.database import supabase_client
+from app.core.database import supabase_client, execute, run_sync
+from app.core.cache import principal_cache, list_total_cache
+from app.core.permissions import get_permissions
+from app.services.membership_number_service import membership_number_service
 from app.core.security import create_access_token, create_refresh_token, verify_token
+from app.core.token_store import refresh_token_store
+from app.services.branch_service import branch_service
 from app.core.exceptions import AuthenticationException, ValidationException
+from app.core.metrics import instrument_service
 from app.models.auth import UserRegister, UserLogin, SocialLogin, Token
 from app.models.user import UserResponse
 import logging
 
 logger = logging.getLogger(__name__)
 
+@instrument_service
 class AuthService:
     def __init__(self):
         self.client: Client = supabase_client.get_client()
     
-    async def _generate_membership_number(self) -> str:
-        """Generate unique membership number"""
-        try:
-            # Get current year
-            from datetime import datetime
-            current_year = datetime.now().year
-            
-            # Count existing memberships to get next number
-            count_response = self.client.table("user_profiles").select("id", count="exact").execute()
-            next_number = (count_response.count or 0) + 1
-            
-            # Format: NDC-YYYY-XXXX (e.g., NDC-2024-0001)
-            return f"NDC-{current_year}-{next_number:04d}"
-            
-        except Exception as e:
-            logger.error(f"Membership number generation error: {e}")
-            # Fallback to timestamp-based number
-            import time
-            return f"NDC-{datetime.now().year}-{int(time.time()) % 10000:04d}"
-    
     async def register_user(self, user_data: UserRegister) -> Dict[str, Any]:
         """Register a new user with email and password"""
         try:
-            # Find branch by name
-            branch_response = self.client.table("branches").select("id").eq(
-                "name", user_data.branch_name
-            ).eq("status", "active").execute()
+            # Find branch by name (served from the reference data cache)
+            branch = await branch_service.find_active_branch_by_name(user_data.branch_name)
             
-            if not branch_response.data:
+            if not branch:
                 raise ValidationException(f'Branch "{user_data.branch_name}" is not available or not active')
             
-            branch_id = branch_response.data[0]["id"]
+            branch_id = branch["id"]
+            
+            # Reserve a membership number (O(1), unique under concurrent sign-ups)
+            membership_number = await membership_number_service.next_membership_number()
             
             # Register user in Supabase Auth (without metadata to avoid trigger issues)
-            auth_response = self.client.auth.sign_up({
+            auth_response = await run_sync(self.client.auth.sign_up, {
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -55,13 +43,11 @@ class AuthService:
             if auth_response.user is None:
                 raise ValidationException("Registration failed")
             
-            # Generate membership number
-            membership_number = await self._generate_membership_number()
-            
             # Create user profile manually with all new fields
             profile_data = {
                 "id": auth_response.user.id,
                 "full_name": user_data.full_name,
+                "email": user_data.email,
                 "address": user_data.address,
                 "date_of_birth": user_data.date_of_birth.isoformat(),
                 "gender": user_data.gender,
@@ -76,13 +62,13 @@ class AuthService:
             if user_data.profile_picture:
                 profile_data["avatar_url"] = user_data.profile_picture
             
-            profile_response = self.client.table("user_profiles").insert(profile_data).execute()
+            profile_response = await execute(self.client.table("user_profiles").insert(profile_data))
             
             if not profile_response.data:
                 logger.error(f"Profile creation failed for user {auth_response.user.id}")
                 # Try to delete the auth user if profile creation fails
                 try:
-                    self.client.auth.admin.delete_user(auth_response.user.id)
+                    await run_sync(self.client.auth.admin.delete_user, auth_response.user.id)
                 except:
                     pass
                 raise ValidationException("Failed to create user profile")
@@ -94,11 +80,13 @@ class AuthService:
                 "status": "pending"
             }
             
-            membership_response = self.client.table("memberships").insert(membership_data).execute()
+            membership_response = await execute(self.client.table("memberships").insert(membership_data))
             
             if not membership_response.data:
                 logger.warning(f"Membership creation failed for user {auth_response.user.id}")
             
+            list_total_cache.clear()
+            
             return {
                 "message": "Registration successful. Please check your email to verify your account.",
                 "user_id": auth_response.user.id,
@@ -120,7 +108,7 @@ class AuthService:
         """Login user with email and password"""
         try:
             # Authenticate with Supabase
-            auth_response = self.client.auth.sign_in_with_password({
+            auth_response = await run_sync(self.client.auth.sign_in_with_password, {
                 "email": login_data.email,
                 "password": login_data.password
             })
@@ -134,15 +122,8 @@ class AuthService:
             if not user_profile:
                 raise AuthenticationException("User profile not found")
             
-            # Create tokens
-            access_token = create_access_token(auth_response.user.id)
-            refresh_token = create_refresh_token(auth_response.user.id)
-            
-            return Token(
-                access_token=access_token,
-                refresh_token=refresh_token,
-                token_type="bearer"
-            )
+            # Create tokens (a new refresh token family per login)
+            return await self._issue_tokens(auth_response.user.id)
             
         except Exception as e:
             logger.error(f"Login error: {e}")
@@ -161,22 +142,33 @@ class AuthService:
             logger.error(f"Social login error: {e}")
             raise AuthenticationException("Social login failed")
     
+    async def _issue_tokens(self, user_id: str, family: Optional[str] = None) -> Token:
+        """Create an access token and a registered refresh token in the given family"""
+        record = await refresh_token_store.issue(user_id, family)
+        return Token(
+            access_token=create_access_token(user_id, family=record.family),
+            refresh_token=create_refresh_token(user_id, jti=record.jti, family=record.family),
+            token_type="bearer"
+        )
+    
     async def refresh_access_token(self, refresh_token: str) -> Token:
-        """Refresh access token using refresh token"""
+        """Refresh access token using refresh token
+
+        The presented refresh token is spent and replaced (rotation); presenting
+        it again revokes every token issued from the same login.
+        """
         try:
-            user_id = verify_token(refresh_token)
-            if not user_id:
+            claims = verify_token(refresh_token)
+            if not claims or claims.get("type") != "refresh" or not claims.get("sub"):
                 raise AuthenticationException("Invalid refresh token")
+            if not claims.get("jti") or not claims.get("fam"):
+                raise AuthenticationException("Refresh token is not rotatable")
             
-            # Create new tokens
-            new_access_token = create_access_token(user_id)
-            new_refresh_token = create_refresh_token(user_id)
+            if not await refresh_token_store.consume(claims["jti"], claims["fam"]):
+                raise AuthenticationException("Refresh token revoked or already used")
             
-            return Token(
-                access_token=new_access_token,
-                refresh_token=new_refresh_token,
-                token_type="bearer"
-            )
+            # Create new tokens in the same family
+            return await self._issue_tokens(claims["sub"], claims["fam"])
             
         except Exception as e:
             logger.error(f"Token refresh error: {e}")
@@ -186,7 +178,7 @@ class AuthService:
         """Verify user email address"""
         try:
             # Verify with Supabase
-            verify_response = self.client.auth.verify_otp({
+            verify_response = await run_sync(self.client.auth.verify_otp, {
                 "token": token,
                 "type": "email"
             })
@@ -206,7 +198,7 @@ class AuthService:
     async def request_password_reset(self, email: str) -> Dict[str, Any]:
         """Request password reset"""
         try:
-            reset_response = self.client.auth.reset_password_email(email)
+            reset_response = await run_sync(self.client.auth.reset_password_email, email)
             
             return {
                 "message": "If an account with this email exists, a password reset link has been sent."
@@ -230,16 +222,21 @@ class AuthService:
             raise ValidationException("Password reset failed")
     
     async def get_user_with_roles(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user profile with role information"""
+        """Get user profile with role information (served from the principal cache when fresh)"""
+        cached = principal_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
             # Get user profile
-            profile_response = self.client.table("user_profiles").select(
+            profile_response = await execute(self.client.table("user_profiles").select(
                 """
                 *,
                 memberships (
                     id,
                     status,
                     branch_id,
+                    updated_at,
                     branches (
                         id,
                         name,
@@ -252,6 +249,7 @@ class AuthService:
                     chapter_id,
                     branch_id,
                     is_active,
+                    updated_at,
                     roles (
                         id,
                         name,
@@ -260,22 +258,30 @@ class AuthService:
                     )
                 )
                 """
-            ).eq("id", user_id).execute()
+            ).eq("id", user_id))
             
             if not profile_response.data:
                 return None
-                
-            return profile_response.data[0]
+            
+            user_data = profile_response.data[0]
+            # Compile permissions once so they are cached with the principal
+            get_permissions(user_data)
+            principal_cache.set(user_id, user_data)
+            return user_data
             
         except Exception as e:
             logger.error(f"Get user with roles error: {e}")
             return None
     
     async def logout_user(self, access_token: str) -> Dict[str, Any]:
-        """Logout user"""
+        """Logout user by revoking the refresh tokens of the token's login session
+
+        Access tokens stay stateless and simply run out (ACCESS_TOKEN_EXPIRE_MINUTES).
+        """
         try:
-            # In a real implementation, you might want to blacklist the token
-            # For now, just return success message
+            claims = verify_token(access_token)
+            if claims and claims.get("fam"):
+                await refresh_token_store.revoke_family(claims["fam"])
             return {"message": "Logged out successfully"}
             
         except Exception as e:
@@ -1,19 +1,61 @@
 from typing import List, Optional, Dict, Any
 from supabase import Client
-from app.core.database import supabase_client
+from app.core.database import supabase_client, execute, fetch_in, or_filter
+from app.core.cache import principal_cache, list_total_cache
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
 from app.models.branch import (
     BranchCreate, BranchUpdate, BranchResponse, MembershipCreate,
     MembershipUpdate, MembershipResponse, BranchMembersResponse, BranchStatus
 )
+from app.models.user import BulkApprovalResult, BulkApprovalResponse
+from app.utils.helpers import encode_cursor, decode_keyset_cursor
+from app.core.reference_data import reference_cache, ReferenceEntry, ACTIVE_BRANCHES
+from app.core.loaders import get_loader, clear_loader
+from app.core.metrics import instrument_service
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Request-scoped loader names
+BRANCHES = "branches"
+MEMBERSHIPS = "memberships"
+
+@instrument_service
 class BranchService:
     def __init__(self):
         self.client: Client = supabase_client.get_client()
     
+    async def _get_membership_counts(self, branch_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """Get membership counts per status for several branches in one aggregated query"""
+        rows = await fetch_in(
+            lambda: self.client.table("branch_membership_counts").select("branch_id, status, member_count"),
+            "branch_id", branch_ids
+        )
+        
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row["branch_id"], {})[row["status"]] = row["member_count"]
+        return counts
+    
+    def _build_branch_response(self, branch_data: Dict[str, Any], member_count: int) -> BranchResponse:
+        """Build branch response from a branches row with embedded chapter/creator"""
+        return BranchResponse(
+            id=branch_data["id"],
+            name=branch_data["name"],
+            location=branch_data["location"],
+            description=branch_data.get("description"),
+            min_members=branch_data.get("min_members", 20),
+            chapter_id=branch_data["chapter_id"],
+            chapter_name=(branch_data.get("chapters") or {}).get("name"),
+            status=branch_data["status"],
+            member_count=member_count,
+            created_by=branch_data.get("created_by"),
+            created_by_name=(branch_data.get("created_by_profile") or {}).get("full_name"),
+            created_at=branch_data["created_at"],
+            updated_at=branch_data["updated_at"]
+        )
+    
     async def list_branches(
         self, 
         chapter_id: Optional[str] = None,
@@ -37,32 +79,15 @@ class BranchService:
             else:
                 query = query.eq("status", "active")  # Default to active branches
             
-            response = query.execute()
+            response = await execute(query)
             
-            branches = []
-            for branch_data in response.data:
-                # Get member count
-                member_count_response = self.client.table("memberships").select(
-                    "id", count="exact"
-                ).eq("branch_id", branch_data["id"]).eq("status", "active").execute()
-                
-                member_count = member_count_response.count or 0
-                
-                branches.append(BranchResponse(
-                    id=branch_data["id"],
-                    name=branch_data["name"],
-                    location=branch_data["location"],
-                    description=branch_data.get("description"),
-                    min_members=branch_data.get("min_members", 20),
-                    chapter_id=branch_data["chapter_id"],
-                    chapter_name=branch_data.get("chapters", {}).get("name"),
-                    status=branch_data["status"],
-                    member_count=member_count,
-                    created_by=branch_data.get("created_by"),
-                    created_by_name=branch_data.get("created_by_profile", {}).get("full_name"),
-                    created_at=branch_data["created_at"],
-                    updated_at=branch_data["updated_at"]
-                ))
+            # One aggregated count query for all branches instead of one per branch
+            counts = await self._get_membership_counts([b["id"] for b in response.data])
+            
+            branches = [
+                self._build_branch_response(branch_data, counts.get(branch_data["id"], {}).get("active", 0))
+                for branch_data in response.data
+            ]
             
             return branches
             
@@ -70,56 +95,69 @@ class BranchService:
             logger.error(f"List branches error: {e}")
             raise ValidationException("Failed to fetch branches")
     
+    async def get_active_branches(self) -> ReferenceEntry[List[Dict[str, Any]]]:
+        """Active branches (id, name, location, description) from the reference cache"""
+        async def load() -> List[Dict[str, Any]]:
+            response = await execute(self.client.table("branches").select(
+                "id, name, location, description"
+            ).eq("status", "active").order("name"))
+            return response.data or []
+        
+        return await reference_cache.get(ACTIVE_BRANCHES, load)
+    
+    async def find_active_branch_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Look up an active branch by exact name"""
+        entry = await self.get_active_branches()
+        return next((branch for branch in entry.value if branch["name"] == name), None)
+    
     async def get_branch(self, branch_id: str) -> Optional[BranchResponse]:
         """Get branch by ID"""
         try:
-            response = self.client.table("branches").select(
-                """
-                *,
-                chapters (name),
-                created_by_profile:user_profiles!created_by (full_name)
-                """
-            ).eq("id", branch_id).execute()
-            
-            if not response.data:
-                return None
-            
-            branch_data = response.data[0]
-            
-            # Get member count
-            member_count_response = self.client.table("memberships").select(
-                "id", count="exact"
-            ).eq("branch_id", branch_id).eq("status", "active").execute()
-            
-            member_count = member_count_response.count or 0
-            
-            return BranchResponse(
-                id=branch_data["id"],
-                name=branch_data["name"],
-                location=branch_data["location"],
-                description=branch_data.get("description"),
-                min_members=branch_data.get("min_members", 20),
-                chapter_id=branch_data["chapter_id"],
-                chapter_name=branch_data.get("chapters", {}).get("name"),
-                status=branch_data["status"],
-                member_count=member_count,
-                created_by=branch_data.get("created_by"),
-                created_by_name=branch_data.get("created_by_profile", {}).get("full_name"),
-                created_at=branch_data["created_at"],
-                updated_at=branch_data["updated_at"]
-            )
+            branches = await self.get_branches_by_ids([branch_id])
+            return branches[0] if branches else None
             
         except Exception as e:
             logger.error(f"Get branch error: {e}")
             return None
     
+    async def get_branches_by_ids(self, branch_ids: List[str]) -> List[BranchResponse]:
+        """Get several branches with their member counts, in the order of branch_ids.
+        
+        Goes through the request's branch loader: one batched branches query
+        and one aggregated count query for all ids not loaded yet in this
+        request; ids that do not exist are skipped.
+        """
+        branches = await get_loader(BRANCHES, self._load_branches).load_many(dict.fromkeys(branch_ids))
+        return [branch for branch in branches if branch]
+    
+    async def _load_branches(self, branch_ids: List[str]) -> Dict[str, BranchResponse]:
+        """Load several branches and their active member counts concurrently"""
+        rows, counts = await asyncio.gather(
+            fetch_in(
+                lambda: self.client.table("branches").select(
+                    """
+                    *,
+                    chapters (name),
+                    created_by_profile:user_profiles!created_by (full_name)
+                    """
+                ),
+                "id", branch_ids
+            ),
+            self._get_membership_counts(branch_ids)
+        )
+        
+        return {
+            row["id"]: self._build_branch_response(row, counts.get(row["id"], {}).get("active", 0))
+            for row in rows
+        }
+    
     async def create_branch(self, branch_data: BranchCreate, creator_id: str) -> BranchResponse:
         """Create new branch"""
         try:
             # Check if branch name already exists in chapter
-            existing_response = self.client.table("branches").select("id").eq(
+            existing_response = await execute(self.client.table("branches").select("id").eq(
                 "chapter_id", branch_data.chapter_id
-            ).eq("name", branch_data.name).execute()
+            ).eq("name", branch_data.name))
             
             if existing_response.data:
                 raise ValidationException("Branch name already exists in this chapter")
@@ -128,11 +166,12 @@ class BranchService:
             branch_dict = branch_data.dict()
             branch_dict["created_by"] = creator_id
             
-            response = self.client.table("branches").insert(branch_dict).execute()
+            response = await execute(self.client.table("branches").insert(branch_dict))
             
             if not response.data:
                 raise ValidationException("Branch creation failed")
             
+            reference_cache.invalidate(ACTIVE_BRANCHES)
             return await self.get_branch(response.data[0]["id"])
             
         except Exception as e:
@@ -159,10 +198,13 @@ class BranchService:
             if update_dict:
                 update_dict["updated_at"] = "now()"
                 
-                response = self.client.table("branches").update(update_dict).eq("id", branch_id).execute()
+                response = await execute(self.client.table("branches").update(update_dict).eq("id", branch_id))
                 
                 if not response.data:
                     raise ValidationException("Branch update failed")
+                
+                reference_cache.invalidate(ACTIVE_BRANCHES)
+                clear_loader(BRANCHES, branch_id)
             
             return await self.get_branch(branch_id)
             
@@ -181,22 +223,20 @@ class BranchService:
                 raise NotFoundException("Branch not found")
             
             # Check if branch has active members
-            member_count_response = self.client.table("memberships").select(
-                "id", count="exact"
-            ).eq("branch_id", branch_id).eq("status", "active").execute()
-            
-            if member_count_response.count and member_count_response.count > 0:
+            if branch.member_count:
                 raise ValidationException("Cannot delete branch with active members")
             
             # Soft delete by setting status to inactive
-            response = self.client.table("branches").update({
+            response = await execute(self.client.table("branches").update({
                 "status": "inactive",
                 "updated_at": "now()"
-            }).eq("id", branch_id).execute()
+            }).eq("id", branch_id))
             
             if not response.data:
                 raise ValidationException("Branch deletion failed")
             
+            reference_cache.invalidate(ACTIVE_BRANCHES)
+            clear_loader(BRANCHES, branch_id)
             return {"message": "Branch deleted successfully"}
             
         except Exception as e:
@@ -210,36 +250,65 @@ class BranchService:
         branch_id: str,
         status: Optional[str] = None,
         page: int = 1,
-        size: int = 20
+        size: int = 20,
+        cursor: Optional[str] = None
     ) -> BranchMembersResponse:
-        """Get branch members with pagination"""
+        """Get branch members with pagination
+
+        Ordered by (joined_date, id) newest first; pass next_cursor back as
+        `cursor` for keyset pagination, otherwise `page` is used as an offset.
+        """
+        if cursor:
+            try:
+                last_joined_date, last_id = decode_keyset_cursor(cursor)
+            except ValueError:
+                raise ValidationException("Invalid cursor")
+        
         try:
             # Check if branch exists
-            branch = await self.get_branch(branch_id)
-            if not branch:
+            branch_response = await execute(self.client.table("branches").select("id, name").eq("id", branch_id))
+            if not branch_response.data:
                 raise NotFoundException("Branch not found")
             
+            branch_name = branch_response.data[0]["name"]
+            
+            # Totals come from the same per-branch aggregate as member_count,
+            # so the page query no longer needs count="exact"
+            status_counts = (await self._get_membership_counts([branch_id])).get(branch_id, {})
+            total = status_counts.get(status, 0) if status else sum(status_counts.values())
+            
             offset = (page - 1) * size
             
             query = self.client.table("memberships").select(
                 """
                 *,
-                user_profiles (full_name),
+                user_profiles (full_name, email),
                 approved_by_profile:user_profiles!approved_by (full_name)
-                """,
-                count="exact"
+                """
             ).eq("branch_id", branch_id)
             
             if status:
                 query = query.eq("status", status)
             
-            query = query.range(offset, offset + size - 1).order("joined_date", desc=True)
+            query = query.order("joined_date", desc=True).order("id", desc=True)
+            if cursor:
+                query = or_filter(
+                    query,
+                    f'joined_date.lt."{last_joined_date}",'
+                    f'and(joined_date.eq."{last_joined_date}",id.lt.{last_id})'
+                ).limit(size + 1)
+            else:
+                query = query.offset(offset).limit(size + 1)
+            
+            response = await execute(query)
             
-            response = query.execute()
+            rows = response.data[:size]
+            next_cursor = None
+            if len(response.data) > size:
+                next_cursor = encode_cursor(rows[-1]["joined_date"], rows[-1]["id"])
             
             members = []
-            for membership_data in response.data:
-                # Get user email (would need to join with auth.users in real implementation)
+            for membership_data in rows:
                 members.append(MembershipResponse(
                     id=membership_data["id"],
                     user_id=membership_data["user_id"],
@@ -247,22 +316,23 @@ class BranchService:
                     status=membership_data["status"],
                     joined_date=membership_data["joined_date"],
                     approved_by=membership_data.get("approved_by"),
-                    approved_by_name=membership_data.get("approved_by_profile", {}).get("full_name"),
+                    approved_by_name=(membership_data.get("approved_by_profile") or {}).get("full_name"),
                     approved_at=membership_data.get("approved_at"),
                     card_issued=membership_data["card_issued"],
                     card_issued_at=membership_data.get("card_issued_at"),
-                    user_name=membership_data.get("user_profiles", {}).get("full_name"),
-                    user_email="",  # Would need to fetch from auth.users
-                    branch_name=branch.name,
+                    user_name=(membership_data.get("user_profiles") or {}).get("full_name"),
+                    user_email=(membership_data.get("user_profiles") or {}).get("email") or "",
+                    branch_name=branch_name,
                     created_at=membership_data["created_at"],
                     updated_at=membership_data["updated_at"]
                 ))
             
             return BranchMembersResponse(
                 members=members,
-                total=response.count or 0,
+                total=total,
                 branch_id=branch_id,
-                branch_name=branch.name
+                branch_name=branch_name,
+                next_cursor=next_cursor
             )
             
         except Exception as e:
@@ -279,9 +349,9 @@ class BranchService:
         """Add member to branch"""
         try:
             # Check if membership already exists
-            existing_response = self.client.table("memberships").select("id").eq(
+            existing_response = await execute(self.client.table("memberships").select("id").eq(
                 "user_id", membership_data.user_id
-            ).eq("branch_id", membership_data.branch_id).execute()
+            ).eq("branch_id", membership_data.branch_id))
             
             if existing_response.data:
                 raise ValidationException("User is already a member of this branch")
@@ -290,11 +360,13 @@ class BranchService:
             membership_dict = membership_data.dict()
             membership_dict["status"] = "pending"  # New members start as pending
             
-            response = self.client.table("memberships").insert(membership_dict).execute()
+            response = await execute(self.client.table("memberships").insert(membership_dict))
             
             if not response.data:
                 raise ValidationException("Membership creation failed")
             
+            principal_cache.invalidate(membership_data.user_id)
+            list_total_cache.clear()
             return await self.get_membership(response.data[0]["id"])
             
         except Exception as e:
@@ -326,10 +398,14 @@ class BranchService:
                     update_dict["approved_by"] = updater_id
                     update_dict["approved_at"] = "now()"
                 
-                response = self.client.table("memberships").update(update_dict).eq("id", membership_id).execute()
+                response = await execute(self.client.table("memberships").update(update_dict).eq("id", membership_id))
                 
                 if not response.data:
                     raise ValidationException("Membership update failed")
+                
+                principal_cache.invalidate(membership.user_id)
+                clear_loader(MEMBERSHIPS, membership_id)
+                clear_loader(BRANCHES, membership.branch_id)  # member count
             
             return await self.get_membership(membership_id)
             
@@ -339,44 +415,122 @@ class BranchService:
                 raise
             raise ValidationException("Membership update failed")
     
+    async def approve_members(
+        self,
+        branch_id: str,
+        user_ids: List[str],
+        approver_id: str
+    ) -> BulkApprovalResponse:
+        """Approve many branch memberships at once with set-based updates"""
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            
+            existing_rows = await fetch_in(
+                lambda: self.client.table("memberships").select("id, user_id, status").eq("branch_id", branch_id),
+                "user_id", user_ids
+            )
+            memberships = {row["user_id"]: row for row in existing_rows}
+            
+            # Pending members get an approver; lapsed/suspended ones are just reactivated
+            pending_ids = [m["id"] for m in memberships.values() if m["status"] == "pending"]
+            reactivate_ids = [m["id"] for m in memberships.values() if m["status"] not in ("pending", "active")]
+            
+            # Updates are chunked by fetch_in to keep the `in` filters short
+            updated = set()
+            if pending_ids:
+                rows = await fetch_in(
+                    lambda: self.client.table("memberships").update({
+                        "status": "active",
+                        "approved_by": approver_id,
+                        "approved_at": "now()",
+                        "updated_at": "now()"
+                    }),
+                    "id", pending_ids
+                )
+                updated.update(row["id"] for row in rows)
+            
+            if reactivate_ids:
+                rows = await fetch_in(
+                    lambda: self.client.table("memberships").update({
+                        "status": "active",
+                        "updated_at": "now()"
+                    }),
+                    "id", reactivate_ids
+                )
+                updated.update(row["id"] for row in rows)
+            
+            results = []
+            for user_id in user_ids:
+                membership = memberships.get(user_id)
+                if not membership:
+                    results.append(BulkApprovalResult(user_id=user_id, success=False, detail="Membership not found"))
+                elif membership["status"] == "active":
+                    results.append(BulkApprovalResult(user_id=user_id, success=True, detail="Already active"))
+                elif membership["id"] in updated:
+                    principal_cache.invalidate(user_id)
+                    clear_loader(MEMBERSHIPS, membership["id"])
+                    results.append(BulkApprovalResult(user_id=user_id, success=True))
+                else:
+                    results.append(BulkApprovalResult(user_id=user_id, success=False, detail="Membership update failed"))
+            
+            clear_loader(BRANCHES, branch_id)  # member count
+            if updated:
+                list_total_cache.clear()
+            approved = sum(1 for result in results if result.success)
+            
+            return BulkApprovalResponse(
+                results=results,
+                approved=approved,
+                failed=len(results) - approved
+            )
+            
+        except Exception as e:
+            logger.error(f"Bulk approve members error: {e}")
+            raise ValidationException("Bulk member approval failed")
+    
     async def get_membership(self, membership_id: str) -> Optional[MembershipResponse]:
         """Get membership by ID"""
         try:
-            response = self.client.table("memberships").select(
+            return await get_loader(MEMBERSHIPS, self._load_memberships).load(membership_id)
+            
+        except Exception as e:
+            logger.error(f"Get membership error: {e}")
+            return None
+    
+    async def _load_memberships(self, membership_ids: List[str]) -> Dict[str, MembershipResponse]:
+        """Load several memberships with user, branch and approver names"""
+        rows = await fetch_in(
+            lambda: self.client.table("memberships").select(
                 """
                 *,
-                user_profiles (full_name),
+                user_profiles (full_name, email),
                 branches (name),
                 approved_by_profile:user_profiles!approved_by (full_name)
                 """
-            ).eq("id", membership_id).execute()
-            
-            if not response.data:
-                return None
-            
-            membership_data = response.data[0]
-            
-            return MembershipResponse(
+            ),
+            "id", membership_ids
+        )
+        
+        return {
+            membership_data["id"]: MembershipResponse(
                 id=membership_data["id"],
                 user_id=membership_data["user_id"],
                 branch_id=membership_data["branch_id"],
                 status=membership_data["status"],
                 joined_date=membership_data["joined_date"],
                 approved_by=membership_data.get("approved_by"),
-                approved_by_name=membership_data.get("approved_by_profile", {}).get("full_name"),
+                approved_by_name=(membership_data.get("approved_by_profile") or {}).get("full_name"),
                 approved_at=membership_data.get("approved_at"),
                 card_issued=membership_data["card_issued"],
                 card_issued_at=membership_data.get("card_issued_at"),
-                user_name=membership_data.get("user_profiles", {}).get("full_name"),
-                user_email="",  # Would need to fetch from auth.users
-                branch_name=membership_data.get("branches", {}).get("name"),
+                user_name=(membership_data.get("user_profiles") or {}).get("full_name"),
+                user_email=(membership_data.get("user_profiles") or {}).get("email") or "",
+                branch_name=(membership_data.get("branches") or {}).get("name"),
                 created_at=membership_data["created_at"],
                 updated_at=membership_data["updated_at"]
             )
-            
-        except Exception as e:
-            logger.error(f"Get membership error: {e}")
-            return None
+            for membership_data in rows
+        }
 
 # Global instance
 branch_service = BranchService()
\ No newline at end of file
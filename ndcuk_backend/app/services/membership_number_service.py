@@ -0,0 +1,51 @@
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+from supabase import Client
+from app.core.config import settings
+from app.core.database import supabase_client, execute
+from app.utils.helpers import generate_membership_number
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MembershipNumberService:
+    """Allocates NDC-YYYY-XXXX membership numbers from a per-year database sequence.
+
+    With a block size above 1 each worker leases a range of numbers in one
+    RPC and hands them out locally; leases never overlap, so numbers stay
+    unique across workers (unused numbers in a lease are skipped on restart).
+    """
+
+    def __init__(self, block_size: int = settings.MEMBERSHIP_NUMBER_BLOCK_SIZE):
+        self.client: Client = supabase_client.get_client()
+        self.block_size = max(1, block_size)
+        self._blocks: Dict[int, Tuple[int, int]] = {}
+        self._lock = asyncio.Lock()
+    
+    async def _allocate(self, year: int, count: int) -> int:
+        """Reserve `count` numbers for `year` and return the last one"""
+        response = await execute(self.client.rpc("allocate_membership_numbers", {
+            "p_year": year,
+            "p_count": count
+        }))
+        return int(response.data)
+    
+    async def next_membership_number(self, year: Optional[int] = None) -> str:
+        """Get the next unique membership number for the given (default current) year"""
+        year = year or datetime.now().year
+        
+        if self.block_size == 1:
+            return generate_membership_number(year, await self._allocate(year, 1))
+        
+        async with self._lock:
+            next_value, last_value = self._blocks.get(year, (1, 0))
+            if next_value > last_value:
+                last_value = await self._allocate(year, self.block_size)
+                next_value = last_value - self.block_size + 1
+            self._blocks[year] = (next_value + 1, last_value)
+        
+        return generate_membership_number(year, next_value)
+
+# Global instance
+membership_number_service = MembershipNumberService()
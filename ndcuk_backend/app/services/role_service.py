@@ -1,59 +1,116 @@
 from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
 from supabase import Client
-from app.core.database import supabase_client
+from app.core.database import supabase_client, execute, fetch_in
+from app.core.cache import principal_cache
+from app.core.loaders import get_loader, clear_loader
+from app.core.reference_data import reference_cache, ReferenceEntry, ROLES, ROLE_CATEGORIES
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
+from app.core.metrics import instrument_service
 from app.models.role import (
     RoleResponse, RoleCategoryResponse, ExecutiveAssignmentCreate, 
-    ExecutiveAssignmentResponse, ExecutiveAssignmentUpdate
+    ExecutiveAssignmentResponse, ExecutiveAssignmentUpdate,
+    BulkAssignmentResult, BulkAssignmentResponse
 )
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Request-scoped loader names
+ASSIGNMENTS = "executive_assignments"
+ACTIVE_ASSIGNMENTS_BY_USER = "executive_assignments:active_by_user"
+
+@instrument_service
 class RoleService:
     def __init__(self):
         self.client: Client = supabase_client.get_client()
     
-    async def list_roles(self, category_id: Optional[str] = None, scope_type: Optional[str] = None) -> List[RoleResponse]:
-        """List all active roles with optional filtering"""
-        try:
-            query = self.client.table("roles").select(
+    def _invalidate_assignments(self, user_id: str, *assignment_ids: str) -> None:
+        """Forget a user's cached principal and assignments after a write"""
+        principal_cache.invalidate(user_id)
+        clear_loader(ACTIVE_ASSIGNMENTS_BY_USER, user_id)
+        clear_loader(ASSIGNMENTS, *assignment_ids)
+    
+    async def _load_active_assignments(self, user_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Load the active assignments (branch_id, role name) of several users"""
+        rows = await fetch_in(
+            lambda: self.client.table("executive_assignments").select(
+                "user_id, branch_id, roles (name)"
+            ).eq("is_active", True),
+            "user_id", user_ids
+        )
+        
+        assignments: Dict[str, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+        for row in rows:
+            assignments[row["user_id"]].append(row)
+        return assignments
+    
+    async def _get_active_assignments(self, user_id: str) -> List[Dict[str, Any]]:
+        """Active assignments of a user, as used for assignment permission checks"""
+        return await get_loader(ACTIVE_ASSIGNMENTS_BY_USER, self._load_active_assignments).load(user_id) or []
+    
+    def _build_role_response(self, role_data: Dict[str, Any]) -> RoleResponse:
+        """Build a RoleResponse from a roles row with embedded role_categories"""
+        return RoleResponse(
+            id=role_data["id"],
+            name=role_data["name"],
+            scope_type=role_data["scope_type"],
+            category_id=role_data.get("category_id"),
+            category_name=(role_data.get("role_categories") or {}).get("name"),
+            description=role_data.get("description"),
+            permissions=role_data.get("permissions", {}),
+            is_active=role_data["is_active"],
+            created_at=role_data["created_at"],
+            updated_at=role_data["updated_at"]
+        )
+    
+    async def get_roles(self) -> ReferenceEntry[Dict[str, RoleResponse]]:
+        """All roles (active and inactive) by id, ordered by name, from the reference cache"""
+        async def load() -> Dict[str, RoleResponse]:
+            response = await execute(self.client.table("roles").select(
                 """
                 *,
                 role_categories (
                     name
                 )
                 """
-            ).eq("is_active", True).order("name")
-            
-            if category_id:
-                query = query.eq("category_id", category_id)
-            
-            if scope_type:
-                query = query.eq("scope_type", scope_type)
-            
-            response = query.execute()
-            
-            roles = []
-            for role_data in response.data:
-                category_name = None
-                if role_data.get("role_categories"):
-                    category_name = role_data["role_categories"]["name"]
-                
-                roles.append(RoleResponse(
-                    id=role_data["id"],
-                    name=role_data["name"],
-                    scope_type=role_data["scope_type"],
-                    category_id=role_data.get("category_id"),
-                    category_name=category_name,
-                    description=role_data.get("description"),
-                    permissions=role_data.get("permissions", {}),
-                    is_active=role_data["is_active"],
-                    created_at=role_data["created_at"],
-                    updated_at=role_data["updated_at"]
-                ))
-            
-            return roles
+            ).order("name"))
+            return {role_data["id"]: self._build_role_response(role_data) for role_data in response.data}
+        
+        return await reference_cache.get(ROLES, load)
+    
+    async def get_role_categories(self) -> ReferenceEntry[List[RoleCategoryResponse]]:
+        """All role categories in sort order, from the reference cache"""
+        async def load() -> List[RoleCategoryResponse]:
+            response = await execute(self.client.table("role_categories").select("*").order("sort_order"))
+            return [
+                RoleCategoryResponse(
+                    id=category_data["id"],
+                    name=category_data["name"],
+                    description=category_data.get("description"),
+                    sort_order=category_data["sort_order"],
+                    created_at=category_data["created_at"]
+                )
+                for category_data in response.data
+            ]
+        
+        return await reference_cache.get(ROLE_CATEGORIES, load)
+    
+    def invalidate_reference_data(self) -> None:
+        """Drop cached roles and role categories; call after writing either table"""
+        reference_cache.invalidate(ROLES, ROLE_CATEGORIES)
+    
+    async def list_roles(self, category_id: Optional[str] = None, scope_type: Optional[str] = None) -> List[RoleResponse]:
+        """List all active roles with optional filtering"""
+        try:
+            entry = await self.get_roles()
+            return [
+                role for role in entry.value.values()
+                if role.is_active
+                and (not category_id or role.category_id == category_id)
+                and (not scope_type or role.scope_type == scope_type)
+            ]
             
         except Exception as e:
             logger.error(f"List roles error: {e}")
@@ -62,35 +119,25 @@ class RoleService:
     async def get_role(self, role_id: str) -> Optional[RoleResponse]:
         """Get role by ID"""
         try:
-            response = self.client.table("roles").select(
+            entry = await self.get_roles()
+            role = entry.value.get(role_id)
+            if role is not None:
+                return role
+            
+            # Not in the cached set (e.g. created directly in the database since)
+            response = await execute(self.client.table("roles").select(
                 """
                 *,
                 role_categories (
                     name
                 )
                 """
-            ).eq("id", role_id).execute()
+            ).eq("id", role_id))
             
             if not response.data:
                 return None
             
-            role_data = response.data[0]
-            category_name = None
-            if role_data.get("role_categories"):
-                category_name = role_data["role_categories"]["name"]
-            
-            return RoleResponse(
-                id=role_data["id"],
-                name=role_data["name"],
-                scope_type=role_data["scope_type"],
-                category_id=role_data.get("category_id"),
-                category_name=category_name,
-                description=role_data.get("description"),
-                permissions=role_data.get("permissions", {}),
-                is_active=role_data["is_active"],
-                created_at=role_data["created_at"],
-                updated_at=role_data["updated_at"]
-            )
+            return self._build_role_response(response.data[0])
             
         except Exception as e:
             logger.error(f"Get role error: {e}")
@@ -99,19 +146,8 @@ class RoleService:
     async def list_role_categories(self) -> List[RoleCategoryResponse]:
         """List all role categories"""
         try:
-            response = self.client.table("role_categories").select("*").order("sort_order").execute()
-            
-            categories = []
-            for category_data in response.data:
-                categories.append(RoleCategoryResponse(
-                    id=category_data["id"],
-                    name=category_data["name"],
-                    description=category_data.get("description"),
-                    sort_order=category_data["sort_order"],
-                    created_at=category_data["created_at"]
-                ))
-            
-            return categories
+            entry = await self.get_role_categories()
+            return list(entry.value)
             
         except Exception as e:
             logger.error(f"List role categories error: {e}")
@@ -137,9 +173,9 @@ class RoleService:
                 raise AuthorizationException("Not authorized to assign this role")
             
             # Check if role already assigned and active
-            existing_response = self.client.table("executive_assignments").select("id").eq(
+            existing_response = await execute(self.client.table("executive_assignments").select("id").eq(
                 "user_id", assignment_data.user_id
-            ).eq("role_id", assignment_data.role_id).eq("is_active", True).execute()
+            ).eq("role_id", assignment_data.role_id).eq("is_active", True))
             
             if existing_response.data:
                 raise ValidationException("User already has this role assigned")
@@ -148,11 +184,12 @@ class RoleService:
             assignment_dict = assignment_data.dict(exclude_none=True)
             assignment_dict["appointed_by"] = assigner_id
             
-            response = self.client.table("executive_assignments").insert(assignment_dict).execute()
+            response = await execute(self.client.table("executive_assignments").insert(assignment_dict))
             
             if not response.data:
                 raise ValidationException("Role assignment failed")
             
+            self._invalidate_assignments(assignment_data.user_id)
             return await self.get_assignment(response.data[0]["id"])
             
         except Exception as e:
@@ -161,6 +198,133 @@ class RoleService:
                 raise
             raise ValidationException("Role assignment failed")
     
+    async def bulk_assign_roles(
+        self,
+        assignments_data: List[ExecutiveAssignmentCreate],
+        assigner_id: str
+    ) -> BulkAssignmentResponse:
+        """Assign many roles at once: prefetch, validate in memory, insert in one batch"""
+        try:
+            user_ids = list({a.user_id for a in assignments_data})
+            role_ids = list({a.role_id for a in assignments_data})
+            
+            # Prefetch assigner rights, target users and roles and existing active assignments once
+            assigner_assignments = await self._get_active_assignments(assigner_id)
+            
+            role_rows = await fetch_in(
+                lambda: self.client.table("roles").select("id, name, scope_type"),
+                "id", role_ids
+            )
+            roles = {role["id"]: role for role in role_rows}
+            
+            # Unknown users fail their own rows instead of the foreign key failing the whole insert
+            user_rows = await fetch_in(lambda: self.client.table("user_profiles").select("id"), "id", user_ids)
+            users = {row["id"] for row in user_rows}
+            
+            taken = set()
+            if roles and users:
+                existing_rows = await fetch_in(
+                    lambda: self.client.table("executive_assignments").select(
+                        "user_id, role_id"
+                    ).in_("role_id", list(roles)).eq("is_active", True),
+                    "user_id", users
+                )
+                taken = {(row["user_id"], row["role_id"]) for row in existing_rows}
+            
+            results: List[Optional[BulkAssignmentResult]] = [None] * len(assignments_data)
+            to_insert = []
+            for index, assignment_data in enumerate(assignments_data):
+                key = (assignment_data.user_id, assignment_data.role_id)
+                detail = None
+                role = roles.get(assignment_data.role_id)
+                
+                if not role:
+                    detail = "Role not found"
+                elif assignment_data.user_id not in users:
+                    detail = "User not found"
+                elif not self._can_assign(assigner_assignments, role, assignment_data.branch_id):
+                    detail = "Not authorized to assign this role"
+                elif key in taken:
+                    detail = "User already has this role assigned"
+                
+                if detail:
+                    results[index] = BulkAssignmentResult(
+                        index=index, user_id=key[0], role_id=key[1], success=False, detail=detail
+                    )
+                    continue
+                
+                # Later rows for the same user/role in this batch count as duplicates
+                taken.add(key)
+                # Every row carries the same columns so the multi-row insert is uniform
+                assignment_dict = assignment_data.dict()
+                assignment_dict["start_date"] = assignment_dict["start_date"] or datetime.now(timezone.utc)
+                assignment_dict["appointed_by"] = assigner_id
+                to_insert.append((index, assignment_dict))
+            
+            if to_insert:
+                # Single multi-row INSERT: the batch is applied atomically
+                insert_response = await execute(self.client.table("executive_assignments").insert(
+                    jsonable_encoder([row for _, row in to_insert])
+                ))
+                created_ids = [row["id"] for row in insert_response.data]
+                
+                created = {
+                    (assignment.user_id, assignment.role_id): assignment
+                    for assignment in (await self._load_assignments(created_ids)).values()
+                }
+                
+                for index, assignment_dict in to_insert:
+                    key = (assignment_dict["user_id"], assignment_dict["role_id"])
+                    self._invalidate_assignments(key[0])
+                    assignment = created.get(key)
+                    results[index] = BulkAssignmentResult(
+                        index=index,
+                        user_id=key[0],
+                        role_id=key[1],
+                        success=assignment is not None,
+                        assignment=assignment,
+                        detail=None if assignment else "Role assignment failed"
+                    )
+            
+            assigned = sum(1 for result in results if result.success)
+            
+            return BulkAssignmentResponse(
+                results=results,
+                assigned=assigned,
+                failed=len(results) - assigned
+            )
+            
+        except Exception as e:
+            logger.error(f"Bulk assign roles error: {e}")
+            raise ValidationException("Bulk role assignment failed")
+    
+    def _can_assign(
+        self,
+        assigner_assignments: List[Dict[str, Any]],
+        role: Dict[str, Any],
+        target_branch_id: Optional[str]
+    ) -> bool:
+        """In-memory mirror of the can_assign_role database function"""
+        for assigner_assignment in assigner_assignments:
+            assigner_role = (assigner_assignment.get("roles") or {}).get("name")
+            
+            # Chapter Chairman can assign any role
+            if assigner_role == "Chairman":
+                return True
+            
+            # Chapter Secretary can assign committee roles
+            if assigner_role == "Secretary" and "Committee" in role["name"]:
+                return True
+            
+            # Branch Chairman can assign branch-level roles in their branch
+            if (assigner_role == "Branch Chairman"
+                    and role["scope_type"] in ("branch", "both")
+                    and target_branch_id is not None
+                    and assigner_assignment.get("branch_id") == target_branch_id):
+                return True
+        
+        return False
+    
     async def update_assignment(
         self, 
         assignment_id: str, 
@@ -182,11 +346,12 @@ class RoleService:
             update_dict = update_data.dict(exclude_none=True)
             update_dict["updated_at"] = "now()"
             
-            response = self.client.table("executive_assignments").update(update_dict).eq("id", assignment_id).execute()
+            response = await execute(self.client.table("executive_assignments").update(update_dict).eq("id", assignment_id))
             
             if not response.data:
                 raise ValidationException("Assignment update failed")
             
+            self._invalidate_assignments(assignment.user_id, assignment_id)
             return await self.get_assignment(assignment_id)
             
         except Exception as e:
@@ -204,15 +369,16 @@ class RoleService:
                 raise AuthorizationException("Not authorized to remove this assignment")
             
             # Soft delete by setting is_active to false
-            response = self.client.table("executive_assignments").update({
+            response = await execute(self.client.table("executive_assignments").update({
                 "is_active": False,
                 "end_date": "now()",
                 "updated_at": "now()"
-            }).eq("id", assignment_id).execute()
+            }).eq("id", assignment_id))
             
             if not response.data:
                 raise NotFoundException("Assignment not found")
             
+            self._invalidate_assignments(response.data[0]["user_id"], assignment_id)
             return {"message": "Role assignment removed successfully"}
             
         except Exception as e:
@@ -221,10 +387,41 @@ class RoleService:
                 raise
             raise ValidationException("Assignment removal failed")
     
+    def _build_assignment_response(self, assignment_data: Dict[str, Any]) -> ExecutiveAssignmentResponse:
+        """Build assignment response from a row with embedded user/role/chapter/branch names"""
+        return ExecutiveAssignmentResponse(
+            id=assignment_data["id"],
+            user_id=assignment_data["user_id"],
+            user_name=(assignment_data.get("user_profiles") or {}).get("full_name"),
+            role_id=assignment_data["role_id"],
+            role_name=(assignment_data.get("roles") or {}).get("name"),
+            chapter_id=assignment_data.get("chapter_id"),
+            chapter_name=(assignment_data.get("chapters") or {}).get("name"),
+            branch_id=assignment_data.get("branch_id"),
+            branch_name=(assignment_data.get("branches") or {}).get("name"),
+            start_date=assignment_data["start_date"],
+            end_date=assignment_data.get("end_date"),
+            is_active=assignment_data["is_active"],
+            appointed_by=assignment_data.get("appointed_by"),
+            appointed_by_name=(assignment_data.get("appointed_by_profile") or {}).get("full_name"),
+            notes=assignment_data.get("notes"),
+            created_at=assignment_data["created_at"],
+            updated_at=assignment_data["updated_at"]
+        )
+    
     async def get_assignment(self, assignment_id: str) -> Optional[ExecutiveAssignmentResponse]:
         """Get assignment by ID"""
         try:
-            response = self.client.table("executive_assignments").select(
+            return await get_loader(ASSIGNMENTS, self._load_assignments).load(assignment_id)
+            
+        except Exception as e:
+            logger.error(f"Get assignment error: {e}")
+            return None
+    
+    async def _load_assignments(self, assignment_ids: List[str]) -> Dict[str, ExecutiveAssignmentResponse]:
+        """Load several assignments with user/role/chapter/branch names"""
+        rows = await fetch_in(
+            lambda: self.client.table("executive_assignments").select(
                 """
                 *,
                 user_profiles (full_name),
@@ -233,36 +430,10 @@ class RoleService:
                 branches (name),
                 appointed_by_profile:user_profiles!appointed_by (full_name)
                 """
-            ).eq("id", assignment_id).execute()
-            
-            if not response.data:
-                return None
-            
-            assignment_data = response.data[0]
-            
-            return ExecutiveAssignmentResponse(
-                id=assignment_data["id"],
-                user_id=assignment_data["user_id"],
-                user_name=assignment_data.get("user_profiles", {}).get("full_name"),
-                role_id=assignment_data["role_id"],
-                role_name=assignment_data.get("roles", {}).get("name"),
-                chapter_id=assignment_data.get("chapter_id"),
-                chapter_name=assignment_data.get("chapters", {}).get("name"),
-                branch_id=assignment_data.get("branch_id"),
-                branch_name=assignment_data.get("branches", {}).get("name"),
-                start_date=assignment_data["start_date"],
-                end_date=assignment_data.get("end_date"),
-                is_active=assignment_data["is_active"],
-                appointed_by=assignment_data.get("appointed_by"),
-                appointed_by_name=assignment_data.get("appointed_by_profile", {}).get("full_name"),
-                notes=assignment_data.get("notes"),
-                created_at=assignment_data["created_at"],
-                updated_at=assignment_data["updated_at"]
-            )
-            
-        except Exception as e:
-            logger.error(f"Get assignment error: {e}")
-            return None
+            ),
+            "id", assignment_ids
+        )
+        return {row["id"]: self._build_assignment_response(row) for row in rows}
     
     async def list_user_assignments(self, user_id: str, active_only: bool = True) -> List[ExecutiveAssignmentResponse]:
         """List user's role assignments"""
@@ -279,7 +450,7 @@ class RoleService:
             if active_only:
                 query = query.eq("is_active", True)
             
-            response = query.execute()
+            response = await execute(query)
             
             assignments = []
             for assignment_data in response.data:
@@ -287,11 +458,11 @@ class RoleService:
                     id=assignment_data["id"],
                     user_id=assignment_data["user_id"],
                     role_id=assignment_data["role_id"],
-                    role_name=assignment_data.get("roles", {}).get("name"),
+                    role_name=(assignment_data.get("roles") or {}).get("name"),
                     chapter_id=assignment_data.get("chapter_id"),
-                    chapter_name=assignment_data.get("chapters", {}).get("name"),
+                    chapter_name=(assignment_data.get("chapters") or {}).get("name"),
                     branch_id=assignment_data.get("branch_id"),
-                    branch_name=assignment_data.get("branches", {}).get("name"),
+                    branch_name=(assignment_data.get("branches") or {}).get("name"),
                     start_date=assignment_data["start_date"],
                     end_date=assignment_data.get("end_date"),
                     is_active=assignment_data["is_active"],
@@ -318,13 +489,13 @@ class RoleService:
         """Validate if assigner can assign role to user"""
         try:
             # Call database function
-            response = self.client.rpc("can_assign_role", {
+            response = await execute(self.client.rpc("can_assign_role", {
                 "assigner_user_id": assigner_id,
                 "target_user_id": user_id,
                 "role_id": role_id,
                 "target_chapter_id": chapter_id,
                 "target_branch_id": branch_id
-            }).execute()
+            }))
             
             return response.data if response.data is not None else False
             
@@ -340,22 +511,17 @@ class RoleService:
             if not assignment:
                 return False
             
-            # Check if updater has permission (simplified logic)
-            updater_roles = self.client.table("executive_assignments").select(
-                "roles (name)"
-            ).eq("user_id", updater_id).eq("is_active", True).execute()
+            # Check if updater has permission (simplified logic); one read
+            # of the updater's active assignments covers role and branch
+            updater_assignments = await self._get_active_assignments(updater_id)
             
-            for role_assignment in updater_roles.data:
-                role_name = role_assignment.get("roles", {}).get("name")
+            for role_assignment in updater_assignments:
+                role_name = (role_assignment.get("roles") or {}).get("name")
                 if role_name in ["Chairman", "Secretary"]:
                     return True
                 if role_name == "Branch Chairman" and assignment.branch_id:
                     # Check if same branch
-                    branch_chairman_assignment = self.client.table("executive_assignments").select("branch_id").eq(
-                        "user_id", updater_id
-                    ).eq("is_active", True).execute()
-                    
-                    for ba in branch_chairman_assignment.data:
+                    for ba in updater_assignments:
                         if ba["branch_id"] == assignment.branch_id:
                             return True
             
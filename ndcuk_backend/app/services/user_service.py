@@ -1,53 +1,87 @@
-from typing import Optional, List, Dict, Any
+from typing import AsyncIterator, Optional, List, Dict, Any
 from supabase import Client
-from app.core.database import supabase_client
+from app.core.config import settings
+from app.core.database import supabase_client, execute, fetch_in, or_filter
+from app.core.cache import principal_cache, list_total_cache
+from app.core.permissions import get_permissions
+from app.core.loaders import Loader, get_loader, clear_loader
+from app.services.auth_service import auth_service
+from app.utils.helpers import encode_cursor, decode_keyset_cursor, membership_number_prefix
+from app.utils.validators import validate_membership_number
 from app.core.exceptions import NotFoundException, ValidationException, AuthorizationException
-from app.models.user import UserUpdate, UserResponse, UserStatusUpdate, UserStatus
+from app.core.metrics import instrument_service
+from app.models.user import (
+    UserUpdate, UserResponse, UserStatusUpdate, UserStatus,
+    BulkApprovalResult, BulkApprovalResponse
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Request-scoped loader names
+USER_PROFILES = "user_profiles"
+
+# Profile columns returned by reads and listings; {memberships} is the
+# embed, "memberships!inner" when filtering profiles by branch
+PROFILE_SELECT = """
+    *,
+    {memberships} (
+        branch_id,
+        status,
+        branches (name, location)
+    )
+"""
+
+# Columns of the membership register export, one row per user and membership
+REGISTER_FIELDS = [
+    "user_id", "full_name", "email", "membership_number", "user_status", "email_verified",
+    "phone", "branch_id", "branch_name", "branch_location", "membership_status",
+    "joined_date", "approved_at", "card_issued", "card_issued_at", "created_at"
+]
+
+@instrument_service
 class UserService:
     def __init__(self):
         self.client: Client = supabase_client.get_client()
     
+    def _profile_loader(self) -> Loader[str, UserResponse]:
+        """Request-scoped loader for user profiles by id"""
+        return get_loader(USER_PROFILES, self._load_user_profiles)
+    
+    def _invalidate_user(self, user_id: str) -> None:
+        """Forget a user's cached principal and profile after a write"""
+        principal_cache.invalidate(user_id)
+        clear_loader(USER_PROFILES, user_id)
+    
+    def _build_user_response(self, user_data: Dict[str, Any]) -> UserResponse:
+        """Build a UserResponse from a user_profiles row (email is kept on the profile)"""
+        return UserResponse(
+            id=user_data["id"],
+            email=user_data.get("email") or "",
+            full_name=user_data["full_name"],
+            phone=user_data.get("phone"),
+            address=user_data.get("address"),
+            date_of_birth=user_data.get("date_of_birth"),
+            membership_number=user_data.get("membership_number"),
+            status=user_data["status"],
+            email_verified=user_data["email_verified"],
+            avatar_url=user_data.get("avatar_url"),
+            created_at=user_data["created_at"],
+            updated_at=user_data["updated_at"]
+        )
+    
+    async def _load_user_profiles(self, user_ids: List[str]) -> Dict[str, UserResponse]:
+        """Load several user profiles in one query"""
+        rows = await fetch_in(
+            lambda: self.client.table("user_profiles").select(PROFILE_SELECT.format(memberships="memberships")),
+            "id", user_ids
+        )
+        return {user_data["id"]: self._build_user_response(user_data) for user_data in rows}
+    
     async def get_user_profile(self, user_id: str) -> Optional[UserResponse]:
         """Get user profile by ID"""
         try:
-            response = self.client.table("user_profiles").select(
-                """
-                *,
-                memberships (
-                    branch_id,
-                    status,
-                    branches (name, location)
-                )
-                """
-            ).eq("id", user_id).execute()
-            
-            if not response.data:
-                return None
-            
-            user_data = response.data[0]
-            
-            # Get user email from auth.users
-            auth_response = self.client.table("auth.users").select("email").eq("id", user_id).execute()
-            email = auth_response.data[0]["email"] if auth_response.data else ""
-            
-            return UserResponse(
-                id=user_data["id"],
-                email=email,
-                full_name=user_data["full_name"],
-                phone=user_data.get("phone"),
-                address=user_data.get("address"),
-                date_of_birth=user_data.get("date_of_birth"),
-                membership_number=user_data.get("membership_number"),
-                status=user_data["status"],
-                email_verified=user_data["email_verified"],
-                avatar_url=user_data.get("avatar_url"),
-                created_at=user_data["created_at"],
-                updated_at=user_data["updated_at"]
-            )
+            return await self._profile_loader().load(user_id)
             
         except Exception as e:
             logger.error(f"Get user profile error: {e}")
@@ -74,11 +108,12 @@ class UserService:
             
             update_data["updated_at"] = "now()"
             
-            response = self.client.table("user_profiles").update(update_data).eq("id", user_id).execute()
+            response = await execute(self.client.table("user_profiles").update(update_data).eq("id", user_id))
             
             if not response.data:
                 raise NotFoundException("User not found")
             
+            self._invalidate_user(user_id)
             return await self.get_user_profile(user_id)
             
         except Exception as e:
@@ -92,70 +127,157 @@ class UserService:
         page: int = 1, 
         size: int = 20, 
         status: Optional[UserStatus] = None,
-        branch_id: Optional[str] = None,
-        search: Optional[str] = None
+        branch_ids: Optional[List[str]] = None,
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """List users with pagination and filters"""
+        """List users with pagination and filters
+
+        branch_ids restricts the list to members of any of those branches
+        (None: every user, []: nobody).
+
+        Results are ordered by (created_at, id) newest first. Pass the returned
+        next_cursor back as `cursor` for keyset pagination; `page` is still
+        honoured (as an offset) when no cursor is given. Searches are ranked
+        (see _search_users) and paged with `page` only.
+        """
+        search = search.strip() if search else None
+        if cursor and search:
+            raise ValidationException("Search results are paged with page, not cursor")
+        if cursor:
+            try:
+                last_created_at, last_id = decode_keyset_cursor(cursor)
+            except ValueError:
+                raise ValidationException("Invalid cursor")
+        
+        if branch_ids is not None and not branch_ids:
+            return {"users": [], "total": 0, "page": page, "size": size, "next_cursor": None}
+        
         try:
+            if search:
+                return await self._search_users(search, page, size, status, branch_ids)
+            
             offset = (page - 1) * size
             
+            # The exact total is only computed when it is not already cached
+            total_key = ("users", status.value if status else None, tuple(sorted(branch_ids or [])))
+            total = list_total_cache.get(total_key)
+            
             # Build query
-            query = self.client.table("user_profiles").select(
-                """
-                *,
-                memberships (
-                    branch_id,
-                    status,
-                    branches (name, location)
-                )
-                """,
-                count="exact"
-            )
+            query = self._list_query(status, branch_ids, count="exact" if total is None else None)
             
-            # Apply filters
-            if status:
-                query = query.eq("status", status.value)
+            # Apply pagination (one extra row tells us whether there is a next page)
+            query = query.order("created_at", desc=True).order("id", desc=True)
+            if cursor:
+                query = or_filter(
+                    query,
+                    f'created_at.lt."{last_created_at}",'
+                    f'and(created_at.eq."{last_created_at}",id.lt.{last_id})'
+                ).limit(size + 1)
+            else:
+                query = query.offset(offset).limit(size + 1)
             
-            if branch_id:
-                query = query.eq("memberships.branch_id", branch_id)
+            response = await execute(query)
             
-            if search:
-                query = query.or_(f"full_name.ilike.%{search}%,membership_number.ilike.%{search}%")
+            if total is None:
+                total = response.count or 0
+                list_total_cache.set(total_key, total)
             
-            # Apply pagination
-            query = query.range(offset, offset + size - 1)
+            rows = response.data[:size]
+            next_cursor = None
+            if len(response.data) > size:
+                next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
             
-            response = query.execute()
-            
-            users = []
-            for user_data in response.data:
-                # Get email for each user (if needed)
-                users.append(UserResponse(
-                    id=user_data["id"],
-                    email="",  # Would need to fetch from auth.users
-                    full_name=user_data["full_name"],
-                    phone=user_data.get("phone"),
-                    address=user_data.get("address"),
-                    date_of_birth=user_data.get("date_of_birth"),
-                    membership_number=user_data.get("membership_number"),
-                    status=user_data["status"],
-                    email_verified=user_data["email_verified"],
-                    avatar_url=user_data.get("avatar_url"),
-                    created_at=user_data["created_at"],
-                    updated_at=user_data["updated_at"]
-                ))
+            users = [self._build_user_response(user_data) for user_data in rows]
             
             return {
                 "users": users,
-                "total": response.count or 0,
+                "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
             
         except Exception as e:
             logger.error(f"List users error: {e}")
             raise ValidationException("Failed to fetch users")
     
+    def _list_query(
+        self,
+        status: Optional[UserStatus],
+        branch_ids: Optional[List[str]],
+        count: Optional[str] = None
+    ) -> Any:
+        """user_profiles select with the listing filters
+
+        The branch filter inner-joins memberships, so it restricts (and counts)
+        the profiles themselves rather than just their embedded memberships,
+        and is answered from idx_memberships_branch_id.
+        """
+        memberships = "memberships!inner" if branch_ids else "memberships"
+        query = self.client.table("user_profiles").select(PROFILE_SELECT.format(memberships=memberships), count=count)
+        
+        if status:
+            query = query.eq("status", status.value)
+        
+        if branch_ids:
+            query = query.in_("memberships.branch_id", branch_ids)
+        
+        return query
+    
+    async def _search_users(
+        self,
+        search: str,
+        page: int,
+        size: int,
+        status: Optional[UserStatus],
+        branch_ids: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        """Ranked member search that stays index-backed as the register grows
+
+        Terms that spell a membership number (or its start, e.g. "NDC-2024-00")
+        match exactly or by prefix on idx_user_profiles_membership_number_pattern,
+        in number order. Anything else is a name search through the
+        search_user_profiles function (trigram index), best match first.
+        """
+        offset = (page - 1) * size
+        number_prefix = membership_number_prefix(search)
+        
+        if number_prefix:
+            query = self._list_query(status, branch_ids, count="exact")
+            if validate_membership_number(number_prefix):
+                query = query.eq("membership_number", number_prefix)
+            else:
+                query = query.like("membership_number", f"{number_prefix}*")
+            response = await execute(query.order("membership_number").offset(offset).limit(size))
+            rows, total = response.data, response.count or 0
+        else:
+            response = await execute(self.client.rpc("search_user_profiles", {
+                "p_query": search,
+                "p_status": status.value if status else None,
+                "p_branch_ids": branch_ids,
+                "p_limit": size,
+                "p_offset": offset
+            }))
+            matches = response.data or []
+            # The page in rank order; profiles removed since the search are skipped
+            profiles = {
+                row["id"]: row for row in await fetch_in(
+                    lambda: self.client.table("user_profiles").select(PROFILE_SELECT.format(memberships="memberships")),
+                    "id", [match["id"] for match in matches]
+                )
+            }
+            rows = [profiles[match["id"]] for match in matches if match["id"] in profiles]
+            total = matches[0]["total"] if matches else 0
+        
+        return {
+            "users": [self._build_user_response(user_data) for user_data in rows],
+            "total": total,
+            "page": page,
+            "size": size,
+            "next_cursor": None
+        }
+    
     async def update_user_status(
         self, 
         user_id: str, 
@@ -175,22 +297,24 @@ class UserService:
                 "updated_at": "now()"
             }
             
-            response = self.client.table("user_profiles").update(update_data).eq("id", user_id).execute()
+            response = await execute(self.client.table("user_profiles").update(update_data).eq("id", user_id))
             
             if not response.data:
                 raise ValidationException("Status update failed")
             
             # If approving, update membership status
             if status_data.status == UserStatus.APPROVED:
-                membership_update = self.client.table("memberships").update({
+                membership_update = await execute(self.client.table("memberships").update({
                     "status": "active",
                     "approved_by": approver_id,
                     "approved_at": "now()"
-                }).eq("user_id", user_id).execute()
+                }).eq("user_id", user_id))
                 
                 if not membership_update.data:
                     logger.warning(f"Membership status update failed for user {user_id}")
             
+            self._invalidate_user(user_id)
+            list_total_cache.clear()
             return await self.get_user_profile(user_id)
             
         except Exception as e:
@@ -199,6 +323,157 @@ class UserService:
                 raise
             raise ValidationException("Status update failed")
     
+    async def approve_users(
+        self,
+        user_ids: List[str],
+        approver_id: str,
+        accessible_branches: List[str]
+    ) -> BulkApprovalResponse:
+        """Approve many users at once with set-based profile and membership updates"""
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            
+            # One read for every requested user and their branches
+            existing_rows = await fetch_in(
+                lambda: self.client.table("user_profiles").select("id, status, memberships (branch_id)"),
+                "id", user_ids
+            )
+            existing = {row["id"]: row for row in existing_rows}
+            
+            # Branch access is validated in memory against the approver's branches once
+            restricted = accessible_branches != ["all"]
+            allowed = set(accessible_branches)
+            
+            results: Dict[str, BulkApprovalResult] = {}
+            approvable = []
+            for user_id in user_ids:
+                user_data = existing.get(user_id)
+                if not user_data:
+                    results[user_id] = BulkApprovalResult(user_id=user_id, success=False, detail="User not found")
+                elif restricted and not any(
+                    m.get("branch_id") in allowed for m in user_data.get("memberships") or []
+                ):
+                    results[user_id] = BulkApprovalResult(user_id=user_id, success=False, detail="No access to this user's branch")
+                else:
+                    approvable.append(user_id)
+            
+            if approvable:
+                # Reads and updates are chunked by fetch_in to keep the `in` filters short
+                updated_rows = await fetch_in(
+                    lambda: self.client.table("user_profiles").update({
+                        "status": UserStatus.APPROVED.value,
+                        "updated_at": "now()"
+                    }),
+                    "id", approvable
+                )
+                updated = {row["id"] for row in updated_rows}
+                
+                membership_rows = await fetch_in(
+                    lambda: self.client.table("memberships").update({
+                        "status": "active",
+                        "approved_by": approver_id,
+                        "approved_at": "now()"
+                    }),
+                    "user_id", approvable
+                )
+                with_membership = {row["user_id"] for row in membership_rows}
+                
+                for user_id in approvable:
+                    self._invalidate_user(user_id)
+                    if user_id not in updated:
+                        results[user_id] = BulkApprovalResult(user_id=user_id, success=False, detail="Status update failed")
+                        continue
+                    if user_id not in with_membership:
+                        logger.warning(f"Membership status update failed for user {user_id}")
+                    results[user_id] = BulkApprovalResult(user_id=user_id, success=True)
+            
+            if approvable:
+                list_total_cache.clear()
+            
+            ordered = [results[user_id] for user_id in user_ids]
+            approved = sum(1 for result in ordered if result.success)
+            
+            return BulkApprovalResponse(
+                results=ordered,
+                approved=approved,
+                failed=len(ordered) - approved
+            )
+            
+        except Exception as e:
+            logger.error(f"Bulk approve users error: {e}")
+            raise ValidationException("Bulk approval failed")
+    
+    async def iter_register(
+        self,
+        status: Optional[UserStatus] = None,
+        branch_ids: Optional[List[str]] = None,
+        batch_size: int = settings.EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the membership register row by row, fetched in keyset batches by id
+
+        Only one batch is held in memory at a time. Users without a membership
+        get a single row with empty branch columns; when branch_ids is given,
+        only memberships (and users) in those branches are included.
+        """
+        memberships = "memberships!inner" if branch_ids else "memberships"
+        last_id = None
+        
+        while True:
+            query = self.client.table("user_profiles").select(
+                f"""
+                id, full_name, email, membership_number, status, email_verified, phone, created_at,
+                {memberships} (
+                    branch_id, status, joined_date, approved_at, card_issued, card_issued_at,
+                    branches (name, location)
+                )
+                """
+            )
+            
+            if status:
+                query = query.eq("status", status.value)
+            
+            if branch_ids:
+                query = query.in_("memberships.branch_id", branch_ids)
+            
+            if last_id:
+                query = query.gt("id", last_id)
+            
+            try:
+                response = await execute(query.order("id").limit(batch_size))
+            except Exception as e:
+                logger.error(f"Register export error after user {last_id}: {e}")
+                raise ValidationException("Failed to export membership register")
+            
+            for user_data in response.data:
+                user_row = {
+                    "user_id": user_data["id"],
+                    "full_name": user_data["full_name"],
+                    "email": user_data.get("email"),
+                    "membership_number": user_data.get("membership_number"),
+                    "user_status": user_data["status"],
+                    "email_verified": user_data.get("email_verified"),
+                    "phone": user_data.get("phone"),
+                    "created_at": user_data.get("created_at")
+                }
+                
+                for membership in user_data.get("memberships") or [{}]:
+                    branch = membership.get("branches") or {}
+                    yield {
+                        **user_row,
+                        "branch_id": membership.get("branch_id"),
+                        "branch_name": branch.get("name"),
+                        "branch_location": branch.get("location"),
+                        "membership_status": membership.get("status"),
+                        "joined_date": membership.get("joined_date"),
+                        "approved_at": membership.get("approved_at"),
+                        "card_issued": membership.get("card_issued"),
+                        "card_issued_at": membership.get("card_issued_at")
+                    }
+            
+            if len(response.data) < batch_size:
+                break
+            last_id = response.data[-1]["id"]
+    
     async def upload_avatar(self, user_id: str, file_path: str) -> Dict[str, Any]:
         """Upload user avatar"""
         try:
@@ -209,11 +484,12 @@ class UserService:
                 "updated_at": "now()"
             }
             
-            response = self.client.table("user_profiles").update(update_data).eq("id", user_id).execute()
+            response = await execute(self.client.table("user_profiles").update(update_data).eq("id", user_id))
             
             if not response.data:
                 raise NotFoundException("User not found")
             
+            self._invalidate_user(user_id)
             return {
                 "message": "Avatar uploaded successfully",
                 "avatar_url": file_path
@@ -226,37 +502,12 @@ class UserService:
     async def get_user_permissions(self, user_id: str) -> Dict[str, List[str]]:
         """Get user permissions based on roles"""
         try:
-            response = self.client.table("executive_assignments").select(
-                """
-                roles (
-                    name,
-                    permissions,
-                    scope_type
-                )
-                """
-            ).eq("user_id", user_id).eq("is_active", True).execute()
+            # The principal (and its compiled permissions) is usually already cached
+            principal = await auth_service.get_user_with_roles(user_id)
+            if not principal:
+                return {}
             
-            permissions = {}
-            
-            for assignment in response.data:
-                role = assignment["roles"]
-                role_permissions = role.get("permissions", {})
-                
-                # Merge permissions
-                for resource, actions in role_permissions.items():
-                    if resource not in permissions:
-                        permissions[resource] = []
-                    
-                    if isinstance(actions, list):
-                        permissions[resource].extend(actions)
-                    elif actions is True:
-                        permissions[resource] = ["all"]
-            
-            # Remove duplicates
-            for resource in permissions:
-                permissions[resource] = list(set(permissions[resource]))
-            
-            return permissions
+            return get_permissions(principal).to_dict()
             
         except Exception as e:
             logger.error(f"Get user permissions error: {e}")
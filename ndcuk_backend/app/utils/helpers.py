@@ -1,16 +1,39 @@
 """
 Helper utility functions for NDC UK Backend
 """
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
+import re
 import secrets
 import string
+import uuid
 from app.utils.constants import MEMBERSHIP_NUMBER_FORMAT
+from app.core.permissions import compile_roles, get_permissions
 
 def generate_membership_number(year: int, sequence: int) -> str:
     """Generate membership number in NDC format"""
     return MEMBERSHIP_NUMBER_FORMAT.format(year=year, number=sequence)
 
+# A membership number or a leading part of one: "NDC", "NDC-20", "ndc-2024-00", "2024-0042"
+MEMBERSHIP_NUMBER_PREFIX = re.compile(r"NDC(?:-?(\d{1,4})(?:-(\d{0,4}))?)?-?|(\d{4})-(\d{0,4})", re.IGNORECASE)
+
+def membership_number_prefix(term: str) -> Optional[str]:
+    """Canonical membership number prefix spelled by a search term, or None if it is not one"""
+    match = MEMBERSHIP_NUMBER_PREFIX.fullmatch(term.strip())
+    if match is None:
+        return None
+    year = match.group(1) or match.group(3)
+    number = match.group(2) if match.group(2) is not None else match.group(4)
+    if year is None:
+        return "NDC-"
+    if number is None:
+        return f"NDC-{year}"
+    return f"NDC-{year}-{number}"
+
 def generate_secure_token(length: int = 32) -> str:
     """Generate a cryptographically secure random token"""
     alphabet = string.ascii_letters + string.digits
@@ -43,39 +66,16 @@ def format_phone_number(phone: str) -> str:
 
 def extract_permissions(roles_data: List[Dict[str, Any]]) -> Dict[str, List[str]]:
     """Extract and merge permissions from multiple roles"""
-    all_permissions = {}
-    
-    for role in roles_data:
-        if not role.get('is_active', True):
-            continue
-            
-        permissions = role.get('permissions', {})
-        
-        for resource, actions in permissions.items():
-            if resource not in all_permissions:
-                all_permissions[resource] = []
-            
-            if isinstance(actions, list):
-                all_permissions[resource].extend(actions)
-            elif actions is True or actions == "all":
-                all_permissions[resource] = ["all"]
-            elif isinstance(actions, str):
-                all_permissions[resource].append(actions)
-    
-    # Remove duplicates and sort
-    for resource in all_permissions:
-        if "all" in all_permissions[resource]:
-            all_permissions[resource] = ["all"]
-        else:
-            all_permissions[resource] = sorted(list(set(all_permissions[resource])))
-    
-    return all_permissions
+    return compile_roles(roles_data).to_dict()
 
 def has_permission(user_permissions: Dict[str, List[str]], resource: str, action: str) -> bool:
     """Check if user has specific permission"""
     if not user_permissions:
         return False
     
+    if "all" in user_permissions.get("all", []):
+        return True
+    
     resource_permissions = user_permissions.get(resource, [])
     return "all" in resource_permissions or action in resource_permissions
 
@@ -120,10 +120,70 @@ def paginate_results(data: List[Any], page: int, size: int) -> Dict[str, Any]:
         "pages": (total + size - 1) // size
     }
 
+def encode_cursor(*values: Any) -> str:
+    """Encode keyset pagination values into an opaque URL-safe cursor"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int = 2) -> List[Any]:
+    """Decode a cursor produced by encode_cursor (raises ValueError if malformed)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("Invalid cursor")
+    return values
+
+def decode_keyset_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a (timestamp, id) cursor, checking both values before they go into a filter string
+
+    Cursors come from the client, so anything that is not an ISO timestamp and
+    a UUID is rejected (ValueError) rather than quoted into the or=(...) filter.
+    """
+    sort_value, last_id = decode_cursor(cursor)
+    try:
+        if not isinstance(sort_value, str) or not isinstance(last_id, str):
+            raise ValueError("Invalid cursor")
+        datetime.fromisoformat(sort_value)
+        return sort_value, str(uuid.UUID(last_id))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+async def iter_csv(rows: AsyncIterator[Dict[str, Any]], fieldnames: Sequence[str]) -> AsyncIterator[str]:
+    """Encode rows as CSV text, one chunk per row after the header"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    
+    async for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    # Header only, if there were no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def iter_ndjson(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Encode rows as newline-delimited JSON"""
+    async for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
 def build_user_context(user_data: Dict[str, Any]) -> Dict[str, Any]:
     """Build user context with roles and permissions"""
     roles = []
-    permissions = {}
     
     # Extract roles from executive assignments
     for assignment in user_data.get('executive_assignments', []):
@@ -136,24 +196,9 @@ def build_user_context(user_data: Dict[str, Any]) -> Dict[str, Any]:
                 'chapter_id': assignment.get('chapter_id'),
                 'branch_id': assignment.get('branch_id')
             })
-            
-            # Merge permissions
-            role_permissions = role_data.get('permissions', {})
-            for resource, actions in role_permissions.items():
-                if resource not in permissions:
-                    permissions[resource] = []
-                
-                if isinstance(actions, list):
-                    permissions[resource].extend(actions)
-                elif actions is True:
-                    permissions[resource] = ["all"]
-    
-    # Remove duplicate permissions
-    for resource in permissions:
-        if "all" in permissions[resource]:
-            permissions[resource] = ["all"]
-        else:
-            permissions[resource] = list(set(permissions[resource]))
+    
+    # Permissions are compiled once per principal and reused
+    permissions = get_permissions(user_data)
     
     return {
         'user_id': user_data.get('id'),
@@ -161,10 +206,10 @@ def build_user_context(user_data: Dict[str, Any]) -> Dict[str, Any]:
         'email': user_data.get('email'),
         'status': user_data.get('status'),
         'roles': roles,
-        'permissions': permissions,
-        'is_leadership': any(is_leadership_role(role['name']) for role in roles),
-        'is_chapter_executive': any(is_chapter_role(role['name']) for role in roles),
-        'is_branch_executive': any(is_branch_role(role['name']) for role in roles)
+        'permissions': permissions.to_dict(),
+        'is_leadership': any(is_leadership_role(name) for name in permissions.roles),
+        'is_chapter_executive': any(is_chapter_role(name) for name in permissions.roles),
+        'is_branch_executive': any(is_branch_role(name) for name in permissions.roles)
     }
 
 def format_error_response(message: str, errors: Optional[List[str]] = None) -> Dict[str, Any]:
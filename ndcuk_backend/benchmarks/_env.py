@@ -0,0 +1,21 @@
+"""
+Settings for running the app without a deployment (benchmarks and tests)
+
+Import this before any app module, since app.core.config reads the environment
+at import time. Values already set in the environment win.
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.anon.key")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-at-least-32-characters")
+
+
+def use_in_memory_state() -> None:
+    """Keep refresh tokens and rate limit counters in memory and raise every limit out of the way"""
+    os.environ.setdefault("REFRESH_TOKEN_STORE", "memory")
+    os.environ.setdefault("RATE_LIMIT_STORAGE_URI", "memory://")
+    os.environ.setdefault("RATE_LIMIT_REQUESTS", "1000000")
+    for name in ("LOGIN", "REGISTER", "REFRESH", "USERS_LIST", "USERS_EXPORT"):
+        os.environ.setdefault(f"RATE_LIMIT_{name}", "1000000/minute")
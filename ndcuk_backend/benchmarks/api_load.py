@@ -0,0 +1,209 @@
+"""
+Load test: throughput and latency percentiles of the auth, users, branches and roles endpoints
+
+Runs the real application in process against ``benchmarks.supabase_standin``
+(in-memory tables built from complete_database_setup.sql, with --latency
+seconds added to every database and auth round trip) and drives it through
+httpx's ASGI transport with --concurrency clients. Rate limits are raised out
+of the way and refresh tokens are kept in memory. For each scenario it
+reports requests per second, error count and p50/p95/p99 latency.
+
+Scenarios:
+
+- ``auth``: login, /auth/me and refresh-token rotation
+- ``users``: /users/me, list (first page and search), get by id, export
+- ``branches``: public list, list, my-branches, members
+- ``roles``: list, categories, my-assignments
+
+Usage:
+    python -m benchmarks.api_load [--requests 2000] [--concurrency 20] [--latency 0.002]
+        [--users 2000] [--scenario auth users branches roles]
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks import _env  # must precede the app imports
+_env.use_in_memory_state()
+
+from benchmarks.supabase_standin import StandinClient, install, seed_members  # noqa: E402
+
+# A request: (client, context) -> response
+Call = Callable[[httpx.AsyncClient, Dict[str, Any]], Awaitable[httpx.Response]]
+
+
+def auth_calls(ctx: Dict[str, Any]) -> List[Call]:
+    async def login(client, ctx):
+        return await client.post("/api/v1/auth/login", json={
+            "email": random.choice(ctx["emails"]), "password": ctx["password"]
+        })
+
+    async def me(client, ctx):
+        return await client.get("/api/v1/auth/me", headers=ctx["member_headers"])
+
+    async def refresh(client, ctx):
+        # One rotation chain per worker: a token is only ever presented once
+        response = await client.post("/api/v1/auth/refresh", json={"refresh_token": ctx["refresh_token"]})
+        if response.status_code == 200:
+            ctx["refresh_token"] = response.json()["refresh_token"]
+        return response
+
+    return [login, me, refresh]
+
+
+def users_calls(ctx: Dict[str, Any]) -> List[Call]:
+    async def me(client, ctx):
+        return await client.get("/api/v1/users/me", headers=ctx["member_headers"])
+
+    async def list_first_page(client, ctx):
+        return await client.get("/api/v1/users/", params={"size": 20}, headers=ctx["admin_headers"])
+
+    async def list_deep_page(client, ctx):
+        return await client.get("/api/v1/users/", params={"page": 5, "size": 20}, headers=ctx["admin_headers"])
+
+    async def search(client, ctx):
+        return await client.get("/api/v1/users/", params={"search": "mensah", "size": 20}, headers=ctx["admin_headers"])
+
+    async def get_by_id(client, ctx):
+        return await client.get(f"/api/v1/users/{random.choice(ctx['user_ids'])}", headers=ctx["admin_headers"])
+
+    async def export(client, ctx):
+        return await client.get("/api/v1/users/export", headers=ctx["admin_headers"])
+
+    return [me, list_first_page, list_deep_page, search, get_by_id, get_by_id, export]
+
+
+def branches_calls(ctx: Dict[str, Any]) -> List[Call]:
+    async def public(client, ctx):
+        return await client.get("/api/v1/branches/public")
+
+    async def list_branches(client, ctx):
+        return await client.get("/api/v1/branches/", headers=ctx["admin_headers"])
+
+    async def my_branches(client, ctx):
+        return await client.get("/api/v1/branches/my-branches", headers=ctx["member_headers"])
+
+    async def members(client, ctx):
+        branch_id = random.choice(ctx["branch_ids"])
+        return await client.get(f"/api/v1/branches/{branch_id}/members", params={"size": 20}, headers=ctx["admin_headers"])
+
+    return [public, list_branches, my_branches, members]
+
+
+def roles_calls(ctx: Dict[str, Any]) -> List[Call]:
+    async def list_roles(client, ctx):
+        return await client.get("/api/v1/roles/", headers=ctx["member_headers"])
+
+    async def categories(client, ctx):
+        return await client.get("/api/v1/roles/categories", headers=ctx["member_headers"])
+
+    async def my_assignments(client, ctx):
+        return await client.get("/api/v1/roles/my-assignments", headers=ctx["admin_headers"])
+
+    return [list_roles, categories, my_assignments]
+
+
+SCENARIOS = {"auth": auth_calls, "users": users_calls, "branches": branches_calls, "roles": roles_calls}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1] if len(samples) > 1 else samples[0]
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Dict[str, Any], name: str, requests: int, concurrency: int):
+    calls = SCENARIOS[name](ctx)
+    schedule = itertools.islice(itertools.cycle(calls), requests)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def worker():
+        worker_ctx = dict(ctx)
+        if name == "auth":
+            response = await client.post("/api/v1/auth/login", json={
+                "email": ctx["member_email"], "password": ctx["password"]
+            })
+            worker_ctx["refresh_token"] = response.json()["refresh_token"]
+        for call in schedule:
+            started = time.perf_counter()
+            response = await call(client, worker_ctx)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                key = f"{call.__name__} {response.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"  {name:<9} {len(latencies):>6} req {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {percentile(latencies, 50) * 1000:7.1f}ms  p95 {percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f}ms  errors {sum(errors.values())}"
+    )
+    for key, count in sorted(errors.items()):
+        print(f"      {key}: {count}")
+    return sum(errors.values())
+
+
+async def run(args) -> int:
+    standin = StandinClient(latency=args.latency)
+    seeded = seed_members(standin.db, members=args.users)
+    install(standin)
+
+    from app.main import app  # noqa: E402  (imported after install so the services use the stand-in)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=60) as client:
+            tokens = {}
+            for who in ("chairman", "member"):
+                response = await client.post("/api/v1/auth/login", json={
+                    "email": seeded[f"{who}_email"], "password": seeded["password"]
+                })
+                response.raise_for_status()
+                tokens[who] = response.json()["access_token"]
+
+            ctx = {
+                **seeded,
+                "emails": [seeded["member_email"], seeded["chairman_email"]],
+                "admin_headers": {"Authorization": f"Bearer {tokens['chairman']}"},
+                "member_headers": {"Authorization": f"Bearer {tokens['member']}"}
+            }
+
+            print(
+                f"{args.users} members, {args.concurrency} concurrent clients, "
+                f"{args.latency * 1000:.1f}ms per database call"
+            )
+            errors = 0
+            for name in args.scenario:
+                errors += await run_scenario(client, ctx, name, args.requests, args.concurrency)
+            print(f"{standin.standin.requests} database calls in total")
+            return errors
+    finally:
+        await app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds added to each database call")
+    parser.add_argument("--users", type=int, default=2000, help="members to generate")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    errors = asyncio.run(run(args))
+    raise SystemExit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Load test: request latency under concurrency with blocking vs offloaded Supabase calls
+
+Simulates requests arriving at a fixed rate that each make one PostgREST round
+trip of a fixed latency. Latency is measured from the scheduled arrival time,
+so time spent queued behind a blocked event loop is included.
+
+The "blocking" run calls ``query.execute()`` directly from the coroutine (the
+old service behaviour), the "offloaded" run goes through
+``app.core.database.execute`` and the bounded worker pool.
+
+Usage:
+    python -m benchmarks.event_loop_latency [--requests 400] [--rate 200] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import benchmarks._env  # noqa: F401  (must precede the app imports)
+
+from app.core.database import execute  # noqa: E402
+
+
+class SlowQuery:
+    """Stand-in for a PostgREST request builder with a fixed network round trip"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return []
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, requests: int, rate: float, latency: float):
+    latencies = []
+    started = time.perf_counter()
+
+    async def handle_request(arrival: float):
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        if mode == "blocking":
+            SlowQuery(latency).execute()
+        else:
+            await execute(SlowQuery(latency))
+        latencies.append(time.perf_counter() - arrival)
+
+    await asyncio.gather(*(handle_request(started + i / rate) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{mode:>9}: {requests / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:7.1f}ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=200.0, help="arrivals per second")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    print(f"{args.requests} requests at {args.rate:.0f} req/s, {args.latency_ms}ms per query")
+    for mode in ("blocking", "offloaded"):
+        asyncio.run(run(mode, args.requests, args.rate, latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: membership number throughput per block size
+
+Times many concurrent ``next_membership_number()`` calls across several
+MembershipNumberService instances (one per simulated uvicorn worker) and
+counts the RPCs they make. The ``allocate_membership_numbers`` RPC is a
+lock-guarded Python counter with a fixed round trip latency, so this measures
+the effect of block leasing, not the SQL function. It exits non-zero if a
+number repeats; the concurrency tests are in
+tests/test_membership_number_service.py.
+
+Usage:
+    python -m benchmarks.membership_number_allocation [--registrations 2000] [--workers 4] [--block-size 1]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import benchmarks._env  # noqa: F401  (must precede the app imports)
+
+from app.core.database import run_sync  # noqa: E402
+from app.services.membership_number_service import MembershipNumberService  # noqa: E402
+
+
+class SequenceTable:
+    """In-memory membership_number_sequences with the same locking semantics"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rpc_calls = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, year: int, count: int) -> int:
+        time.sleep(self.latency)
+        with self._lock:
+            self.rpc_calls += 1
+            self._values[year] = self._values.get(year, 0) + count
+            return self._values[year]
+
+
+class BenchMembershipNumberService(MembershipNumberService):
+    def __init__(self, table: SequenceTable, block_size: int):
+        super().__init__(block_size=block_size)
+        self.table = table
+
+    async def _allocate(self, year: int, count: int) -> int:
+        return await run_sync(self.table.allocate, year, count)
+
+
+async def run(registrations: int, workers: int, block_size: int, latency: float) -> bool:
+    table = SequenceTable(latency)
+    services = [BenchMembershipNumberService(table, block_size) for _ in range(workers)]
+
+    started = time.perf_counter()
+    numbers = await asyncio.gather(*(
+        services[i % workers].next_membership_number(2024) for i in range(registrations)
+    ))
+    elapsed = time.perf_counter() - started
+
+    unique = len(set(numbers)) == len(numbers)
+    print(
+        f"block={block_size:<4} {registrations} numbers from {workers} workers in {elapsed:.2f}s "
+        f"({table.rpc_calls} RPCs) - {'unique' if unique else 'DUPLICATES FOUND'}"
+    )
+    return unique
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registrations", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--block-size", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    ok = all(
+        asyncio.run(run(args.registrations, args.workers, block_size, args.latency_ms / 1000))
+        for block_size in args.block_size
+    )
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark: per-request overhead of the request instrumentation middleware
+
+Drives a minimal FastAPI app in process through httpx's ASGI transport (no
+network, no server) with three middleware stacks:
+
+- ``bare``: no instrumentation
+- ``legacy``: the two ``@app.middleware("http")`` functions previously in
+  app/main.py (BaseHTTPMiddleware, f-string logging)
+- ``asgi``: ``app.core.middleware.RequestInstrumentationMiddleware``
+
+Log records are created at INFO and discarded by a NullHandler, so the cost
+of building them is included but not the cost of writing them out.
+
+Usage:
+    python -m benchmarks.middleware_overhead [--requests 5000] [--rounds 3]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+import benchmarks._env  # noqa: F401  (must precede the app imports)
+
+from fastapi import FastAPI, Request  # noqa: E402
+from app.core.middleware import RequestInstrumentationMiddleware  # noqa: E402
+
+logger = logging.getLogger("benchmarks.legacy")
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/users/{user_id}")
+    async def get_user(user_id: str):
+        return {"id": user_id}
+
+    if stack == "legacy":
+        @app.middleware("http")
+        async def add_process_time_header(request: Request, call_next):
+            start_time = time.time()
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            response.headers["X-Process-Time"] = str(process_time)
+            return response
+
+        @app.middleware("http")
+        async def log_requests(request: Request, call_next):
+            logger.info(f"{request.method} {request.url.path} - {request.client.host}")
+            response = await call_next(request)
+            logger.info(f"Response status: {response.status_code}")
+            return response
+    elif stack == "asgi":
+        app.add_middleware(RequestInstrumentationMiddleware)
+
+    return app
+
+
+async def measure(stack: str, requests: int) -> float:
+    app = build_app(stack)
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        # Warm up (middleware stack build, route template memo)
+        for _ in range(100):
+            response = await client.get("/api/v1/users/warmup")
+            assert response.status_code == 200
+            assert stack == "bare" or "x-process-time" in response.headers
+
+        started = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/api/v1/users/{i}")
+        return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.NullHandler()]
+    root.setLevel(logging.INFO)
+
+    results = {}
+    for stack in ("bare", "legacy", "asgi"):
+        results[stack] = min(
+            asyncio.run(measure(stack, args.requests)) for _ in range(args.rounds)
+        )
+
+    bare = results["bare"]
+    print(f"{args.requests} sequential requests, best of {args.rounds} rounds")
+    for stack, per_request in results.items():
+        overhead = (per_request - bare) * 1e6
+        print(f"{stack:>7}: {per_request * 1e6:7.1f}us/request  overhead={overhead:6.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Load test: login throughput and event loop responsiveness during bcrypt checks
+
+Fires a burst of concurrent password verifications (the CPU-bound half of a
+login) while a probe coroutine ticks every few milliseconds, standing in for
+the rest of the API. Reports login throughput and how late the probe ran.
+
+- ``blocking``: ``verify_password`` called directly from the coroutine
+- ``threads``: ``verify_password_async`` on a thread PasswordHashPool
+- ``processes``: ``verify_password_async`` on a process PasswordHashPool
+
+Usage:
+    python -m benchmarks.password_hashing [--logins 32] [--cost 10] [--workers 0]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import benchmarks._env  # noqa: F401  (must precede the app imports)
+
+from passlib.hash import bcrypt  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.security import PasswordHashPool, verify_password  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, logins: int, hashed: str, workers: int):
+    pool = None
+    if mode != "blocking":
+        pool = PasswordHashPool(max_workers=workers, use_processes=mode == "processes")
+        security.password_hash_pool = pool
+        # Start the workers before timing
+        await security.verify_password_async("warmup", hashed)
+
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def login():
+        if mode == "blocking":
+            return verify_password("correct horse", hashed)
+        return await security.verify_password_async("correct horse", hashed)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    done.set()
+    await probe_task
+    assert all(results)
+
+    stats = ""
+    if pool is not None:
+        metrics = pool.stats()
+        stats = f"  avg_queue={metrics['avg_queue_ms']:.0f}ms max_queue={metrics['max_queue_ms']:.0f}ms"
+        pool.close()
+
+    print(
+        f"{mode:>9}: {logins / elapsed:6.1f} logins/s  "
+        f"probe lag p50={percentile(lags, 50) * 1000:6.1f}ms "
+        f"p99={percentile(lags, 99) * 1000:6.1f}ms max={max(lags) * 1000:6.1f}ms{stats}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--cost", type=int, default=10, help="bcrypt cost factor (rounds)")
+    parser.add_argument("--workers", type=int, default=0, help="pool size, 0 = one per CPU")
+    parser.add_argument("--modes", nargs="+", default=["blocking", "threads", "processes"])
+    args = parser.parse_args()
+
+    hashed = bcrypt.using(rounds=args.cost).hash("correct horse")
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.cost}, {os.cpu_count()} CPUs")
+    for mode in args.modes:
+        asyncio.run(run(mode, args.logins, hashed, args.workers))
+
+
+if __name__ == "__main__":
+    main()
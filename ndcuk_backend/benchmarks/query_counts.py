@@ -0,0 +1,153 @@
+"""
+Check: database round trips per request must not grow with the size of the result
+
+Runs every read endpoint once against a small and a large dataset in
+``benchmarks.supabase_standin`` (more members, more branches, and more
+branches and role assignments for the signed-in users) and compares the
+X-DB-Calls header. An endpoint whose call count differs between the two runs
+is looking rows up one by one (an N+1) and fails the check. Caches are
+cleared before every request so each one is measured cold.
+
+The CSV/NDJSON export is not checked: it streams in fixed-size pages, so its
+call count grows with the register by design, and the header is sent before
+the stream starts.
+
+tests/test_query_counts.py runs the same comparison in the test suite; this
+script prints the per-endpoint table.
+
+Usage:
+    python -m benchmarks.query_counts [--small 30] [--large 600] [--extra-branches 12]
+"""
+import argparse
+import asyncio
+import multiprocessing
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks import _env  # must precede the app imports
+_env.use_in_memory_state()
+
+from benchmarks.supabase_standin import StandinClient, install, seed_members  # noqa: E402
+
+# (label, who, path); {member}, {chairman} and {branch} are filled in per dataset
+ENDPOINTS = [
+    ("auth me", "member", "/api/v1/auth/me"),
+    ("users me", "member", "/api/v1/users/me"),
+    ("users list", "chairman", "/api/v1/users/?size=100"),
+    ("users search", "chairman", "/api/v1/users/?size=100&search=mensah"),
+    ("users by branch", "chairman", "/api/v1/users/?size=100&branch_id={branch}"),
+    ("user by id", "chairman", "/api/v1/users/{member}"),
+    ("user permissions", "chairman", "/api/v1/users/{member}/permissions"),
+    ("branches public", None, "/api/v1/branches/public"),
+    ("branches list", "chairman", "/api/v1/branches/"),
+    ("branch by id", "chairman", "/api/v1/branches/{branch}"),
+    ("branch members", "chairman", "/api/v1/branches/{branch}/members?size=100"),
+    ("my branches", "member", "/api/v1/branches/my-branches"),
+    ("roles list", "member", "/api/v1/roles/"),
+    ("role categories", "member", "/api/v1/roles/categories"),
+    ("my assignments", "chairman", "/api/v1/roles/my-assignments"),
+    ("user assignments", "chairman", "/api/v1/roles/assignments/user/{chairman}"),
+]
+
+
+def build(members: int, extra_branches: int) -> StandinClient:
+    standin = StandinClient()
+    db = standin.db
+    chapter_id = db.tables["chapters"].rows[0]["id"]
+    db.insert("branches", [
+        {"chapter_id": chapter_id, "name": f"Branch {i}", "location": f"Town {i}"} for i in range(extra_branches)
+    ])
+    seeded = seed_members(db, members=members)
+
+    # Result size for the per-user endpoints: a membership and a role in every branch
+    if extra_branches:
+        role_id = next(r["id"] for r in db.tables["roles"].rows if r["scope_type"] == "branch")
+        joined = {m["branch_id"] for m in db.children("memberships", "user_id", seeded["member"])}
+        for branch_id in seeded["branch_ids"]:
+            if branch_id not in joined:
+                db.insert("memberships", [{"user_id": seeded["member"], "branch_id": branch_id, "status": "active"}])
+            db.insert("executive_assignments", [{
+                "user_id": seeded["chairman"], "role_id": role_id, "branch_id": branch_id, "chapter_id": chapter_id
+            }])
+    standin.seeded = seeded
+    return standin
+
+
+async def count_calls(standin: StandinClient) -> Dict[str, int]:
+    install(standin)
+    from app.main import app
+    from app.core.cache import list_total_cache, principal_cache, token_cache
+    from app.core.reference_data import reference_cache
+    import logging
+    logging.getLogger().setLevel(logging.ERROR)
+
+    seeded = standin.seeded
+    values = {"member": seeded["member"], "chairman": seeded["chairman"], "branch": seeded["branch_ids"][0]}
+    counts = {}
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        headers = {}
+        for who in ("member", "chairman"):
+            response = await client.post("/api/v1/auth/login", json={
+                "email": seeded[f"{who}_email"], "password": seeded["password"]
+            })
+            response.raise_for_status()
+            headers[who] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for label, who, path in ENDPOINTS:
+            for cache in (principal_cache, token_cache, list_total_cache, reference_cache):
+                cache.clear()
+            response = await client.get(path.format(**values), headers=headers.get(who, {}))
+            if response.status_code != 200:
+                raise RuntimeError(f"{label}: {response.status_code} {response.text[:200]}")
+            counts[label] = int(response.headers["x-db-calls"])
+    return counts
+
+
+def measure(members: int, extra_branches: int, results) -> None:
+    try:
+        results.put(asyncio.run(count_calls(build(members, extra_branches))))
+    except Exception as e:
+        results.put(e)
+
+
+def compare(small: int, large: int, extra_branches: int) -> Tuple[Dict[str, int], Dict[str, int], List[str]]:
+    """Call counts for the small and large datasets, and the endpoints whose count differs"""
+    # A fresh interpreter per dataset: the stand-in must be installed before the app is imported
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    counts = []
+    for members, extra in ((small, 0), (large, extra_branches)):
+        process = context.Process(target=measure, args=(members, extra, results))
+        process.start()
+        result = results.get()
+        process.join()
+        if isinstance(result, Exception):
+            raise RuntimeError(f"{members} members: {result}")
+        counts.append(result)
+
+    small_counts, large_counts = counts
+    return small_counts, large_counts, [label for label in small_counts if small_counts[label] != large_counts[label]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--small", type=int, default=30, help="members in the small dataset")
+    parser.add_argument("--large", type=int, default=600, help="members in the large dataset")
+    parser.add_argument("--extra-branches", type=int, default=12, help="branches added to the large dataset")
+    args = parser.parse_args()
+
+    try:
+        small, large, failed = compare(args.small, args.large, args.extra_branches)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f"{'endpoint':<18} {'small':>6} {'large':>6}")
+    for label in small:
+        flag = "  GROWS WITH RESULT SIZE" if label in failed else ""
+        print(f"{label:<18} {small[label]:>6} {large[label]:>6}{flag}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: per-request cost of the rate limiter, and cross-worker accuracy
+
+For each storage/strategy pair, times ``RateLimiter.hit`` over many client
+keys (the work slowapi does once per limited request). It then starts several
+processes that hammer one key in a shared SQLite file, and checks that
+together they admit no more than the limit.
+
+Usage:
+    python -m benchmarks.rate_limit_overhead [--hits 20000] [--processes 4] [--limit 500]
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+import benchmarks._env  # noqa: F401  (must precede the app imports)
+
+from limits import parse  # noqa: E402
+from limits.storage import storage_from_string  # noqa: E402
+from limits.strategies import STRATEGIES  # noqa: E402
+import app.core.rate_limit  # noqa: E402,F401  (registers the sqlite:// scheme)
+
+
+def time_hits(storage_uri: str, strategy: str, hits: int, clients: int = 200) -> float:
+    limiter = STRATEGIES[strategy](storage_from_string(storage_uri))
+    item = parse("1000000/minute")
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, "bench", f"10.0.{i % clients // 256}.{i % 256}")
+    return (time.perf_counter() - started) / hits
+
+
+def hammer(storage_uri: str, limit: int, attempts: int, results) -> None:
+    limiter = STRATEGIES["sliding-window-counter"](storage_from_string(storage_uri))
+    item = parse(f"{limit}/hour")
+    results.put(sum(1 for _ in range(attempts) if limiter.hit(item, "bench", "one-client")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hits", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_uri = f"sqlite:///{tmp}/rate_limits.db"
+        print(f"{args.hits} hits over 200 client keys")
+        for storage_uri, strategy in (
+            ("memory://", "fixed-window"),
+            ("memory://", "sliding-window-counter"),
+            (sqlite_uri, "fixed-window"),
+            (sqlite_uri, "sliding-window-counter"),
+        ):
+            per_hit = time_hits(storage_uri, strategy, args.hits)
+            label = "sqlite" if storage_uri.startswith("sqlite") else "memory"
+            print(f"  {label:>6} {strategy:<23} {per_hit * 1e6:7.1f}us/hit")
+
+        shared_uri = f"sqlite:///{tmp}/shared.db"
+        storage_from_string(shared_uri)  # create the schema before the workers race
+        results = multiprocessing.Queue()
+        attempts = args.limit  # every process alone could use up the whole budget
+        workers = [
+            multiprocessing.Process(target=hammer, args=(shared_uri, args.limit, attempts, results))
+            for _ in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        admitted = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+
+    ok = admitted <= args.limit
+    print(
+        f"{args.processes} processes x {attempts} hits on one key, limit {args.limit}: "
+        f"admitted {admitted} - {'ok' if ok else 'LIMIT EXCEEDED'}"
+    )
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
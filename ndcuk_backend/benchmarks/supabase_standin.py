@@ -0,0 +1,925 @@
+"""
+In-process Supabase stand-in for benchmarks and load tests
+
+``StandinClient`` exposes the part of the supabase-py client the services use
+(``table()``/``from_()``, ``rpc()`` and ``auth``). Queries are built by the
+real postgrest-py request builders and sent through an ``httpx.MockTransport``
+to ``PostgrestStandin``, which answers them from in-memory tables: the column
+list, foreign keys and seed rows come from ``complete_database_setup.sql``
+(plus the columns added by ``update_user_schema.sql``), and every round trip
+can be given a fixed latency. Only the PostgREST features the app uses are
+implemented: select with embedded resources (``!hint`` and ``!inner``),
+eq/neq/gt/gte/lt/lte/like/ilike/is/in/fts filters with ``not.``, ``or``/``and``
+trees and filters on embedded columns, order/limit/offset/Range, exact
+counts, insert/update/delete with ``return=representation``, the
+``branch_membership_counts`` view and the ``allocate_membership_numbers`` and
+``can_assign_role`` functions.
+
+Install it before the services are imported:
+
+    standin = StandinClient(latency=0.002)
+    seed_members(standin.db, members=2000)
+    install(standin)
+    from app.main import app
+
+Foreign keys to ``auth.users`` are embedded as ``user_profiles`` (the tables
+share the primary key), and no auth triggers run, matching a database where
+``disable_trigger.sql`` has been applied.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_FILES = (ROOT / "complete_database_setup.sql", ROOT / "update_user_schema.sql")
+
+AUTH_USERS = "auth.users"
+BASE_URL = "http://supabase.standin"
+
+
+def utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class PostgrestError(Exception):
+    """Answered as a PostgREST error body with the given HTTP status"""
+
+    def __init__(self, status: int, message: str, code: str = "PGRST000"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+# ---------------------------------------------------------------------------
+# Schema and seed data
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Column:
+    name: str
+    type: str
+    default: Optional[str] = None
+    references: Optional[str] = None
+    nullable: bool = True
+
+
+@dataclass
+class Table:
+    name: str
+    columns: Dict[str, Column] = field(default_factory=dict)
+    unique: List[Tuple[str, ...]] = field(default_factory=list)
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Split on sep outside parentheses and quotes"""
+    parts, depth, quote, current = [], 0, None, []
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == sep and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+_COLUMN_RE = re.compile(
+    r"^(?P<name>\w+)\s+(?P<type>timestamp with time zone|\w+(?:\[\])?)(?P<rest>.*)$", re.S | re.I
+)
+
+
+def _parse_column(definition: str) -> Column:
+    match = _COLUMN_RE.match(definition.strip())
+    rest = match.group("rest")
+    default = re.search(r"DEFAULT\s+('(?:[^']|'')*'|[\w.]+\(\)|[\w.-]+)", rest, re.I)
+    references = re.search(r"REFERENCES\s+([\w.]+)\s*\(", rest, re.I)
+    return Column(
+        name=match.group("name"),
+        type=match.group("type").lower(),
+        default=default.group(1) if default else None,
+        references=references.group(1) if references else None,
+        nullable=not re.search(r"\bNOT NULL\b|\bPRIMARY KEY\b", rest, re.I)
+    )
+
+
+def parse_schema(sql: str, tables: Optional[Dict[str, Table]] = None) -> Dict[str, Table]:
+    """Tables (columns, defaults, foreign keys, unique keys) from CREATE/ALTER TABLE statements"""
+    tables = {} if tables is None else tables
+    sql = re.sub(r"--[^\n]*", "", sql)
+
+    for match in re.finditer(r"CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)\s*\((.*?)\n\);", sql, re.S | re.I):
+        table = tables.setdefault(match.group(1), Table(match.group(1)))
+        for item in _split_top_level(match.group(2)):
+            head = re.match(r"\w+", item).group(0).upper()
+            if head == "UNIQUE":
+                table.unique.append(tuple(c.strip() for c in re.search(r"\((.*?)\)", item).group(1).split(",")))
+            elif head not in ("CONSTRAINT", "CHECK", "PRIMARY", "FOREIGN"):
+                column = _parse_column(item)
+                table.columns[column.name] = column
+                if re.search(r"\b(UNIQUE|PRIMARY KEY)\b", item, re.I):
+                    table.unique.append((column.name,))
+
+    for match in re.finditer(r"ALTER TABLE\s+(\w+)\s+(.*?);", sql, re.S | re.I):
+        table = tables.get(match.group(1))
+        if table is None:
+            continue
+        for item in _split_top_level(match.group(2)):
+            added = re.match(r"ADD COLUMN(?: IF NOT EXISTS)?\s+(.*)$", item, re.S | re.I)
+            if added:
+                column = _parse_column(added.group(1))
+                table.columns[column.name] = column
+            not_null = re.match(r"ALTER COLUMN\s+(\w+)\s+(SET|DROP) NOT NULL$", item, re.I)
+            if not_null and not_null.group(1) in table.columns:
+                table.columns[not_null.group(1)].nullable = not_null.group(2).upper() == "DROP"
+    return tables
+
+
+_TOKEN_RE = re.compile(r"\s*(?:'((?:[^']|'')*)'|(-?\d+(?:\.\d+)?)\b|(\w+))\s*")
+
+
+def _parse_values(text: str, variables: Dict[str, Any]) -> List[Any]:
+    values = []
+    for item in _split_top_level(text):
+        match = _TOKEN_RE.fullmatch(item)
+        if match is None:
+            raise ValueError(f"Unsupported seed value: {item}")
+        string, number, word = match.groups()
+        if string is not None:
+            values.append(string.replace("''", "'"))
+        elif number is not None:
+            values.append(float(number) if "." in number else int(number))
+        elif word.upper() in ("NULL", "TRUE", "FALSE"):
+            values.append({"NULL": None, "TRUE": True, "FALSE": False}[word.upper()])
+        else:
+            values.append(variables[word])
+    return values
+
+
+def run_seed(db: "Database", sql: str) -> None:
+    """Apply the literal INSERTs of a setup script, and the `SELECT id INTO var` lookups between them"""
+    sql = re.sub(r"--[^\n]*", "", sql)
+    # Function bodies are not seed data
+    sql = re.sub(r"CREATE OR REPLACE FUNCTION.*?\$\$\s*LANGUAGE\s+\w+[^;]*;", "", sql, flags=re.S | re.I)
+    variables: Dict[str, Any] = {}
+
+    statement_re = re.compile(
+        r"SELECT id INTO (?P<var>\w+) FROM (?P<lookup>\w+) WHERE name = '(?P<name>(?:[^']|'')*)'"
+        r"|INSERT INTO (?P<table>\w+)\s*\((?P<columns>[^)]*)\)\s*VALUES\s*(?P<values>.*?)\s*(?:ON CONFLICT[^;]*)?;",
+        re.S | re.I
+    )
+    for match in statement_re.finditer(sql):
+        if match.group("var"):
+            name = match.group("name").replace("''", "'")
+            row = next((r for r in db.tables[match.group("lookup")].rows if r.get("name") == name), None)
+            variables[match.group("var")] = row["id"] if row else None
+            continue
+
+        table = db.tables.get(match.group("table"))
+        if table is None:
+            continue
+        columns = [c.strip() for c in match.group("columns").split(",")]
+        for group in _split_top_level(match.group("values")):
+            values = _parse_values(group[1:-1], variables)
+            try:
+                db.insert(table.name, [dict(zip(columns, values))])
+            except PostgrestError:
+                pass  # ON CONFLICT DO NOTHING
+
+
+# ---------------------------------------------------------------------------
+# In-memory database
+# ---------------------------------------------------------------------------
+
+class Database:
+    """Rows of every table, with column defaults, unique keys and relationships"""
+
+    def __init__(self, tables: Dict[str, Table]):
+        self.tables = tables
+        self.views: Dict[str, Callable[[], List[Dict[str, Any]]]] = {
+            "branch_membership_counts": self._branch_membership_counts
+        }
+        self.functions: Dict[str, Callable[..., Any]] = {
+            "allocate_membership_numbers": self._allocate_membership_numbers,
+            "can_assign_role": self._can_assign_role,
+            "search_user_profiles": self._search_user_profiles
+        }
+        self.lock = threading.RLock()
+        self._indexes: Dict[Tuple[str, Tuple[str, ...]], Dict[Tuple[Any, ...], List[Dict[str, Any]]]] = {}
+
+    @classmethod
+    def from_setup_scripts(cls, paths: Iterable[Path] = SCHEMA_FILES) -> "Database":
+        tables: Dict[str, Table] = {
+            AUTH_USERS: Table(AUTH_USERS, columns={
+                name: Column(name, kind) for name, kind in (
+                    ("id", "uuid"), ("email", "text"), ("encrypted_password", "text"),
+                    ("email_confirmed_at", "timestamp with time zone"),
+                    ("created_at", "timestamp with time zone")
+                )
+            }, unique=[("id",), ("email",)])
+        }
+        scripts = [Path(path).read_text() for path in paths]
+        for script in scripts:
+            parse_schema(script, tables)
+        db = cls(tables)
+        for script in scripts[:1]:
+            run_seed(db, script)
+        return db
+
+    # -- rows ---------------------------------------------------------------
+
+    def rows(self, name: str) -> List[Dict[str, Any]]:
+        if name in self.views:
+            return self.views[name]()
+        if name not in self.tables:
+            raise PostgrestError(404, f'relation "public.{name}" does not exist', "42P01")
+        return self.tables[name].rows
+
+    def _index(self, name: str, columns: Tuple[str, ...]) -> Dict[Tuple[Any, ...], List[Dict[str, Any]]]:
+        """Rows of name grouped by their values of columns, built on first use"""
+        index = self._indexes.get((name, columns))
+        if index is None:
+            index = self._indexes[(name, columns)] = {}
+            for row in self.tables[name].rows:
+                index.setdefault(tuple(row.get(c) for c in columns), []).append(row)
+        return index
+
+    def find(self, name: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Row of name whose unique column equals value (hash lookup)"""
+        rows = self._index(name, (column,)).get((value,))
+        return rows[0] if rows else None
+
+    def children(self, name: str, column: str, value: Any) -> List[Dict[str, Any]]:
+        """Rows of name whose column equals value (hash lookup)"""
+        if name in self.views:
+            return [row for row in self.views[name]() if row.get(column) == value]
+        return self._index(name, (column,)).get((value,), [])
+
+    def _reindex(self, name: str, added: Iterable[Dict[str, Any]] = ()) -> None:
+        """Add new rows to the indexes of name, or drop them all after an update/delete"""
+        for key in [key for key in self._indexes if key[0] == name]:
+            if not added:
+                del self._indexes[key]
+                continue
+            for row in added:
+                self._indexes[key].setdefault(tuple(row.get(c) for c in key[1]), []).append(row)
+
+    def coerce(self, name: str, column: str, value: Any) -> Any:
+        """Python value for a column, from JSON or from a filter string"""
+        table = self.tables.get(name)
+        kind = table.columns[column].type if table and column in table.columns else "text"
+        if value is None:
+            return None
+        if kind.startswith("timestamp"):
+            if value in ("now()", "now"):
+                return utcnow()
+            if isinstance(value, datetime):
+                parsed = value
+            else:
+                parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.astimezone(timezone.utc).isoformat()
+        if kind == "date":
+            return value.isoformat() if isinstance(value, date) else str(value)[:10]
+        if kind == "integer":
+            return int(value)
+        if kind == "boolean":
+            return value if isinstance(value, bool) else str(value).lower() == "true"
+        if kind == "jsonb":
+            return json.loads(value) if isinstance(value, str) else value
+        return str(value) if not isinstance(value, str) else value
+
+    def _default(self, name: str, column: Column) -> Any:
+        default = column.default
+        if default is None:
+            return None
+        if default.lower() == "gen_random_uuid()":
+            return str(uuid.uuid4())
+        if default.lower() == "now()":
+            return utcnow()
+        if default.startswith("'"):
+            default = default[1:-1].replace("''", "'")
+        return self.coerce(name, column.name, default)
+
+    def _check_not_null(self, table: Table, row: Dict[str, Any]) -> None:
+        for column, value in row.items():
+            if value is None and not table.columns[column].nullable:
+                raise PostgrestError(
+                    400, f'null value in column "{column}" of relation "{table.name}" violates not-null constraint', "23502"
+                )
+
+    def _check_unique(self, table: Table, row: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None) -> None:
+        for key in table.unique:
+            values = tuple(row.get(column) for column in key)
+            if None in values:
+                continue
+            if any(other is not ignore for other in self._index(table.name, key).get(values, [])):
+                raise PostgrestError(
+                    409, f'duplicate key value violates unique constraint "{table.name}_{"_".join(key)}_key"', "23505"
+                )
+
+    def insert(self, name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        table = self.tables.get(name)
+        if table is None:
+            raise PostgrestError(404, f'relation "public.{name}" does not exist', "42P01")
+        created = []
+        for values in rows:
+            unknown = set(values) - set(table.columns)
+            if unknown:
+                raise PostgrestError(400, f"Could not find the '{sorted(unknown)[0]}' column of '{name}'", "PGRST204")
+            row = {
+                column.name: self.coerce(name, column.name, values[column.name])
+                if column.name in values else self._default(name, column)
+                for column in table.columns.values()
+            }
+            self._check_not_null(table, row)
+            self._check_unique(table, row)
+            table.rows.append(row)
+            self._reindex(name, [row])
+            created.append(row)
+        return created
+
+    def update(self, name: str, rows: List[Dict[str, Any]], values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        table = self.tables[name]
+        unknown = set(values) - set(table.columns)
+        if unknown:
+            raise PostgrestError(400, f"Could not find the '{sorted(unknown)[0]}' column of '{name}'", "PGRST204")
+        changes = {column: self.coerce(name, column, value) for column, value in values.items()}
+        self._check_not_null(table, changes)
+        for row in rows:
+            self._check_unique(table, {**row, **changes}, ignore=row)
+        for row in rows:
+            row.update(changes)
+        self._reindex(name)
+        return rows
+
+    def delete(self, name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        table = self.tables[name]
+        doomed = {id(row) for row in rows}
+        table.rows = [row for row in table.rows if id(row) not in doomed]
+        self._reindex(name)
+        return rows
+
+    # -- relationships --------------------------------------------------------
+
+    def _target(self, references: Optional[str]) -> Optional[str]:
+        # Profiles share auth.users' primary key, so auth.users references embed profiles
+        return "user_profiles" if references == AUTH_USERS else references
+
+    def relationship(self, parent: str, child: str, hint: Optional[str]) -> Tuple[str, str, bool]:
+        """(parent column, child column, one-to-many) joining an embedded resource to its parent"""
+        parent_columns = self.tables[parent].columns.values() if parent in self.tables else []
+        child_columns = self.tables[child].columns.values() if child in self.tables else []
+        many_to_one = [c.name for c in parent_columns if self._target(c.references) == child and c.name != "id"]
+        one_to_many = [c.name for c in child_columns if self._target(c.references) == parent and c.name != "id"]
+
+        if hint in many_to_one:
+            return hint, "id", False
+        if hint in one_to_many:
+            return "id", hint, True
+        if many_to_one:
+            return many_to_one[0], "id", False
+        if one_to_many:
+            return "id", one_to_many[0], True
+        raise PostgrestError(400, f"Could not find a relationship between '{parent}' and '{child}'", "PGRST200")
+
+    # -- views and functions --------------------------------------------------
+
+    def _branch_membership_counts(self) -> List[Dict[str, Any]]:
+        counts: Dict[Tuple[str, str], int] = {}
+        for membership in self.tables["memberships"].rows:
+            key = (membership["branch_id"], membership["status"])
+            counts[key] = counts.get(key, 0) + 1
+        return [
+            {"branch_id": branch_id, "status": status, "member_count": count}
+            for (branch_id, status), count in counts.items()
+        ]
+
+    def _allocate_membership_numbers(self, p_year: int, p_count: int = 1) -> int:
+        sequences = self.tables["membership_number_sequences"]
+        row = next((r for r in sequences.rows if r["year"] == int(p_year)), None)
+        if row is None:
+            prefix = f"NDC-{p_year}-"
+            issued = [
+                int(p["membership_number"].rsplit("-", 1)[1])
+                for p in self.tables["user_profiles"].rows
+                if (p.get("membership_number") or "").startswith(prefix)
+            ]
+            row = self.insert("membership_number_sequences", [{"year": int(p_year), "last_value": max(issued, default=0)}])[0]
+        row["last_value"] += int(p_count)
+        row["updated_at"] = utcnow()
+        return row["last_value"]
+
+    def _search_user_profiles(
+        self,
+        p_query: str,
+        p_status: Optional[str] = None,
+        p_branch_ids: Optional[List[str]] = None,
+        p_limit: int = 20,
+        p_offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        # Substring or word similarity >= 0.6 (pg_trgm's <% default), ranked by similarity
+        needle = p_query.lower()
+        query_trigrams = _trigrams(p_query)
+        matches = []
+        for profile in self.tables["user_profiles"].rows:
+            if p_status and profile["status"] != p_status:
+                continue
+            if p_branch_ids and not any(
+                m["branch_id"] in p_branch_ids for m in self.children("memberships", "user_id", profile["id"])
+            ):
+                continue
+            name = profile.get("full_name") or ""
+            rank = len(query_trigrams & _trigrams(name)) / len(query_trigrams) if query_trigrams else 0.0
+            if needle in name.lower() or rank >= 0.6:
+                matches.append((-rank, name, profile["id"]))
+        matches.sort()
+        return [
+            {"id": profile_id, "rank": -rank, "total": len(matches)}
+            for rank, _, profile_id in matches[p_offset:p_offset + p_limit]
+        ]
+
+    def _can_assign_role(
+        self,
+        assigner_user_id: str,
+        target_user_id: str,
+        role_id: str,
+        target_chapter_id: Optional[str] = None,
+        target_branch_id: Optional[str] = None
+    ) -> bool:
+        role = self.find("roles", "id", role_id) or {}
+        for assignment in self.tables["executive_assignments"].rows:
+            if assignment["user_id"] != assigner_user_id or not assignment["is_active"]:
+                continue
+            assigner_role = (self.find("roles", "id", assignment["role_id"]) or {}).get("name")
+            if assigner_role == "Chairman":
+                return True
+            if assigner_role == "Secretary" and "Committee" in (role.get("name") or ""):
+                return True
+            if (assigner_role == "Branch Chairman" and role.get("scope_type") in ("branch", "both")
+                    and assignment["branch_id"] == target_branch_id):
+                return True
+        return False
+
+
+def _trigrams(text: str) -> set:
+    """pg_trgm style trigrams: lower-cased words padded with two spaces in front, one behind"""
+    return {
+        padded[i:i + 3]
+        for word in re.findall(r"[^\W_]+", text.lower())
+        for padded in (f"  {word} ",)
+        for i in range(len(padded) - 2)
+    }
+
+
+# ---------------------------------------------------------------------------
+# PostgREST request handling
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Embed:
+    alias: str
+    table: str
+    hint: Optional[str]
+    inner: bool
+    fields: List[Any]
+
+
+def parse_select(select: str) -> List[Any]:
+    """Select string as a list of column names, "*" and Embed nodes"""
+    fields: List[Any] = []
+    for item in _split_top_level(re.sub(r"\s+", " ", select or "*")):
+        match = re.fullmatch(r"(?:(\w+):)?([\w.]+)(?:!(\w+))?(?:!(inner))?\s*\((.*)\)", item.strip(), re.S)
+        if match:
+            alias, table, hint, inner, inner_fields = match.groups()
+            if hint == "inner":
+                hint, inner = None, "inner"
+            fields.append(Embed(alias or table, table, hint, bool(inner), parse_select(inner_fields)))
+        else:
+            fields.append(item.strip())
+    return fields
+
+
+def _pattern(pattern: str, ignore_case: bool) -> "re.Pattern":
+    regex = "".join(
+        ".*" if char in "%*" else "." if char == "_" else re.escape(char) for char in pattern
+    )
+    return re.compile(regex, re.I | re.S if ignore_case else re.S)
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+class Condition:
+    """One PostgREST filter (column, operator, criteria), optionally negated"""
+
+    def __init__(self, column: str, expression: str):
+        self.column = column
+        self.negate = expression.startswith("not.")
+        if self.negate:
+            expression = expression[4:]
+        self.op, _, self.criteria = expression.partition(".")
+        if self.op in ("fts", "plfts", "phfts", "wfts") or self.op.startswith(("fts(", "plfts(", "phfts(", "wfts(")):
+            self.op = "fts"
+
+    def matches(self, db: Database, table: str, row: Dict[str, Any]) -> bool:
+        result = self._matches(db, table, row)
+        return not result if self.negate else result
+
+    def _matches(self, db: Database, table: str, row: Dict[str, Any]) -> bool:
+        value = row.get(self.column)
+        op, criteria = self.op, self.criteria
+        if op == "is":
+            expected = {"null": None, "true": True, "false": False}[criteria.lower()]
+            return value is expected if expected is not None else value is None
+        if value is None:
+            return False
+        if op == "in":
+            options = [_unquote(v) for v in _split_top_level(criteria[1:-1])]
+            return value in {db.coerce(table, self.column, option) for option in options}
+        if op in ("like", "ilike"):
+            return bool(_pattern(_unquote(criteria), op == "ilike").fullmatch(str(value)))
+        if op == "fts":
+            words = set(re.findall(r"\w+", str(value).lower()))
+            return all(term in words for term in re.findall(r"\w+", criteria.lower()))
+        expected = db.coerce(table, self.column, _unquote(criteria))
+        if op == "eq":
+            return value == expected
+        if op == "neq":
+            return value != expected
+        if op == "gt":
+            return value > expected
+        if op == "gte":
+            return value >= expected
+        if op == "lt":
+            return value < expected
+        if op == "lte":
+            return value <= expected
+        raise PostgrestError(400, f"Unsupported operator {op}", "PGRST100")
+
+
+class LogicTree:
+    """An or=(...)/and=(...) filter tree"""
+
+    def __init__(self, operator: str, body: str):
+        self.negate = operator.startswith("not.")
+        self.operator = operator[4:] if self.negate else operator
+        self.children: List[Any] = []
+        for part in _split_top_level(body[1:-1]):
+            nested = re.fullmatch(r"((?:not\.)?(?:or|and))(\(.*\))", part, re.S)
+            if nested:
+                self.children.append(LogicTree(nested.group(1), nested.group(2)))
+            else:
+                column, _, expression = part.partition(".")
+                self.children.append(Condition(column, expression))
+
+    def matches(self, db: Database, table: str, row: Dict[str, Any]) -> bool:
+        results = (child.matches(db, table, row) for child in self.children)
+        result = any(results) if self.operator == "or" else all(results)
+        return not result if self.negate else result
+
+
+RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class PostgrestStandin:
+    """httpx handler answering postgrest-py requests from a Database"""
+
+    def __init__(self, db: Database, latency: float = 0.0):
+        self.db = db
+        self.latency = latency
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        try:
+            with self.db.lock:
+                status, body, headers = self.handle(request)
+        except PostgrestError as e:
+            status, body, headers = e.status, {"code": e.code, "message": str(e), "details": None, "hint": None}, {}
+        content = b"" if body is None else json.dumps(body, default=str).encode()
+        return httpx.Response(status, content=content, headers={"Content-Type": "application/json", **headers})
+
+    def handle(self, request: httpx.Request) -> Tuple[int, Any, Dict[str, str]]:
+        path = request.url.path.split("/rest/v1/", 1)[-1]
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        payload = json.loads(request.content) if request.content else None
+
+        if path.startswith("rpc/"):
+            function = self.db.functions.get(path[4:])
+            if function is None:
+                raise PostgrestError(404, f"Could not find the function public.{path[4:]}", "PGRST202")
+            return 200, function(**(payload or {})), {}
+
+        table = path
+        selected = self._filter(table, self.db.rows(table), params)
+
+        if request.method in ("GET", "HEAD"):
+            return self._read(request, table, selected, params, prefer)
+        if request.method == "POST":
+            rows = self.db.insert(table, payload if isinstance(payload, list) else [payload])
+            return 201, self._returning(table, rows, params, prefer), {}
+        if request.method == "PATCH":
+            rows = self.db.update(table, selected, payload or {})
+            return 200, self._returning(table, rows, params, prefer), {}
+        if request.method == "DELETE":
+            rows = self.db.delete(table, selected)
+            return 200, self._returning(table, rows, params, prefer), {}
+        raise PostgrestError(405, f"Unsupported method {request.method}")
+
+    def _filter(self, table: str, rows: List[Dict[str, Any]], params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        conditions = []
+        for key, value in params:
+            if key in RESERVED or "." in key:
+                continue
+            if key in ("or", "and", "not.or", "not.and"):
+                conditions.append(LogicTree(key, value))
+            else:
+                conditions.append(Condition(key, value))
+        return [row for row in rows if all(c.matches(self.db, table, row) for c in conditions)]
+
+    def _read(self, request, table, rows, params, prefer) -> Tuple[int, Any, Dict[str, str]]:
+        select = parse_select(dict(params).get("select", "*"))
+        # !inner embeds filter the parent rows; only the returned page is shaped in full
+        inner = [item for item in select if isinstance(item, Embed) and item.inner]
+        if inner:
+            rows = [row for row in rows if self._shape(table, row, inner, params, "") is not None]
+
+        rows = self._order(table, rows, [v for k, v in params if k == "order"])
+        total = len(rows)
+        start, end = 0, total
+        if request.headers.get("range"):
+            first, _, last = request.headers["range"].partition("-")
+            start, end = int(first), int(last) + 1 if last else total
+        offset = [int(v) for k, v in params if k == "offset"]
+        limit = [int(v) for k, v in params if k == "limit"]
+        if offset:
+            start += offset[-1]
+        if limit:
+            end = min(end, start + limit[-1])
+        page = [self._shape(table, row, select, params, "") for row in rows[start:end]]
+
+        headers = {}
+        if "count=exact" in prefer:
+            headers["Content-Range"] = f"{start}-{start + len(page) - 1}/{total}" if page else f"*/{total}"
+        return 200, None if request.method == "HEAD" else page, headers
+
+    def _shape(self, table, row, select, params, prefix) -> Optional[Dict[str, Any]]:
+        """Project a row onto the select list, embedding related rows; None if an !inner embed is empty"""
+        result: Dict[str, Any] = {}
+        for item in select:
+            if isinstance(item, Embed):
+                path = f"{prefix}{item.alias}."
+                parent_column, child_column, many = self.db.relationship(table, item.table, item.hint)
+                embed_params = [(k[len(path):], v) for k, v in params if k.startswith(path)]
+                if many:
+                    children = self.db.children(item.table, child_column, row.get(parent_column))
+                else:
+                    target = row.get(parent_column)
+                    found = self.db.find(item.table, child_column, target) if target is not None else None
+                    children = [found] if found else []
+                children = self._filter(item.table, children, embed_params)
+                shaped = [
+                    child for child in (
+                        self._shape(item.table, c, item.fields, params, path) for c in children
+                    ) if child is not None
+                ]
+                shaped = self._order(item.table, shaped, [v for k, v in embed_params if k == "order"])
+                if item.inner and not shaped:
+                    return None
+                result[item.alias] = shaped if many else (shaped[0] if shaped else None)
+            elif item == "*":
+                result.update(row)
+            else:
+                alias, _, column = item.rpartition(":")
+                result[alias or column] = row.get(column)
+        return result
+
+    def _order(self, table, rows, orders: List[str]) -> List[Dict[str, Any]]:
+        # Successive order parameters are successive sort keys
+        keys = [term for order in orders for term in order.split(",") if term]
+        for term in reversed(keys):
+            column, *modifiers = term.split(".")
+            descending = "desc" in modifiers
+            nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: r[column], reverse=descending)
+            rows = missing + present if nulls_first else present + missing
+        return rows
+
+    def _returning(self, table, rows, params, prefer) -> Optional[List[Dict[str, Any]]]:
+        if "return=minimal" in prefer:
+            return None
+        select = parse_select(dict(params).get("select", "*"))
+        return [self._shape(table, row, select, params, "") for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Auth
+# ---------------------------------------------------------------------------
+
+class AuthError(Exception):
+    pass
+
+
+class StandinAuthAdmin:
+    def __init__(self, auth: "StandinAuth"):
+        self._auth = auth
+
+    def delete_user(self, user_id: str) -> None:
+        with self._auth.db.lock:
+            users = self._auth.db.tables[AUTH_USERS]
+            self._auth.db.delete(AUTH_USERS, [u for u in users.rows if u["id"] == user_id])
+
+
+class StandinAuth:
+    """The GoTrue calls the services make, against the auth.users table"""
+
+    def __init__(self, db: Database, latency: float = 0.0, confirm_email: bool = False):
+        self.db = db
+        self.latency = latency
+        self.confirm_email = confirm_email
+        self.admin = StandinAuthAdmin(self)
+        self._otps: Dict[str, str] = {}
+
+    def _response(self, user: Optional[Dict[str, Any]]) -> SimpleNamespace:
+        if user is None:
+            return SimpleNamespace(user=None, session=None)
+        return SimpleNamespace(
+            user=SimpleNamespace(id=user["id"], email=user["email"], email_confirmed_at=user["email_confirmed_at"]),
+            session=SimpleNamespace(access_token=f"standin-{user['id']}", refresh_token=uuid.uuid4().hex)
+        )
+
+    def sign_up(self, credentials: Dict[str, Any]) -> SimpleNamespace:
+        time.sleep(self.latency)
+        with self.db.lock:
+            if self.db.find(AUTH_USERS, "email", credentials["email"]):
+                raise AuthError("User already registered")
+            user = self.db.insert(AUTH_USERS, [{
+                "id": str(uuid.uuid4()),
+                "email": credentials["email"],
+                "encrypted_password": credentials["password"],
+                "email_confirmed_at": utcnow() if self.confirm_email else None,
+                "created_at": utcnow()
+            }])[0]
+            self._otps[uuid.uuid4().hex] = user["id"]
+        return self._response(user)
+
+    def sign_in_with_password(self, credentials: Dict[str, Any]) -> SimpleNamespace:
+        time.sleep(self.latency)
+        with self.db.lock:
+            user = self.db.find(AUTH_USERS, "email", credentials["email"])
+        if user is None or user["encrypted_password"] != credentials["password"]:
+            raise AuthError("Invalid login credentials")
+        return self._response(user)
+
+    def verify_otp(self, params: Dict[str, Any]) -> SimpleNamespace:
+        time.sleep(self.latency)
+        with self.db.lock:
+            user_id = self._otps.pop(params.get("token"), None)
+            user = self.db.find(AUTH_USERS, "id", user_id) if user_id else None
+            if user is None:
+                raise AuthError("Token has expired or is invalid")
+            user["email_confirmed_at"] = utcnow()
+        return self._response(user)
+
+    def reset_password_email(self, email: str, options: Optional[Dict[str, Any]] = None) -> None:
+        time.sleep(self.latency)
+
+
+# ---------------------------------------------------------------------------
+# Client, installation and data
+# ---------------------------------------------------------------------------
+
+class StandinClient:
+    """Drop-in for supabase.Client as used by the services"""
+
+    def __init__(self, db: Optional[Database] = None, latency: float = 0.0):
+        self.db = db or Database.from_setup_scripts()
+        self.standin = PostgrestStandin(self.db, latency)
+        self.auth = StandinAuth(self.db, latency)
+        self.postgrest = SyncPostgrestClient(f"{BASE_URL}/rest/v1")
+        self.postgrest.session = httpx.Client(
+            base_url=f"{BASE_URL}/rest/v1",
+            headers=self.postgrest.session.headers,
+            transport=httpx.MockTransport(self.standin)
+        )
+
+    def table(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def from_(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def rpc(self, fn: str, params: Dict[Any, Any]):
+        return self.postgrest.rpc(fn, params)
+
+
+def install(client: StandinClient) -> None:
+    """Point app.core.database at the stand-in; must run before the services are imported"""
+    loaded = [name for name in sys.modules if name.startswith("app.services")]
+    if loaded:
+        raise RuntimeError(f"install() must run before importing {loaded[0]}")
+
+    from app.core.database import supabase_client
+    supabase_client.client = client
+    supabase_client.anon_client = client
+
+
+def seed_members(
+    db: Database,
+    members: int = 1000,
+    assignments_per_branch: int = 2,
+    password: str = "Password123!",
+    seed: int = 42
+) -> Dict[str, Any]:
+    """Add approved members spread over the seeded branches, with branch executives and a chapter Chairman.
+
+    Returns the ids and emails the benchmarks log in with.
+    """
+    rng = random.Random(seed)
+    year = datetime.now().year
+    chapter = db.tables["chapters"].rows[0]
+    branches = [b for b in db.tables["branches"].rows if b["status"] == "active"]
+    roles = {role["name"]: role for role in db.tables["roles"].rows}
+    branch_roles = [role for role in db.tables["roles"].rows if role["scope_type"] == "branch"]
+
+    with db.lock:
+        users = []
+        for i in range(members):
+            user_id = str(uuid.uuid4())
+            email = f"member{i:06d}@example.org"
+            users.append(user_id)
+            db.insert(AUTH_USERS, [{
+                "id": user_id, "email": email, "encrypted_password": password,
+                "email_confirmed_at": utcnow(), "created_at": utcnow()
+            }])
+            db.insert("user_profiles", [{
+                "id": user_id,
+                "full_name": f"{rng.choice(['Kwame', 'Ama', 'Kofi', 'Akosua', 'Yaw', 'Efua'])} "
+                             f"{rng.choice(['Mensah', 'Boateng', 'Owusu', 'Asante', 'Darko', 'Appiah'])} {i}",
+                "email": email,
+                "phone": f"+4470000{i:05d}",
+                "address": f"{i + 1} High Street, London",
+                "date_of_birth": f"{1960 + i % 40}-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                "gender": rng.choice(["male", "female"]),
+                "membership_number": f"NDC-{year}-{i + 1:04d}",
+                "status": "approved" if i % 10 else "pending_approval",
+                "email_verified": True
+            }])
+            db.insert("memberships", [{
+                "user_id": user_id,
+                "branch_id": branches[i % len(branches)]["id"],
+                "status": "active" if i % 10 else "pending"
+            }])
+        db._allocate_membership_numbers(year, 0)
+
+        # Branch executives: the first approved members of each branch
+        for index, branch in enumerate(branches):
+            executives = [users[i] for i in range(index, members, len(branches)) if i % 10][:assignments_per_branch]
+            for user_id, role in zip(executives, branch_roles):
+                db.insert("executive_assignments", [{
+                    "user_id": user_id, "role_id": role["id"], "branch_id": branch["id"], "chapter_id": chapter["id"]
+                }])
+
+        chairman = users[1]
+        db.insert("executive_assignments", [{
+            "user_id": chairman, "role_id": roles["Chairman"]["id"], "chapter_id": chapter["id"]
+        }])
+
+    return {
+        "password": password,
+        "chairman": chairman,
+        "chairman_email": db.find(AUTH_USERS, "id", chairman)["email"],
+        "member": users[3],
+        "member_email": db.find(AUTH_USERS, "id", users[3])["email"],
+        "branch_ids": [branch["id"] for branch in branches],
+        "user_ids": users
+    }
@@ -0,0 +1,14 @@
+-- Keyset pagination of user and branch member lists seeks on
+-- (created_at, id) and (joined_date, id). A NULL sort value sorts first under
+-- ORDER BY ... DESC, can never match the .lt. seek and cannot be put in a
+-- cursor, so backfill the gaps and keep the columns NOT NULL from now on
+UPDATE user_profiles
+SET created_at = COALESCE(updated_at, NOW())
+WHERE created_at IS NULL;
+
+UPDATE memberships
+SET joined_date = COALESCE(approved_at, created_at, NOW())
+WHERE joined_date IS NULL;
+
+ALTER TABLE user_profiles ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE memberships ALTER COLUMN joined_date SET NOT NULL;
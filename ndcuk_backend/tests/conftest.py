@@ -5,6 +5,8 @@ import pytest
 import asyncio
 from typing import AsyncGenerator
 from httpx import AsyncClient
+from benchmarks import _env  # must precede the app imports
+_env.use_in_memory_state()
 from app.main import app
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,82 @@
+"""
+Keyset cursors are validated before their values reach a PostgREST filter
+"""
+from pathlib import Path
+
+import pytest
+
+from app.core.exceptions import ValidationException
+from app.services.branch_service import BranchService, branch_service
+from app.services.user_service import user_service
+from app.utils.helpers import decode_keyset_cursor, encode_cursor
+from benchmarks.supabase_standin import PostgrestError, StandinClient, parse_schema, seed_members
+
+CREATED_AT = "2024-05-01T12:30:00.123456+00:00"
+USER_ID = "5b0e7a4e-3c52-4f0e-9a3b-2f6d8e1c7a90"
+
+def test_round_trip():
+    assert decode_keyset_cursor(encode_cursor(CREATED_AT, USER_ID)) == (CREATED_AT, USER_ID)
+
+def test_date_sort_value():
+    assert decode_keyset_cursor(encode_cursor("2024-05-01", USER_ID)) == ("2024-05-01", USER_ID)
+
+@pytest.mark.parametrize("values", [
+    (f'{CREATED_AT}",status.eq.approved,created_at.lt."', USER_ID),
+    (CREATED_AT, f"{USER_ID}),status.eq.approved"),
+    (CREATED_AT, "1"),
+    (12, USER_ID),
+    (CREATED_AT, None),
+])
+def test_crafted_values_are_rejected(values):
+    with pytest.raises(ValueError):
+        decode_keyset_cursor(encode_cursor(*values))
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(CREATED_AT), encode_cursor(CREATED_AT, "x,y")])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_keyset_cursor(cursor)
+
+@pytest.mark.asyncio
+async def test_services_reject_invalid_cursor_before_querying():
+    cursor = encode_cursor(CREATED_AT, "1),or(id.gt.0")
+    with pytest.raises(ValidationException, match="Invalid cursor"):
+        await user_service.list_users(cursor=cursor)
+    with pytest.raises(ValidationException, match="Invalid cursor"):
+        await branch_service.get_branch_members(USER_ID, cursor=cursor)
+
+SORT_COLUMNS = [("user_profiles", "created_at"), ("memberships", "joined_date")]
+
+@pytest.mark.parametrize("migrated", [False, True])
+def test_sort_columns_are_not_null(migrated):
+    # A NULL sort value could neither be encoded in a cursor nor matched by the seek
+    root = Path(__file__).resolve().parents[1]
+    tables = parse_schema((root / "complete_database_setup.sql").read_text())
+    if migrated:
+        # A database created before the columns were declared NOT NULL
+        for table, column in SORT_COLUMNS:
+            tables[table].columns[column].nullable = True
+        parse_schema((root / "make_sort_columns_not_null.sql").read_text(), tables)
+    assert not any(tables[table].columns[column].nullable for table, column in SORT_COLUMNS)
+
+@pytest.mark.asyncio
+async def test_members_sharing_a_joined_date_are_paged_once():
+    standin = StandinClient()
+    seed = seed_members(standin.db, members=45)
+    branch_id = seed["branch_ids"][0]
+    memberships = [m for m in standin.db.tables["memberships"].rows if m["branch_id"] == branch_id]
+    standin.db.update("memberships", memberships, {"joined_date": CREATED_AT})
+    with pytest.raises(PostgrestError, match="not-null"):
+        standin.db.update("memberships", memberships[:1], {"joined_date": None})
+    service = BranchService()
+    service.client = standin
+
+    seen, cursor = [], None
+    while True:
+        page = await service.get_branch_members(branch_id, size=7, cursor=cursor)
+        seen.extend(member.id for member in page.members)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert len(memberships) > 7
+    assert sorted(seen) == sorted(m["id"] for m in memberships)
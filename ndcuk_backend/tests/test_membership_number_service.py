@@ -0,0 +1,80 @@
+"""
+MembershipNumberService block leasing under concurrent registrations
+
+The allocate_membership_numbers RPC is answered by benchmarks.supabase_standin,
+which runs each call under its database lock the way the UPDATE ... / INSERT
+... ON CONFLICT row lock serialises callers in Postgres.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.membership_number_service import MembershipNumberService
+from benchmarks.supabase_standin import StandinClient, seed_members
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.users]
+
+YEAR = 2031
+
+def workers(standin: StandinClient, count: int, block_size: int):
+    """One service per simulated uvicorn worker, all sharing one database"""
+    services = []
+    for _ in range(count):
+        service = MembershipNumberService(block_size=block_size)
+        service.client = standin
+        services.append(service)
+    return services
+
+def serial(number: str) -> int:
+    return int(number.rsplit("-", 1)[1])
+
+@pytest.mark.parametrize("block_size", [1, 7, 50])
+async def test_numbers_are_unique_across_workers(block_size):
+    standin = StandinClient(latency=0.001)
+    services = workers(standin, 4, block_size)
+
+    numbers = await asyncio.gather(*(
+        services[i % len(services)].next_membership_number(YEAR) for i in range(200)
+    ))
+
+    assert len(set(numbers)) == len(numbers)
+    assert all(number.startswith(f"NDC-{YEAR}-") for number in numbers)
+
+    # Every number handed out lies inside a leased block and blocks never overlap
+    sequence = next(r for r in standin.db.tables["membership_number_sequences"].rows if r["year"] == YEAR)
+    assert max(serial(n) for n in numbers) <= sequence["last_value"]
+    assert sequence["last_value"] <= 200 + len(services) * (block_size - 1)
+
+async def test_block_is_leased_once_per_worker():
+    standin = StandinClient()
+    service, = workers(standin, 1, 10)
+
+    numbers = await asyncio.gather(*(service.next_membership_number(YEAR) for _ in range(25)))
+
+    # 25 numbers from blocks of 10: three RPCs, handed out in order
+    assert sorted(serial(n) for n in numbers) == list(range(1, 26))
+    assert standin.standin.requests == 3
+
+async def test_first_allocation_of_year_continues_after_issued_numbers():
+    standin = StandinClient()
+    seed_members(standin.db, members=30)
+    year = datetime.now().year
+    issued = [
+        serial(p["membership_number"]) for p in standin.db.tables["user_profiles"].rows
+        if (p.get("membership_number") or "").startswith(f"NDC-{year}-")
+    ]
+    service, = workers(standin, 1, 1)
+
+    number = await service.next_membership_number(year)
+
+    assert serial(number) == max(issued) + 1
+
+async def test_years_are_numbered_independently():
+    standin = StandinClient()
+    service, = workers(standin, 1, 5)
+
+    first = await service.next_membership_number(YEAR)
+    other = await service.next_membership_number(YEAR + 1)
+
+    assert (first, other) == (f"NDC-{YEAR}-0001", f"NDC-{YEAR + 1}-0001")
@@ -0,0 +1,18 @@
+"""
+Database round trips per request must not grow with the size of the result
+
+Runs benchmarks.query_counts: every read endpoint against a small and a large
+dataset in the Supabase stand-in, each in its own interpreter. An endpoint
+whose X-DB-Calls differs between the two is looking rows up one by one.
+"""
+import pytest
+
+from benchmarks.query_counts import ENDPOINTS, compare
+
+pytestmark = [pytest.mark.integration, pytest.mark.slow]
+
+def test_query_counts_do_not_grow_with_result_size():
+    small, large, failed = compare(small=20, large=300, extra_branches=8)
+
+    assert set(small) == {label for label, _, _ in ENDPOINTS}
+    assert not failed, {label: (small[label], large[label]) for label in failed}
@@ -0,0 +1,56 @@
+"""
+SQLiteStorage enforces the limits strategies slowapi uses and fails open
+
+Two storages on one file stand for two uvicorn workers.
+"""
+import sqlite3
+
+import pytest
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+from app.core.rate_limit import SQLiteStorage
+
+pytestmark = pytest.mark.unit
+
+LIMIT = parse("3/minute")
+STRATEGIES = [FixedWindowRateLimiter, SlidingWindowCounterRateLimiter]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "rate_limits.db")
+
+@pytest.fixture
+def storages(path):
+    storages = [SQLiteStorage(f"sqlite:///{path}"), SQLiteStorage(f"sqlite:///{path}")]
+    yield storages
+    for storage in storages:
+        storage._conn.close()
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_limit_is_shared_across_workers(strategy, storages):
+    limiters = [strategy(storage) for storage in storages]
+
+    hits = [limiters[i % 2].hit(LIMIT, "login", "10.0.0.1") for i in range(LIMIT.amount + 2)]
+
+    assert hits == [True] * LIMIT.amount + [False, False]
+    assert limiters[0].hit(LIMIT, "login", "10.0.0.2")
+    assert not limiters[1].test(LIMIT, "login", "10.0.0.1")
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_fails_open_while_the_file_is_locked(strategy, storages, path):
+    storage = storages[0]
+    limiter = strategy(storage)
+    for _ in range(LIMIT.amount):
+        assert limiter.hit(LIMIT, "login", "10.0.0.1")
+
+    # Another worker holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert limiter.hit(LIMIT, "login", "10.0.0.1")
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert not limiter.hit(LIMIT, "login", "10.0.0.1")
@@ -0,0 +1,62 @@
+"""
+ReferenceDataCache shares loads and never caches a load that a write overtook
+"""
+import asyncio
+
+import pytest
+
+from app.core.reference_data import ReferenceDataCache
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+class Table:
+    """A dataset whose reads can be held open"""
+
+    def __init__(self):
+        self.version = 0
+        self.loads = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def load(self):
+        self.loads += 1
+        version = self.version
+        await self.release.wait()
+        return {"version": version}
+
+async def test_concurrent_misses_share_one_load():
+    cache, table = ReferenceDataCache(), Table()
+
+    entries = await asyncio.gather(*(cache.get("roles", table.load) for _ in range(10)))
+
+    assert table.loads == 1
+    assert {entry.etag for entry in entries} == {entries[0].etag}
+
+async def test_invalidate_during_load_is_not_lost():
+    cache, table = ReferenceDataCache(), Table()
+    table.release.clear()
+    loading = asyncio.create_task(cache.get("roles", table.load))
+    await asyncio.sleep(0)
+
+    # A write lands while the read is in flight
+    table.version = 1
+    cache.invalidate("roles")
+    table.release.set()
+    stale = await loading
+
+    assert stale.value == {"version": 0}
+    assert (await cache.get("roles", table.load)).value == {"version": 1}
+    assert table.loads == 2
+
+async def test_clear_during_load_is_not_lost():
+    cache, table = ReferenceDataCache(), Table()
+    table.release.clear()
+    loading = asyncio.create_task(cache.get("roles", table.load))
+    await asyncio.sleep(0)
+
+    table.version = 1
+    cache.clear()
+    table.release.set()
+    await loading
+
+    assert (await cache.get("roles", table.load)).value == {"version": 1}
@@ -0,0 +1,116 @@
+"""
+Refresh token rotation, reuse detection and logout over both token backends
+
+Two RefreshTokenStore instances on one backend stand for two uvicorn workers:
+they share the backend but not their in-process caches.
+"""
+from dataclasses import replace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.dependencies import get_current_user
+from app.core.exceptions import AuthenticationException
+from app.core.token_store import MemoryTokenBackend, RefreshTokenStore, SQLiteTokenBackend
+from app.services import auth_service as auth_module
+from app.services.auth_service import auth_service
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.auth]
+
+USER_ID = "5b0e7a4e-3c52-4f0e-9a3b-2f6d8e1c7a90"
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    backend = MemoryTokenBackend() if request.param == "memory" else SQLiteTokenBackend(str(tmp_path / "tokens.db"))
+    yield backend
+    backend.close()
+
+@pytest.fixture
+def stores(backend):
+    """Two workers sharing the backend"""
+    stores = [RefreshTokenStore(backend), RefreshTokenStore(backend)]
+    yield stores
+    for store in stores:
+        store.executor.shutdown(wait=True)
+
+@pytest.fixture
+def store(stores, monkeypatch):
+    monkeypatch.setattr(auth_module, "refresh_token_store", stores[0])
+    return stores[0]
+
+async def test_consume_then_issue_rotates_within_the_family(stores):
+    store, _ = stores
+    first = await store.issue(USER_ID)
+
+    assert await store.consume(first.jti, first.family)
+    second = await store.issue(USER_ID, first.family)
+
+    assert second.family == first.family and second.jti != first.jti
+    assert await store.consume(second.jti, second.family)
+
+async def test_replayed_token_revokes_the_family(stores):
+    store, other = stores
+    first = await store.issue(USER_ID)
+    assert await store.consume(first.jti, first.family)
+    second = await store.issue(USER_ID, first.family)
+
+    # The replay reaches a worker that has not seen the first token spent
+    assert not await other.consume(first.jti, first.family)
+
+    assert not await store.consume(second.jti, second.family)
+    with pytest.raises(AuthenticationException):
+        await store.issue(USER_ID, first.family)
+
+async def test_unknown_token_is_rejected(stores):
+    store, _ = stores
+    assert not await store.consume("0" * 32, "f" * 32)
+
+async def test_issue_after_revocation_is_refused_by_every_worker(stores):
+    store, other = stores
+    record = await store.issue(USER_ID)
+
+    # A refresh in one worker races a logout in another: the revocation wins
+    await other.revoke_family(record.family)
+
+    with pytest.raises(AuthenticationException):
+        await store.issue(USER_ID, record.family)
+    assert not await store.consume(record.jti, record.family)
+
+async def test_purge_clears_expired_revocations(stores, backend):
+    store, _ = stores
+    record = await store.issue(USER_ID)
+    backend.revoke_family(record.family, expires_at=record.expires_at)
+    assert not backend.add(replace(record, jti="1" * 32))
+
+    backend.purge(now=record.expires_at)
+
+    assert backend.add(replace(record, jti="2" * 32))
+
+async def test_refresh_rotates_and_rejects_replay(store):
+    tokens = await auth_service._issue_tokens(USER_ID)
+
+    rotated = await auth_service.refresh_access_token(tokens.refresh_token)
+
+    assert rotated.refresh_token != tokens.refresh_token
+    with pytest.raises(AuthenticationException):
+        await auth_service.refresh_access_token(tokens.refresh_token)
+    with pytest.raises(AuthenticationException):
+        await auth_service.refresh_access_token(rotated.refresh_token)
+
+async def test_refresh_fails_after_logout(store):
+    tokens = await auth_service._issue_tokens(USER_ID)
+
+    await auth_service.logout_user(tokens.access_token)
+
+    with pytest.raises(AuthenticationException):
+        await auth_service.refresh_access_token(tokens.refresh_token)
+
+async def test_refresh_token_is_not_a_bearer_token(store):
+    tokens = await auth_service._issue_tokens(USER_ID)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens.refresh_token)
+
+    with pytest.raises(HTTPException) as error:
+        await get_current_user(credentials)
+
+    assert error.value.status_code == 401